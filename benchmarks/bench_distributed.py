@@ -0,0 +1,63 @@
+"""
+Distributed scan scaling benchmark
+
+Runs the same loopback scan through a Coordinator with 1, 2, 4, ... local
+worker processes and reports ports/sec, speed-up over one worker and how
+many ports were misreported. Each worker is capped at --threads connects
+so that, as on real nodes, a worker's throughput is bound by its own
+concurrency (and fds) rather than by this machine's CPUs.
+
+Usage:
+    python benchmarks/bench_distributed.py
+    python benchmarks/bench_distributed.py --workers 1 2 4 8 --ports 20000
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from fleet import LocalFleet  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coordinator throughput against worker count")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--ports", type=int, default=8000)
+    parser.add_argument("--filtered", type=float, default=0.05, help="fraction of ports blackholed")
+    parser.add_argument("--timeout", type=float, default=0.3)
+    parser.add_argument("--threads", type=int, default=20, help="connects per worker")
+    parser.add_argument("--unit-size", type=int, default=250)
+    parser.add_argument("--base-port", type=int, default=20000)
+    args = parser.parse_args()
+
+    from distributed import Coordinator
+    from portscan import PortScanner
+
+    with LocalFleet(args.ports, open_ratio=0.01, filtered_ratio=args.filtered,
+                    base_port=args.base_port) as fleet:
+        baseline = None
+        for workers in args.workers:
+            scanner = PortScanner(timeout=args.timeout, threads=args.threads)
+            coordinator = Coordinator(scanner, "127.0.0.1", 0, unit_size=args.unit_size)
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    start = time.perf_counter()
+                    scan = coordinator.run(fleet.host, fleet.ports, local_workers=workers, worker_slots=1)
+                    elapsed = time.perf_counter() - start
+                finally:
+                    sys.stdout = stdout
+            results = scan["results"]["hosts"][fleet.host]
+            wrong = sum(1 for port, status in fleet.expected.items() if results.status_of(port) != status)
+            rate = len(fleet.ports) / elapsed
+            baseline = baseline or rate / workers
+            print(f"{workers:>3} workers  {rate:>9.0f} p/s  {elapsed:6.2f} s  "
+                  f"speed-up {rate / baseline:5.2f}x  efficiency {rate / baseline / workers:4.0%}  wrong {wrong}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Streaming export benchmark
+
+Writes a synthetic sweep (mostly closed ports, some filtered, a few open
+with banners) through each exporter, reads it back, and reports rows/s,
+bytes per row, then repeats both under tracemalloc for the peak memory of
+writing and reading. Peak memory should stay flat however many rows there
+are.
+
+Usage:
+    python benchmarks/bench_export.py
+    python benchmarks/bench_export.py --rows 5000000 --formats binary
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from exporters import WRITERS, open_writer, read_results  # noqa: E402
+
+
+def synthetic_rows(count: int):
+    """(host, port, status, service, banner) rows: 65535 ports per host, ~1% open"""
+    for i in range(count):
+        n = i // 65535
+        host = f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+        port = i % 65535 + 1
+        if i % 97 == 0:
+            yield host, port, "open", "SSH (OpenSSH_9.6)", "SSH-2.0-OpenSSH_9.6p1"
+        elif i % 13 == 0:
+            yield host, port, "filtered", None, None
+        else:
+            yield host, port, "closed", None, None
+
+
+def run(path: str, fmt: str, count: int, trace: bool = False):
+    """Write and read back count rows; (write, read) seconds, or peak bytes when trace is set"""
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with open_writer(path, fmt) as out:
+        for row in synthetic_rows(count):
+            out.write(*row)
+    write = time.perf_counter() - start
+    if trace:
+        write = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    rows = sum(1 for _ in read_results(path, fmt))
+    read = time.perf_counter() - start
+    if trace:
+        read = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return write, read, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporter write / read throughput and memory")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--formats", nargs="+", choices=tuple(WRITERS), default=list(WRITERS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats:
+            path = os.path.join(tmp, f"sweep.{fmt}")
+            write_s, read_s, rows = run(path, fmt, args.rows)
+            if rows != args.rows:
+                print(f"FAIL: {fmt} read back {rows} of {args.rows} rows")
+                sys.exit(1)
+            size = os.path.getsize(path)
+            write_peak, read_peak, _ = run(path, fmt, args.rows, trace=True)
+
+            print(f"{fmt:<7} write {args.rows / write_s:>9.0f} rows/s  read {args.rows / read_s:>9.0f} rows/s  "
+                  f"{size / args.rows:5.1f} B/row  peak {write_peak / 2**20:5.1f} / {read_peak / 2**20:5.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Service signature matching benchmark
+
+Times probes.SignatureMatcher (every signature in one compiled regex)
+against trying each signature's own regex in turn, on a mix of typical
+replies (SSH, HTTP, TLS, SMTP, ... and some that match nothing). Both must
+identify every reply the same way.
+
+Usage:
+    python benchmarks/bench_probes.py
+    python benchmarks/bench_probes.py --replies 100000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from probes import SIGNATURES, SignatureMatcher  # noqa: E402
+
+SAMPLE_REPLIES = (
+    b"SSH-2.0-OpenSSH_9.6p1 Ubuntu-3ubuntu13.5\r\n",
+    b"HTTP/1.1 200 OK\r\nDate: Mon, 01 Jan 2024 00:00:00 GMT\r\nContent-Type: text/html\r\n"
+    b"Server: nginx/1.24.0\r\nContent-Length: 612\r\n\r\n<!DOCTYPE html><html>" + b"x" * 600,
+    b"HTTP/1.0 404 Not Found\r\nContent-Type: text/html\r\nContent-Length: 9\r\n\r\nnot found",
+    b"\x16\x03\x03\x00\x5a\x02\x00\x00\x56\x03\x03" + bytes(range(32)) + b"\x00\xc0\x2f\x00",
+    b"220 mail.example.com ESMTP Postfix (Ubuntu)\r\n",
+    b"220 (vsFTPd 3.0.5)\r\n",
+    b"* OK [CAPABILITY IMAP4rev1 SASL-IR LOGIN-REFERRALS] Dovecot ready.\r\n",
+    b"J\x00\x00\x00\x0a8.0.36-0ubuntu0.22.04.1\x00\x08\x00\x00\x00abcdefgh\x00",
+    b"+PONG\r\n",
+    b"RFB 003.008\n",
+    b"\x00\x01\x02\x03 unknown binary protocol " + bytes(range(200)),
+    b"Welcome to the custom admin console, please log in\r\n" * 4,
+)
+
+
+def naive_match(matchers, response: bytes):
+    """Reference: one regex per signature, tried in turn until one matches"""
+    for matcher in matchers:
+        service = matcher.match(response)
+        if service is not None:
+            return service
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combined vs per-signature regex matching")
+    parser.add_argument("--replies", type=int, default=50000)
+    args = parser.parse_args()
+
+    replies = [SAMPLE_REPLIES[i % len(SAMPLE_REPLIES)] for i in range(args.replies)]
+    matcher = SignatureMatcher()
+    compiled = [SignatureMatcher([signature]) for signature in SIGNATURES]
+
+    for reply in SAMPLE_REPLIES:
+        if matcher.match(reply) != naive_match(compiled, reply):
+            print(f"FAIL: matchers disagree on {reply[:40]!r}")
+            sys.exit(1)
+
+    timings = {}
+    for name, match in (("combined", matcher.match),
+                        ("per-signature", lambda reply: naive_match(compiled, reply))):
+        start = time.perf_counter()
+        for reply in replies:
+            match(reply)
+        timings[name] = time.perf_counter() - start
+        print(f"{name:<14} {timings[name] / len(replies) * 1e6:7.2f} us/reply  "
+              f"{len(replies) / timings[name]:>10.0f} replies/s")
+    print(f"\n{len(SIGNATURES)} signatures; combined matcher is "
+          f"{timings['per-signature'] / timings['combined']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Scanner throughput / latency benchmark
+
+Builds a LocalFleet on loopback, then runs PortScanner.scan() over a
+matrix of engines, concurrency, timeouts, port counts and open-port
+densities. Each case runs in a fresh process so peak RSS and fd counts
+belong to that case alone.
+
+Usage:
+    python benchmarks/bench_scan.py                   # default matrix
+    python benchmarks/bench_scan.py --quick           # smoke-sized matrix
+    python benchmarks/bench_scan.py --save main       # store baseline
+    python benchmarks/bench_scan.py --compare main    # diff against it
+
+Baselines live in benchmarks/baselines/<name>.json. --compare exits with
+status 1 when ports/sec drops, or p99 latency / peak RSS / peak fds grow,
+by more than --tolerance.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from fleet import LocalFleet  # noqa: E402
+
+BASELINE_DIR = BENCH_DIR / "baselines"
+
+# metric -> True if bigger is better
+METRICS = {
+    "ports_per_s": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+    "peak_fds": False,
+    "wrong": False,
+}
+
+
+def _open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1  # Not available on this platform
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return -1.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _run_case(case: dict, host: str, ports: list, expected: dict, out) -> None:
+    """Child process: scan once and report metrics"""
+    from portscan import PortScanner
+
+    latencies = []
+
+    class TimedScanner(PortScanner):
+        """Records the duration of every connect attempt"""
+
+        def _connect(self, host, port, timeout):
+            res = super()._connect(host, port, timeout)
+            latencies.append(res[2])
+            return res
+
+        async def _connect_async(self, host, port, timeout):
+            res = await super()._connect_async(host, port, timeout)
+            latencies.append(res[2])
+            return res
+
+    concurrency = case["concurrency"]
+    scanner = TimedScanner(timeout=case["timeout"], engine=case["engine"],
+                           threads=concurrency, max_inflight=concurrency)
+
+    peak_fds = _open_fds()
+    done = threading.Event()
+
+    def sample_fds():
+        nonlocal peak_fds
+        while not done.wait(0.005):
+            peak_fds = max(peak_fds, _open_fds())
+
+    sampler = threading.Thread(target=sample_fds, daemon=True)
+    sampler.start()
+
+    # Keep the scanner's progress prints out of the report
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            start = time.perf_counter()
+            results = scanner.scan(host, ports)["results"]
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stdout = stdout
+    done.set()
+    sampler.join()
+
+    wrong = sum(1 for port, status in expected.items() if results.status_of(int(port)) != status)
+    out.put({
+        "ports_per_s": len(ports) / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_fds": peak_fds,
+        "wrong": wrong,
+        "elapsed_s": elapsed,
+    })
+
+
+def run_matrix(args) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for port_count, density in itertools.product(args.ports, args.density):
+        with LocalFleet(port_count, open_ratio=density, filtered_ratio=args.filtered,
+                        slow_delay=args.slow_delay, base_port=args.base_port) as fleet:
+            expected = {str(p): s for p, s in fleet.expected.items()}
+            for engine, concurrency, timeout in itertools.product(args.engine, args.concurrency, args.timeout):
+                case = {"engine": engine, "concurrency": concurrency, "timeout": timeout}
+                key = f"{engine} c={concurrency} t={timeout} ports={port_count} open={density}"
+                out = ctx.Queue()
+                child = ctx.Process(target=_run_case, args=(case, fleet.host, fleet.ports, expected, out))
+                child.start()
+                metrics = out.get()
+                child.join()
+                results[key] = metrics
+                print(f"{key:<48} {metrics['ports_per_s']:>10.0f} p/s  p50 {metrics['p50_ms']:>7.2f} ms  "
+                      f"p99 {metrics['p99_ms']:>7.2f} ms  rss {metrics['peak_rss_mb']:>6.1f} MB  "
+                      f"fds {metrics['peak_fds']:>5}  wrong {metrics['wrong']}")
+    return results
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> bool:
+    """Print per-metric deltas; True if anything regressed beyond tolerance"""
+    regressed = False
+    for key, metrics in current.items():
+        if key not in baseline:
+            print(f"{key}: no baseline")
+            continue
+        deltas = []
+        for metric, higher_is_better in METRICS.items():
+            old, new = baseline[key].get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+            worse = -change if higher_is_better else change
+            flag = ""
+            # Tiny absolute numbers (0 -> 1 wrong port, 0.1 ms) are noise, not a trend
+            if worse > tolerance and abs(new - old) > 1:
+                flag = " REGRESSION"
+                regressed = True
+            deltas.append(f"{metric} {old:.1f}->{new:.1f} ({change:+.0%}){flag}")
+        print(f"{key}\n    " + "\n    ".join(deltas))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PortScanner benchmark on a local loopback fleet")
+    parser.add_argument("--engine", nargs="+", default=["thread", "async"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[50, 200, 1000],
+                        help="threads (thread engine) / max_inflight (async engine)")
+    parser.add_argument("--timeout", nargs="+", type=float, default=[0.3])
+    parser.add_argument("--ports", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--density", nargs="+", type=float, default=[0.01, 0.1],
+                        help="fraction of ports that are open")
+    parser.add_argument("--filtered", type=float, default=0.005, help="fraction of ports blackholed")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="banner delay of slow ports")
+    parser.add_argument("--base-port", type=int, default=20000)
+    parser.add_argument("--quick", action="store_true", help="small matrix for a smoke run")
+    parser.add_argument("--save", metavar="NAME", help="save results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="compare against baseline NAME")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.quick:
+        args.concurrency, args.ports, args.density = [200], [1000], [0.01]
+
+    results = run_matrix(args)
+
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save}.json"
+        path.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"Saved baseline to {path}")
+
+    if args.compare:
+        path = BASELINE_DIR / f"{args.compare}.json"
+        baseline = json.loads(path.read_text())
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+cli.py start-up benchmark
+
+Times whole `python cli.py ...` processes, since for short scans fired
+from cron most of the wall time is interpreter start-up and imports:
+
+    help   python cli.py --help          (argument parsing only)
+    scan   python cli.py 127.0.0.1 -p N  (one closed loopback port)
+
+It also runs the scan once under -X importtime to list the slowest
+imports and to check that no Qt module is loaded.
+
+Usage:
+    python benchmarks/bench_startup.py                 # 20 runs each
+    python benchmarks/bench_startup.py --budget-ms 150 # exit 1 if the scan median is slower
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+CLI = Path(__file__).resolve().parent.parent / "cli.py"
+
+
+def _closed_port() -> int:
+    """A loopback port nothing listens on (bound once, then released)"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _time_runs(cmd: list, runs: int) -> list:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="")  # Time warm .pyc caches
+    samples = []
+    for _ in range(runs + 1):  # The first run writes bytecode caches
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples[1:]
+
+
+def _import_profile(cmd: list) -> list:
+    """(cumulative_us, module) for every import of one run, slowest first"""
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + cmd[1:],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = (part.strip() for part in line.split("|"))
+        if cumulative.isdigit():
+            imports.append((int(cumulative), module))
+    return sorted(imports, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start-up time of the headless CLI")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, help="fail if the scan median exceeds this")
+    args = parser.parse_args()
+
+    cases = {
+        "help": [sys.executable, str(CLI), "--help"],
+        "scan": [sys.executable, str(CLI), "127.0.0.1", "-p", str(_closed_port()), "-q", "--all"],
+    }
+    medians = {}
+    for name, cmd in cases.items():
+        samples = _time_runs(cmd, args.runs)
+        medians[name] = statistics.median(samples)
+        print(f"{name:<6} median {medians[name]:7.1f} ms  min {min(samples):7.1f} ms  "
+              f"max {max(samples):7.1f} ms  ({args.runs} runs)")
+
+    imports = _import_profile(cases["scan"])
+    print("\nSlowest imports (cumulative) of one scan run:")
+    for cumulative, module in imports[:args.top]:
+        print(f"  {cumulative / 1000:7.1f} ms  {module}")
+
+    qt = sorted({module for _, module in imports if module.startswith("PyQt")})
+    if qt:
+        print(f"\nFAIL: Qt imported: {', '.join(qt)}")
+        sys.exit(1)
+    if args.budget_ms is not None and medians["scan"] > args.budget_ms:
+        print(f"\nFAIL: scan median {medians['scan']:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Local stand-in fleet for scanner benchmarks
+
+Everything runs on loopback in one selector thread, so the fleet's own
+cost stays small and predictable. Within a block of ports it sets up:
+
+    open      listeners that accept and close (optionally with a banner)
+    slow      listeners that send their banner after a delay
+    chatty    listeners that send a large burst as soon as they accept
+    filtered  "blackholed" listeners: backlog 0 and already full, so new
+              SYNs are dropped and connects time out
+    closed    everything else in the block (nothing bound, so RST)
+
+Ports that turn out to be in use on this machine are left out of the
+expected map rather than failing the run.
+"""
+import heapq
+import random
+import selectors
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class LocalFleet:
+    def __init__(self, port_count: int, open_ratio: float = 0.01, filtered_ratio: float = 0.005,
+                 slow_ratio: float = 0.2, chatty_ratio: float = 0.1, slow_delay: float = 0.5,
+                 base_port: int = 20000, host: str = "127.0.0.1", seed: int = 1234):
+        """
+        Args:
+            port_count: Size of the port block to populate
+            open_ratio: Fraction of the block that accepts connections
+            filtered_ratio: Fraction of the block that drops SYNs
+            slow_ratio: Fraction of open ports with a delayed banner
+            chatty_ratio: Fraction of open ports that flood data on accept
+            slow_delay: Banner delay of slow ports in seconds
+            base_port: First port of the block
+            host: Loopback address to bind
+            seed: RNG seed, so the same settings build the same fleet
+        """
+        self.host = host
+        self.ports = list(range(base_port, base_port + port_count))
+        self.slow_delay = slow_delay
+        self.expected: Dict[int, str] = {}
+        self._rng = random.Random(seed)
+        self._selector = selectors.DefaultSelector()
+        self._sockets: List[socket.socket] = []
+        self._timers = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        shuffled = self.ports[:]
+        self._rng.shuffle(shuffled)
+        n_open = int(port_count * open_ratio)
+        n_filtered = int(port_count * filtered_ratio)
+        self._open_ports = shuffled[:n_open]
+        self._filtered_ports = shuffled[n_open:n_open + n_filtered]
+        self._slow = set(self._open_ports[:int(n_open * slow_ratio)])
+        self._chatty = set(self._open_ports[int(n_open * slow_ratio):int(n_open * (slow_ratio + chatty_ratio))])
+
+    def start(self) -> "LocalFleet":
+        for port in self._open_ports:
+            listener = self._bind(port, backlog=128)
+            if listener is None:
+                continue
+            listener.setblocking(False)
+            self._selector.register(listener, selectors.EVENT_READ, port)
+            self.expected[port] = "open"
+        for port in self._filtered_ports:
+            if self._blackhole(port):
+                self.expected[port] = "filtered"
+        for port in self.ports:
+            if port not in self.expected and self._is_free(port):
+                self.expected[port] = "closed"
+        self._thread = threading.Thread(target=self._serve, name="fleet", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        for s in self._sockets:
+            s.close()
+        self._selector.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _bind(self, port: int, backlog: int) -> Optional[socket.socket]:
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            s.bind((self.host, port))
+            s.listen(backlog)
+        except OSError:
+            s.close()
+            return None
+        self._sockets.append(s)
+        return s
+
+    def _blackhole(self, port: int) -> bool:
+        """Listener whose accept queue is full, so further SYNs are dropped"""
+        listener = self._bind(port, backlog=0)
+        if listener is None:
+            return False
+        for _ in range(3):
+            filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            filler.setblocking(False)
+            try:
+                filler.connect((self.host, port))
+            except (BlockingIOError, OSError):
+                pass
+            self._sockets.append(filler)
+        return True
+
+    def _is_free(self, port: int) -> bool:
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            s.bind((self.host, port))
+            return True
+        except OSError:
+            return False
+        finally:
+            s.close()
+
+    def _serve(self) -> None:
+        while not self._stop.is_set():
+            timeout = 0.05
+            if self._timers:
+                timeout = max(0.0, min(timeout, self._timers[0][0] - time.monotonic()))
+            for key, _ in self._selector.select(timeout):
+                try:
+                    conn, _ = key.fileobj.accept()
+                except OSError:
+                    continue
+                self._handle(key.data, conn)
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, conn, payload = heapq.heappop(self._timers)
+                self._send_and_close(conn, payload)
+
+    def _handle(self, port: int, conn: socket.socket) -> None:
+        banner = f"SSH-2.0-fleet_{port}\r\n".encode()
+        if port in self._slow:
+            heapq.heappush(self._timers, (time.monotonic() + self.slow_delay, id(conn), conn, banner))
+        elif port in self._chatty:
+            self._send_and_close(conn, banner + b"x" * 65536)
+        else:
+            self._send_and_close(conn, banner)
+
+    @staticmethod
+    def _send_and_close(conn: socket.socket, payload: bytes) -> None:
+        try:
+            conn.setblocking(False)
+            conn.send(payload)
+        except OSError:
+            pass
+        finally:
+            conn.close()
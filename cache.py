@@ -0,0 +1,185 @@
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Get the directory where this script is located
+APP_DIR = Path(__file__).resolve().parent
+
+Port_Cache = "CREATE TABLE IF NOT EXISTS port_cache ( IP TEXT, Port INTEGER, Status TEXT, Banner TEXT, Checked_At REAL, PRIMARY KEY (IP, Port) ) WITHOUT ROWID"
+
+
+class ResultCache:
+    """
+    TTL cache of per-port results keyed by (ip, port)
+
+    Entries live in a size-bounded LRU in memory and are persisted to the
+    port_cache table in data.db, so a rescan in a later run can skip ports
+    that were checked recently. A host's rows are loaded the first time the
+    host is planned.
+
+    Modes (see plan()):
+        "ttl":  reuse any entry younger than ttl, probe the rest
+        "fast": probe previously open ports first, skip ports confirmed
+                closed within ttl except a random sample_rate fraction,
+                probe everything else
+    """
+
+    MODES = ("ttl", "fast")
+
+    def __init__(self, db_path: str = None, ttl: float = 3600, max_entries: int = 1_000_000,
+                 mode: str = "ttl", sample_rate: float = 0.05, retention: float = 7 * 86400):
+        """
+        Args:
+            db_path: SQLite file (default: data.db next to this script), or
+                ":memory:" for a cache that does not persist
+            ttl: Seconds a cached result stays trustworthy
+            max_entries: Max entries kept in memory and on disk
+            mode: "ttl" or "fast"
+            sample_rate: Fraction of recently-closed ports still re-probed in fast mode
+            retention: Seconds rows are kept on disk (old open ports still
+                steer fast rescans after their ttl runs out)
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cache mode '{mode}', expected one of {self.MODES}")
+        if db_path is None:
+            db_path = str(APP_DIR / "data.db")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.retention = retention
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[str, Optional[str], float]]" = OrderedDict()
+        self._dirty = set()
+        self._loaded_hosts = set()
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(Port_Cache)
+        self.conn.commit()
+
+    def get(self, ip: str, port: int) -> Optional[Dict]:
+        """Fresh cached result for a port, or None"""
+        self._load_host(ip)
+        with self._lock:
+            entry = self._entries.get((ip, port))
+            if entry is None or time.time() - entry[2] > self.ttl:
+                return None
+            self._entries.move_to_end((ip, port))
+        return self._as_result(port, entry)
+
+    def store(self, ip: str, result: Dict) -> None:
+        """Remember a freshly probed port result"""
+        key = (ip, result["port"])
+        with self._lock:
+            self._entries[key] = (result["status"], result.get("banner"), time.time())
+            self._entries.move_to_end(key)
+            self._dirty.add(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._dirty.discard(evicted)
+
+    def plan(self, ip: str, ports: Iterable[int]) -> Tuple[List[Dict], List[int]]:
+        """
+        Split a port list into results answered from the cache and ports
+        that still need probing, in the order they should be probed
+
+        Returns:
+            (cached_results, ports_to_probe)
+        """
+        self._load_host(ip)
+        now = time.time()
+        cached, was_open, to_probe = [], [], []
+        with self._lock:
+            for port in ports:
+                entry = self._entries.get((ip, port))
+                if entry is None:
+                    to_probe.append(port)
+                    continue
+                status, _, checked_at = entry
+                fresh = now - checked_at <= self.ttl
+                if self.mode == "fast":
+                    if status == "open":
+                        was_open.append(port)  # Always re-verified, and first
+                    elif status == "closed" and fresh and random.random() >= self.sample_rate:
+                        cached.append(self._as_result(port, entry))
+                    else:
+                        to_probe.append(port)
+                elif fresh:
+                    cached.append(self._as_result(port, entry))
+                else:
+                    to_probe.append(port)
+        return cached, was_open + to_probe
+
+    def flush(self) -> None:
+        """Write new results to disk and prune old rows"""
+        with self._lock:
+            rows = [(ip, port) + self._entries[(ip, port)]
+                    for ip, port in self._dirty if (ip, port) in self._entries]
+            self._dirty.clear()
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO port_cache (IP, Port, Status, Banner, Checked_At) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self.conn.execute("DELETE FROM port_cache WHERE Checked_At < ?",
+                                  (time.time() - self.retention,))
+                total = self.conn.execute("SELECT COUNT(*) FROM port_cache").fetchone()[0]
+                if total > self.max_entries:
+                    self.conn.execute(
+                        "DELETE FROM port_cache WHERE (IP, Port) IN (SELECT IP, Port FROM port_cache ORDER BY Checked_At LIMIT ?)",
+                        (total - self.max_entries,)
+                    )
+        except Exception as e:
+            print(f"Error saving result cache: {e}")
+
+    def clear(self) -> None:
+        """Forget every cached result, in memory and on disk"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty.clear()
+            self._loaded_hosts.clear()
+        with self.conn:
+            self.conn.execute("DELETE FROM port_cache")
+
+    def _load_host(self, ip: str) -> None:
+        """Pull a host's persisted rows into memory the first time it is seen"""
+        if ip in self._loaded_hosts:
+            return
+        cursor = self.conn.execute(
+            "SELECT Port, Status, Banner, Checked_At FROM port_cache WHERE IP = ? AND Checked_At >= ?",
+            (ip, time.time() - self.retention)
+        )
+        rows = cursor.fetchall()
+        with self._lock:
+            self._loaded_hosts.add(ip)
+            for port, status, banner, checked_at in rows:
+                # Never let a stale disk row replace a newer in-memory one
+                if (ip, port) not in self._entries:
+                    self._entries[(ip, port)] = (status, banner, checked_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _as_result(port: int, entry) -> Dict:
+        status, banner, _ = entry
+        if status == "open":
+            return {"port": port, "status": status, "banner": banner}
+        return {"port": port, "status": status}
+
+    def close(self):
+        """Flush and close the database connection"""
+        try:
+            if self.conn:
+                self.flush()
+                self.conn.close()
+                self.conn = None
+        except Exception as e:
+            print(f"Error closing result cache: {e}")
+
+    def __del__(self):
+        """Cleanup on deletion"""
+        self.close()
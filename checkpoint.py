@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from results import ScanResult, format_port_ranges, parse_port_ranges
+
+# Bump when the file layout changes; older files are ignored
+CHECKPOINT_VERSION = 1
+
+
+class ScanCheckpoint:
+    """
+    Finished (host, port) results of a scan, saved to a JSON file so an
+    interrupted or cancelled sweep can resume instead of starting over
+
+    A checkpoint belongs to one (targets, ports) pair: loading it for a
+    different scan starts fresh. Each host is kept as a ScanResult and
+    written as per-status port ranges plus open-port banners, so even a
+    full-range sweep of a /16 stays small. Saves happen at most every
+    interval seconds as results are recorded, and on pause, cancel and
+    exit; a completed scan deletes the file.
+    """
+
+    def __init__(self, path: str, targets: Iterable[str], ports: Iterable[int],
+                 interval: float = 10.0):
+        """
+        Args:
+            path: Checkpoint file
+            targets: What is being scanned (as passed to scan / scan_many)
+            ports: Ports scanned on every host
+            interval: Minimum seconds between periodic saves
+        """
+        self.path = Path(path)
+        self.interval = interval
+        self.key = self._scan_key(targets, ports)
+        self.hosts: Dict[str, ScanResult] = {}
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+        self.resumed = self._load()
+
+    @staticmethod
+    def _scan_key(targets: Iterable[str], ports: Iterable[int]) -> str:
+        """Fingerprint of the scan a checkpoint belongs to"""
+        spec = json.dumps([list(targets), format_port_ranges(ports)])
+        return hashlib.sha1(spec.encode()).hexdigest()
+
+    def host(self, ip: str, target: str = "", timestamp_utc: str = "") -> ScanResult:
+        """The ScanResult collecting a host's finished ports (created if new)"""
+        with self._lock:
+            if ip not in self.hosts:
+                self.hosts[ip] = ScanResult(target, ip, timestamp_utc)
+            return self.hosts[ip]
+
+    def remaining(self, ip: str, ports: Iterable[int]) -> List[int]:
+        """Ports of the scan that have no result for this host yet"""
+        done = self.hosts.get(ip)
+        if done is None:
+            return list(ports)
+        return [port for port in ports if done.status_of(port) is None]
+
+    def record(self, ip: str, result: Dict) -> None:
+        """Add one port result dict and save if the interval has passed"""
+        with self._lock:
+            self.hosts[ip].add_result(result)
+        self._maybe_save()
+
+    def merge(self, ip: str, results: ScanResult) -> None:
+        """Add a finished shard of a host and save if the interval has passed"""
+        with self._lock:
+            self.hosts[ip].update(results)
+        self._maybe_save()
+
+    def _maybe_save(self) -> None:
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save()
+
+    def save(self) -> None:
+        """Write every finished port to disk (atomically)"""
+        with self._lock:
+            self._last_save = time.monotonic()
+            hosts = {}
+            for ip, result in self.hosts.items():
+                entry = {"target": result.target, "timestamp_utc": result.timestamp_utc,
+                         "open": {str(port): result.banner_of(port) for port in result.ports("open")}}
+                for status in ("closed", "filtered"):
+                    entry[status] = ",".join(result.compress_port_ranges(status))
+                hosts[ip] = entry
+            data = {"version": CHECKPOINT_VERSION, "key": self.key,
+                    "saved_at": time.time(), "hosts": hosts}
+        try:
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            tmp_path.write_text(json.dumps(data))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving scan checkpoint: {e}")
+
+    def discard(self) -> None:
+        """Remove the file once the scan has completed"""
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing scan checkpoint: {e}")
+
+    def _load(self) -> bool:
+        """Pick up a matching checkpoint file; True if there was one"""
+        try:
+            data = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable scan checkpoint: {e}")
+            return False
+        if data.get("version") != CHECKPOINT_VERSION or data.get("key") != self.key:
+            return False  # Left over from a different scan
+
+        for ip, entry in data["hosts"].items():
+            result = ScanResult(entry["target"], ip, entry["timestamp_utc"])
+            for port, banner in entry["open"].items():
+                result.add(int(port), "open", banner)
+            for status in ("closed", "filtered"):
+                for start, end in parse_port_ranges(entry[status]):
+                    result.add_range(start, end, status)
+            self.hosts[ip] = result
+        return True
+
@@ -0,0 +1,271 @@
+"""
+Headless command line front end for PortScanner (no Qt)
+
+Usage:
+    python -m cli 192.168.1.1 -p 1-1024
+    python -m cli 10.0.0.0/24 -p web --all --format jsonl
+    python -m cli --profile nightly --checkpoint nightly.json
+    python -m cli 10.0.0.0/24 -p 1-65535 --all -o sweep.rpsr
+
+Port results go to stdout as they arrive (open ports only unless --all),
+one line each, so the output can be piped or grepped; with -o they are
+written to a JSON Lines, CSV or binary file instead (see exporters.py). Scanner progress and
+summaries go to stderr. Exit status is 0 when the scan completed, 1 when
+it failed or a target did not resolve, 2 on bad arguments and 130 when
+interrupted.
+
+Start-up is kept short for cron jobs that fire many small scans: only
+argparse is imported at module level, and the scanner, the profile
+database and json are imported once they are needed (see
+benchmarks/bench_startup.py).
+"""
+import argparse
+import contextlib
+import os
+import signal
+import sys
+import threading
+import time
+
+FORMATS = ("text", "jsonl")
+
+# Exit statuses
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INTERRUPTED = 130
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m cli",
+        description="Scan TCP ports without the GUI; results stream to stdout")
+    parser.add_argument("targets", nargs="*",
+                        help="IPs, hostnames, CIDR blocks or ranges (e.g. 10.0.0.1-20)")
+    parser.add_argument("-p", "--ports",
+                        help='ports or a preset, e.g. "22,80,8000-8100", "web" or "top100" '
+                             "(default: the common services list)")
+    parser.add_argument("--profile", metavar="NAME",
+                        help="use a saved profile's target, ports, timeout and threads; "
+                             "other options override it")
+    parser.add_argument("--save-profile", metavar="NAME",
+                        help="save this scan's target, ports, timeout and threads as a profile")
+    parser.add_argument("--list-profiles", action="store_true", help="list saved profiles and exit")
+    parser.add_argument("-t", "--timeout", type=float, help="connect timeout in seconds (default 0.6)")
+    parser.add_argument("-T", "--threads", type=int,
+                        help="concurrent connects for the thread engine (default 200)")
+    parser.add_argument("--engine", default="thread", help="thread or async (default thread)")
+    parser.add_argument("--max-inflight", type=int, default=1000,
+                        help="concurrent connects for the async engine")
+    parser.add_argument("--timing", default="fixed", help="fixed or adaptive")
+    parser.add_argument("--concurrency", default="static", help="static or aimd")
+    parser.add_argument("--order", default="sequential",
+                        help="sequential, or frequency to probe the most-likely-open ports first")
+    parser.add_argument("--max-open", type=int, metavar="N",
+                        help="stop a host's scan once N open ports are found")
+    parser.add_argument("--no-discovery", action="store_true",
+                        help="scan every target; by default multi-host scans first ping each host "
+                             "on a few common ports and skip those that don't answer")
+    parser.add_argument("--probe", action="store_true",
+                        help="identify services on open ports with protocol probes (HTTP, TLS, ...)")
+    parser.add_argument("-a", "--all", action="store_true", help="also print closed and filtered ports")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="text",
+                        help="text columns or one JSON object per line")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="write results to FILE instead of stdout; the format comes from "
+                             "the extension (.jsonl, .csv or .rpsr binary)")
+    parser.add_argument("--checkpoint", metavar="FILE",
+                        help="save progress to FILE; rerunning the same scan resumes it")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write scan metrics to FILE (Prometheus text if it ends in .prom, else JSON)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress or summary on stderr")
+    return parser
+
+
+class ResultWriter:
+    """Streams port results to stdout in the chosen format, or to an exporter"""
+
+    def __init__(self, out, fmt: str, show_all: bool, service_name, export=None):
+        self.out = out
+        self.fmt = fmt
+        self.show_all = show_all
+        self.service_name = service_name
+        self.export = export  # exporters writer for -o, replaces stdout
+        if fmt == "jsonl":
+            import json
+            self._dumps = json.dumps
+
+    def write(self, host: str, result: dict) -> None:
+        status = result["status"]
+        if status != "open" and not self.show_all:
+            return
+        port = result["port"]
+        banner = result.get("banner")
+        service = result.get("service") or self.service_name(port)  # Identified by probes, else by port
+        if self.export is not None:
+            self.export.write(host, port, status, service or None, banner)
+            return
+        if self.fmt == "jsonl":
+            line = self._dumps({"host": host, "port": port, "status": status,
+                                "service": service, "banner": banner})
+        else:
+            line = f"{host}\t{port}/tcp\t{status}\t{service or '-'}"
+            if banner:
+                line += "\t" + " ".join(banner.split())  # One line: no tabs, CRs or newlines
+        try:
+            self.out.write(line + "\n")
+            self.out.flush()  # Stream, even into a pipe
+        except BrokenPipeError:
+            # Reader went away (e.g. "| head"); stop quietly like other CLI tools
+            os.dup2(os.open(os.devnull, os.O_WRONLY), self.out.fileno())
+            raise SystemExit(EXIT_OK)
+
+    def write_host(self, ip: str, results) -> None:
+        """Every port of a finished host (a ScanResult), in port order"""
+        statuses = ("open", "closed", "filtered") if self.show_all else ("open",)
+        rows = [row for status in statuses for row in results.port_dicts(status)]
+        for row in sorted(rows, key=lambda row: row["port"]):
+            self.write(ip, row)
+
+
+def _load_profile(name: str, parser: argparse.ArgumentParser):
+    from profiles import Profile_Manager
+    manager = Profile_Manager()
+    try:
+        profile = manager.load_profile(name)
+    finally:
+        manager.close()
+    if profile is None:
+        parser.error(f"no profile named '{name}'")
+    return profile
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.list_profiles:
+        from profiles import Profile_Manager
+        manager = Profile_Manager()
+        try:
+            for name in manager.list_profiles():
+                print(name)
+        finally:
+            manager.close()
+        return EXIT_OK
+
+    profile = _load_profile(args.profile, parser) if args.profile else None
+    targets = " ".join(args.targets) or (profile["TargetIP"] if profile else "")
+    if not targets:
+        parser.error("give a target or --profile")
+
+    from portscan import PortScanner
+    from portspec import PortSpec
+
+    for option, allowed in (("engine", PortScanner.ENGINES), ("timing", PortScanner.TIMINGS),
+                            ("concurrency", PortScanner.CONCURRENCY_MODES),
+                            ("order", PortScanner.PORT_ORDERS)):
+        if getattr(args, option) not in allowed:
+            parser.error(f"--{option} must be one of {', '.join(allowed)}")
+
+    timeout = args.timeout or (profile["Timeout"] if profile else None) or 0.6
+    threads = args.threads or (profile["Threads"] if profile else None) or 200
+    scanner = PortScanner(timeout=timeout, threads=threads, engine=args.engine,
+                          max_inflight=args.max_inflight, timing=args.timing,
+                          concurrency=args.concurrency, metrics=bool(args.metrics),
+                          port_order=args.order, service_probes=args.probe)
+
+    if args.ports:
+        ports = scanner.parse_ports(args.ports)
+    elif profile:
+        ports = profile["Port_Selection"]
+    else:
+        ports = PortSpec.from_ports(PortScanner.COMMON_SERVICES)
+    if not ports:
+        parser.error(f"no valid ports in '{args.ports}'")
+    hosts = scanner.parse_targets(targets)
+    if not hosts:
+        parser.error(f"no valid targets in '{targets}'")
+    if args.max_open is not None and len(hosts) > 1:
+        parser.error("--max-open applies to single-host scans")
+
+    if args.save_profile:
+        from profiles import Profile_Manager
+        manager = Profile_Manager()
+        try:
+            manager.save_profile(args.save_profile, targets, ports, timeout, threads)
+        except ValueError as e:
+            parser.error(str(e))
+        finally:
+            manager.close()
+
+    export = None
+    if args.output:
+        from exporters import open_writer
+        try:
+            export = open_writer(args.output)
+        except ValueError as e:
+            parser.error(str(e))
+        except OSError as e:
+            print(f"Error opening {args.output}: {e}", file=sys.stderr)
+            return EXIT_FAILED
+    writer = ResultWriter(sys.stdout, args.format, args.all, scanner.get_service_name, export)
+
+    # First Ctrl-C cancels cleanly (partial results, checkpoint saved); a
+    # second one aborts. cancel() runs on its own thread so the handler
+    # never waits on a lock the interrupted code holds.
+    interrupted = threading.Event()
+
+    def on_interrupt(signum, frame):
+        interrupted.set()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        threading.Thread(target=scanner.cancel, daemon=True).start()
+
+    signal.signal(signal.SIGINT, on_interrupt)
+
+    # The scanner logs with print(); keep stdout for results only
+    log = open(os.devnull, "w") if args.quiet else sys.stderr
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log):
+            if len(hosts) == 1:
+                scanner.set_result_callback(lambda result: writer.write(hosts[0], result))
+                scan = scanner.scan(hosts[0], ports, checkpoint=args.checkpoint,
+                                    max_open=args.max_open)
+            else:
+                scan = scanner.scan_many(hosts, ports, host_callback=writer.write_host,
+                                         checkpoint=args.checkpoint, discover=not args.no_discovery)
+    finally:
+        if export is not None:
+            export.close()
+        if args.quiet:
+            log.close()
+
+    if args.metrics and scanner.metrics is not None:
+        _write_metrics(args.metrics, scanner.metrics)
+
+    if interrupted.is_set():
+        return EXIT_INTERRUPTED
+    if not scan["success"]:
+        print(f"Error: {scan['error']}", file=sys.stderr)
+        return EXIT_FAILED
+    if not args.quiet:
+        print(f"Done in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    if len(hosts) > 1 and scan["results"]["unresolved"]:
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+def _write_metrics(path: str, metrics) -> None:
+    try:
+        with open(path, "w") as f:
+            if path.endswith(".prom"):
+                f.write(metrics.to_prometheus())
+            else:
+                import json
+                json.dump(metrics.to_dict(), f, indent=2)
+    except OSError as e:
+        print(f"Error writing metrics: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,739 @@
+"""
+Distributed scanning: one coordinator, many worker processes or nodes
+
+    python -m distributed coordinator 10.0.0.0/16 -p 1-1024 --listen 0.0.0.0:7878
+    python -m distributed worker coordinator-host:7878 --slots 4     # on each node
+    python -m distributed coordinator 127.0.0.1 -p 1-65535 --local-workers 4
+
+Workers connect to the coordinator and speak newline-delimited JSON over
+TCP. The coordinator splits the scan into (host, port range) work units and
+workers pull them: each announces how many units it runs at once, and gets
+a new one whenever one finishes, so faster nodes take more of the scan.
+Results stream back in batches while a unit runs. When the queue is empty,
+an idle worker steals from the straggler with the most ports left: it gets
+that unit's remaining ports in reverse order, so the two scan towards each
+other and the unit completes when they meet. Units of a worker that
+disconnects or stops sending heartbeats go back on the queue, minus the
+ports it already reported.
+
+Messages (one JSON object per line, "type" says which):
+    worker -> coordinator
+        hello      {"version", "name", "slots", "token"}
+        results    {"id", "results": [[port, status, banner, service], ...]}
+        done       {"id", "metrics", "error"}   (also after a cancel)
+        heartbeat  {}
+    coordinator -> worker
+        welcome    {"settings"}  PortScanner constructor arguments
+        unit       {"id", "host", "ports": "1-1024,8080", "reverse"}
+        cancel     {"id"}        another worker finished the unit
+        bye        {}            scan finished; the worker disconnects
+        error      {"error"}     hello rejected
+"""
+import argparse
+import asyncio
+import contextlib
+import hmac
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from metrics import ScanMetrics
+from portscan import PortScanner
+from portspec import PortSpec
+from results import ScanResult, format_port_ranges
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 7878
+
+# Longest protocol line accepted (a results batch with long banners)
+MAX_LINE = 4 * 1024 * 1024
+
+# A worker sends a results batch once it holds this many results or the
+# oldest one has waited this long
+BATCH_SIZE = 256
+BATCH_INTERVAL = 0.2
+
+# Timeout of a worker's connect to the coordinator. Once connected the
+# socket blocks without one: units can run for minutes between messages,
+# and a dead link is caught by heartbeats instead
+CONNECT_TIMEOUT = 10.0
+
+
+class _Unit:
+    """One (host, port range) work unit and the workers running it"""
+
+    __slots__ = ("id", "ip", "remaining", "owners", "attempts", "complete", "started")
+
+    def __init__(self, unit_id: int, ip: str, ports: List[int]):
+        self.id = unit_id
+        self.ip = ip
+        self.remaining = set(ports)  # Ports no worker has reported yet
+        self.owners = set()  # _WorkerLinks running it
+        self.attempts = 0
+        self.complete = False
+        self.started = 0.0  # When its current owner got it
+
+
+class _WorkerLink:
+    """Coordinator side of one worker connection"""
+
+    def __init__(self, name: str, slots: int, writer: asyncio.StreamWriter):
+        self.name = name
+        self.slots = slots
+        self.writer = writer
+        self.units = set()  # Ids of units it runs, until it reports done
+        self.last_seen = time.monotonic()
+
+    @property
+    def free_slots(self) -> int:
+        return self.slots - len(self.units)
+
+    def send(self, msg: Dict) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(json.dumps(msg).encode() + b"\n")
+
+
+class Coordinator:
+    """
+    Splits a scan into (host, port range) units and hands them out to
+    workers that connect over TCP (see Worker and the module docstring)
+
+    The scanner passed in supplies target parsing, name resolution and the
+    settings every worker scans with. run() blocks until every unit is
+    done and returns the same shape as PortScanner.scan_many().
+    """
+
+    def __init__(self, scanner: Optional[PortScanner] = None, host: str = "0.0.0.0",
+                 port: int = DEFAULT_PORT, unit_size: int = 1024, token: Optional[str] = None,
+                 heartbeat_timeout: float = 15.0, max_attempts: int = 3, steal_min: int = 16,
+                 steal_after: float = 1.0):
+        """
+        Args:
+            scanner: Template scanner (default PortScanner())
+            host: Address to listen on for workers
+            port: Port to listen on (0 picks a free one; see address)
+            unit_size: Max ports per work unit
+            token: Shared secret workers must present
+            heartbeat_timeout: Seconds of silence after which a worker is
+                treated as dead and its units re-queued
+            max_attempts: Times a unit is handed out again after its worker
+                died or failed before it is given up
+            steal_min: Idle workers only steal from units with at least this
+                many ports left
+            steal_after: ... and that have been running this many seconds,
+                so short units are not scanned twice
+        """
+        self.scanner = scanner or PortScanner()
+        self.host = host
+        self.port = port
+        self.unit_size = max(1, unit_size)
+        self.token = token
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.steal_min = steal_min
+        self.steal_after = steal_after
+        self.progress_callback: Optional[Callable] = None
+        # (host, port) actually listened on, set once run() is accepting workers
+        self.address: Optional[Tuple[str, int]] = None
+        self.listening = threading.Event()
+        self._cancelled = threading.Event()
+
+    def set_progress_callback(self, callback: Callable[[int, int], None]) -> None:
+        """Called with (scanned, total) as results arrive"""
+        self.progress_callback = callback
+
+    def cancel(self) -> None:
+        """Stop handing out work and cancel running units (thread-safe)"""
+        self._cancelled.set()
+
+    def run(self, targets: Union[str, Iterable[str]], ports: List[int],
+            host_callback: Optional[Callable[[str, ScanResult], None]] = None,
+            local_workers: int = 0, worker_slots: int = 2) -> Dict:
+        """
+        Scan targets with whatever workers connect
+
+        Args:
+            targets: As for PortScanner.scan_many
+            ports: Ports to scan on every host
+            host_callback: Called with (ip, host_results) once a host is done
+            local_workers: Worker processes to start on this machine
+            worker_slots: Concurrent units per local worker
+
+        Returns:
+            Dict shaped like scan_many()'s; results["workers"] maps each
+            worker name to the units it finished
+        """
+        self._cancelled.clear()
+        return asyncio.run(self._run(targets, ports, host_callback, local_workers, worker_slots))
+
+    async def _run(self, targets, ports, host_callback, local_workers, worker_slots) -> Dict:
+        hosts = self.scanner.parse_targets(targets)
+        if not hosts:
+            error = f"No valid targets in {targets!r}"
+            print(f"[Coordinator ERROR] {error}")
+            return {"success": False, "error": error, "results": None, "metrics": None}
+
+        start_time = datetime.utcnow()
+        timestamp = start_time.strftime("%Y%m%dT%H%M%SZ")
+        # Units are cut in scan order, so with port_order="frequency" the
+        # most-likely-open ports go out in the first units
+        ports = self.scanner.order_ports(PortSpec.from_ports(ports))
+        self._host_callback = host_callback
+        self._start_time = start_time
+        self._metrics = ScanMetrics() if self.scanner.collect_metrics else None
+        self._links = set()
+        self._handlers = set()  # One task per worker connection
+        self._worker_stats: Dict[str, int] = {}
+        self._queue = deque()
+        self._units: Dict[int, _Unit] = {}
+        self._partial: Dict[str, ScanResult] = {}
+        self._host_pending: Dict[str, int] = {}
+        self._hosts_results: Dict[str, ScanResult] = {}
+        self._failed: List[str] = []
+        self._stranded: Optional[str] = None  # Set if every worker left with units unfinished
+        self._no_workers_since: Optional[float] = None
+        self._scanned = 0
+        self._total = 0
+        self._finished = asyncio.Event()
+
+        server = await asyncio.start_server(self._serve_worker, self.host, self.port, limit=MAX_LINE)
+        self.address = server.sockets[0].getsockname()[:2]
+        self.listening.set()
+        print(f"[Coordinator] Listening for workers on {self.address[0]}:{self.address[1]}")
+        processes = _start_local_workers(self.address, local_workers, worker_slots, self.token)
+
+        try:
+            unresolved = await self._plan(hosts, ports, timestamp)
+            ticker = asyncio.create_task(self._tick())
+            if self._units:
+                await self._finished.wait()
+            ticker.cancel()
+        finally:
+            for link in list(self._links):
+                link.send({"type": "bye"})
+            server.close()
+            # Workers hang up after bye; cut off any that don't in time
+            if self._handlers:
+                _, stuck = await asyncio.wait(self._handlers, timeout=5.0)
+                for link in list(self._links):
+                    link.writer.transport.abort()
+                if stuck:
+                    await asyncio.wait(stuck)
+            await server.wait_closed()
+            self.listening.clear()
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+        duration = (datetime.utcnow() - start_time).total_seconds()
+        results = self._hosts_results
+        summary = {
+            "total_hosts": len(results),
+            "total_open": sum(r.count("open") for r in results.values()),
+            "total_closed": sum(r.count("closed") for r in results.values()),
+            "total_filtered": sum(r.count("filtered") for r in results.values())
+        }
+        if self._metrics is not None:
+            self._metrics.add_phase("scan", duration)
+        if self._cancelled.is_set():
+            error = "Scan cancelled"
+            print(f"[Coordinator] Scan cancelled: {summary['total_hosts']} hosts finished")
+        elif self._stranded:
+            error = self._stranded
+            print(f"[Coordinator ERROR] {error}")
+        elif self._failed:
+            error = f"Gave up on {len(self._failed)} work units: " + "; ".join(self._failed[:3])
+            print(f"[Coordinator ERROR] {error}")
+        else:
+            error = None
+            print(f"[Coordinator] Scan complete: {summary['total_hosts']} hosts, "
+                  f"{summary['total_open']} open ports in {duration:.2f}s "
+                  f"with {len(self._worker_stats)} workers")
+        return {
+            "success": error is None,
+            "error": error,
+            "results": {
+                "timestamp_utc": timestamp,
+                "duration_s": duration,
+                "hosts": results,
+                "unresolved": unresolved,
+                "summary": summary,
+                "workers": dict(self._worker_stats)
+            },
+            "metrics": self._metrics.to_dict() if self._metrics is not None else None
+        }
+
+    async def _plan(self, hosts: List[str], ports: List[int], timestamp: str) -> List[str]:
+        """Resolve every target and queue its units; returns the unresolved names"""
+        resolved = await asyncio.gather(*(self.scanner.resolver.resolve_async(h) for h in hosts))
+        unresolved = []
+        for name, addresses in zip(hosts, resolved):
+            ip = addresses[0] if addresses else None
+            if not ip:
+                print(f"[Coordinator] Failed to resolve {name}")
+                unresolved.append(name)
+                continue
+            if ip in self._partial:
+                continue  # Another name for a host already queued
+            self._partial[ip] = ScanResult(name, ip, timestamp)
+            self._host_pending[ip] = 0
+            for i in range(0, len(ports), self.unit_size):
+                unit = _Unit(len(self._units), ip, ports[i:i + self.unit_size])
+                self._units[unit.id] = unit
+                self._queue.append(unit)
+                self._host_pending[ip] += 1
+        self._total = len(self._partial) * len(ports)
+        print(f"[Coordinator] {len(self._units)} work units for {len(self._partial)} hosts")
+        self._dispatch()
+        return unresolved
+
+    # Worker connections
+
+    async def _serve_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        link = None
+        self._handlers.add(asyncio.current_task())
+        try:
+            hello = json.loads(await asyncio.wait_for(reader.readline(), self.heartbeat_timeout))
+            error = self._check_hello(hello)
+            if error:
+                writer.write(json.dumps({"type": "error", "error": error}).encode() + b"\n")
+                print(f"[Coordinator] Rejected worker: {error}")
+                return
+            name = str(hello.get("name") or "{}:{}".format(*writer.get_extra_info("peername")[:2]))
+            link = _WorkerLink(name, max(1, int(hello.get("slots", 1))), writer)
+            self._links.add(link)
+            self._worker_stats.setdefault(name, 0)
+            print(f"[Coordinator] Worker {name} joined with {link.slots} slots")
+            link.send({"type": "welcome", "settings": self.scanner.settings()})
+            self._dispatch()
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                link.last_seen = time.monotonic()
+                msg = json.loads(line)
+                kind = msg.get("type")
+                if kind == "results":
+                    self._on_results(msg)
+                elif kind == "done":
+                    self._on_done(link, msg)
+        except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, ValueError, KeyError, TypeError) as e:
+            print(f"[Coordinator] Lost worker {link.name if link else 'during hello'}: {e!r}")
+        finally:
+            if link is not None:
+                self._drop_worker(link)
+            writer.close()
+            self._handlers.discard(asyncio.current_task())
+
+    def _check_hello(self, hello: Dict) -> Optional[str]:
+        if hello.get("type") != "hello":
+            return "expected hello"
+        if hello.get("version") != PROTOCOL_VERSION:
+            return f"protocol version {hello.get('version')} != {PROTOCOL_VERSION}"
+        if self.token is not None and not hmac.compare_digest(str(hello.get("token") or ""), self.token):
+            return "bad token"
+        if self._finished.is_set():
+            return "scan already finished"
+        return None
+
+    def _drop_worker(self, link: _WorkerLink) -> None:
+        """Re-queue what a departed worker was running"""
+        self._links.discard(link)
+        requeued = 0
+        for unit_id in link.units:
+            unit = self._units[unit_id]
+            unit.owners.discard(link)
+            if not unit.complete and not unit.owners:
+                self._retry(unit, f"worker {link.name} died")
+                requeued += 1
+        link.units.clear()
+        if requeued and not self._finished.is_set():
+            print(f"[Coordinator] Worker {link.name} left; re-queued {requeued} units")
+        self._dispatch()
+
+    async def _tick(self) -> None:
+        """Watch for cancel() and silent workers, and let idle workers steal"""
+        while True:
+            await asyncio.sleep(0.25)
+            if self._cancelled.is_set():
+                for link in self._links:
+                    for unit_id in link.units:
+                        link.send({"type": "cancel", "id": unit_id})
+                self._finished.set()
+                return
+            now = time.monotonic()
+            for link in list(self._links):
+                if now - link.last_seen > self.heartbeat_timeout:
+                    print(f"[Coordinator] Worker {link.name} stopped responding")
+                    link.writer.transport.abort()  # Its reader sees EOF and drops it
+            if self._stranded_check(now):
+                return
+            self._dispatch()  # Units may have become old enough to steal
+
+    def _stranded_check(self, now: float) -> bool:
+        """
+        Fail the scan once no worker has been connected for
+        heartbeat_timeout seconds while units are unfinished, rather than
+        wait forever. Before any worker has joined, the coordinator waits.
+        """
+        if self._links or not self._worker_stats:
+            self._no_workers_since = None
+            return False
+        if self._no_workers_since is None:
+            self._no_workers_since = now
+            return False
+        if now - self._no_workers_since < self.heartbeat_timeout:
+            return False
+        unfinished = sum(1 for unit in self._units.values() if not unit.complete)
+        self._stranded = f"No workers left with {unfinished} work units unfinished"
+        self._finished.set()
+        return True
+
+    # Scheduling
+
+    def _dispatch(self) -> None:
+        """Fill every free worker slot from the queue, or by stealing"""
+        if self._finished.is_set() or self._cancelled.is_set():
+            return
+        for link in sorted(self._links, key=lambda link: -link.free_slots):
+            while link.free_slots > 0:
+                if self._queue:
+                    unit = self._queue.popleft()
+                    self._assign(link, unit, reverse=False)
+                    continue
+                victim = self._steal_candidate(link)
+                if victim is None:
+                    return  # Nothing left to hand out
+                self._assign(link, victim, reverse=True)
+
+    def _steal_candidate(self, thief: _WorkerLink) -> Optional[_Unit]:
+        """The single-owner running unit with the most ports left"""
+        best = None
+        started_before = time.monotonic() - self.steal_after
+        for other in self._links:
+            if other is thief:
+                continue
+            for unit_id in other.units:
+                unit = self._units[unit_id]
+                if (unit.complete or len(unit.owners) != 1 or unit.started > started_before
+                        or len(unit.remaining) < self.steal_min):
+                    continue
+                if best is None or len(unit.remaining) > len(best.remaining):
+                    best = unit
+        return best
+
+    def _assign(self, link: _WorkerLink, unit: _Unit, reverse: bool) -> None:
+        if not unit.owners:
+            unit.started = time.monotonic()
+        unit.owners.add(link)
+        link.units.add(unit.id)
+        link.send({"type": "unit", "id": unit.id, "host": unit.ip,
+                   "ports": format_port_ranges(unit.remaining), "reverse": reverse})
+
+    def _retry(self, unit: _Unit, reason: str) -> None:
+        """Put an unfinished, ownerless unit back on the queue (or give up)"""
+        unit.attempts += 1
+        if unit.attempts < self.max_attempts:
+            self._queue.appendleft(unit)
+            return
+        self._failed.append(f"{unit.ip} ports {format_port_ranges(unit.remaining)}: {reason}")
+        self._finish_unit(unit)
+
+    # Worker messages
+
+    def _on_results(self, msg: Dict) -> None:
+        unit = self._units[msg["id"]]
+        if unit.complete:
+            return  # A stolen unit's other half, already covered
+        host = self._partial[unit.ip]
+        remaining = unit.remaining
+        for port, status, banner, service in msg["results"]:
+            if port in remaining:  # First report of a port wins
+                remaining.discard(port)
+                host.add(port, status, banner, service)
+                self._scanned += 1
+        if self.progress_callback:
+            self.progress_callback(self._scanned, self._total)
+        if not remaining:
+            self._finish_unit(unit)
+
+    def _on_done(self, link: _WorkerLink, msg: Dict) -> None:
+        unit = self._units[msg["id"]]
+        link.units.discard(unit.id)
+        unit.owners.discard(link)
+        if self._metrics is not None and msg.get("metrics"):
+            self._metrics.merge(ScanMetrics.from_dict(msg["metrics"]))
+        if not unit.complete and not unit.owners and not self._finished.is_set():
+            if unit.remaining:
+                # The worker stopped short (scan error) and nobody else has it
+                reason = msg.get("error") or "unit ended early"
+                print(f"[Coordinator] Unit {unit.id} on {link.name} ended with "
+                      f"{len(unit.remaining)} ports left: {reason}")
+                self._retry(unit, reason)
+            else:
+                self._finish_unit(unit)
+        if msg.get("error") is None:
+            self._worker_stats[link.name] = self._worker_stats.get(link.name, 0) + 1
+        self._dispatch()
+
+    def _finish_unit(self, unit: _Unit) -> None:
+        unit.complete = True
+        for owner in unit.owners:
+            owner.send({"type": "cancel", "id": unit.id})  # Stop the other half of a steal
+        pending = self._host_pending[unit.ip] = self._host_pending[unit.ip] - 1
+        if pending == 0:
+            results = self._hosts_results[unit.ip] = self._partial.pop(unit.ip)
+            results.duration_s = (datetime.utcnow() - self._start_time).total_seconds()
+            if self._host_callback:
+                self._host_callback(unit.ip, results)
+        if all(u.complete for u in self._units.values()):
+            self._finished.set()
+
+
+class Worker:
+    """
+    Runs units for a Coordinator: each in its own PortScanner on its own
+    thread, up to slots at a time, streaming results back as they come
+    """
+
+    def __init__(self, address: Tuple[str, int], slots: int = 2, token: Optional[str] = None,
+                 name: Optional[str] = None, heartbeat: float = 2.0):
+        """
+        Args:
+            address: Coordinator (host, port)
+            slots: Units to run concurrently
+            token: Shared secret, if the coordinator requires one
+            name: Shown in coordinator logs and stats (default host:pid)
+            heartbeat: Seconds between keep-alive messages
+        """
+        self.address = address
+        self.slots = slots
+        self.token = token
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.heartbeat = heartbeat
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._scanners: Dict[int, PortScanner] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def run(self, connect_timeout: float = 30.0) -> int:
+        """
+        Serve one coordinator until its scan ends
+
+        Args:
+            connect_timeout: Keep retrying the connection this long, so
+                workers can start before the coordinator
+
+        Returns:
+            Number of units run
+        """
+        self._sock = self._connect(connect_timeout)
+        self._closed.clear()
+        self._send({"type": "hello", "version": PROTOCOL_VERSION, "name": self.name,
+                    "slots": self.slots, "token": self.token})
+        reader = self._sock.makefile("rb")
+        threads = []
+        settings = None
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        try:
+            for line in reader:
+                msg = json.loads(line)
+                kind = msg.get("type")
+                if kind == "welcome":
+                    settings = msg["settings"]
+                elif kind == "unit":
+                    thread = threading.Thread(target=self._run_unit, args=(settings, msg), daemon=True)
+                    thread.start()
+                    threads.append(thread)
+                elif kind == "cancel":
+                    with self._lock:
+                        scanner = self._scanners.get(msg["id"])
+                    if scanner is not None:
+                        scanner.cancel()
+                elif kind == "bye":
+                    break
+                elif kind == "error":
+                    print(f"[Worker] Coordinator refused us: {msg.get('error')}")
+                    break
+        except (OSError, ValueError) as e:
+            print(f"[Worker] Connection to coordinator lost: {e}")
+        finally:
+            self._closed.set()
+            with self._lock:
+                for scanner in self._scanners.values():
+                    scanner.cancel()
+            for thread in threads:
+                thread.join()
+            reader.close()
+            self._sock.close()
+        return len(threads)
+
+    def _connect(self, connect_timeout: float) -> socket.socket:
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                sock = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT)
+                sock.settimeout(None)  # See CONNECT_TIMEOUT
+                return sock
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+
+    def _send(self, msg: Dict) -> None:
+        data = json.dumps(msg).encode() + b"\n"
+        with self._send_lock:
+            try:
+                self._sock.sendall(data)
+            except OSError:
+                self._closed.set()  # The reader loop notices too
+
+    def _heartbeat(self) -> None:
+        while not self._closed.wait(self.heartbeat):
+            self._send({"type": "heartbeat"})
+
+    def _run_unit(self, settings: Dict, unit: Dict) -> None:
+        """Scan one unit, sending results in batches, then report done"""
+        unit_id = unit["id"]
+        ports = PortSpec.parse(unit["ports"])
+        if unit.get("reverse"):
+            ports = list(reversed(ports))
+        # Keep the unit's order; a stolen unit has to run back to front
+        scanner = PortScanner(**dict(settings, port_order="sequential"))
+        with self._lock:
+            self._scanners[unit_id] = scanner
+        batch = []
+        flushed = time.monotonic()
+        error = None
+        reported = 0
+        try:
+            for result in scanner.scan_iter(unit["host"], ports):
+                reported += 1
+                batch.append([result["port"], result["status"], result.get("banner"), result.get("service")])
+                if len(batch) >= BATCH_SIZE or time.monotonic() - flushed >= BATCH_INTERVAL:
+                    self._send({"type": "results", "id": unit_id, "results": batch})
+                    batch, flushed = [], time.monotonic()
+                if self._closed.is_set():
+                    scanner.cancel()
+            if scanner.cancelled and reported < len(ports):
+                # Cut short: the coordinator re-queues the ports never reported
+                # (a finished unit is also "cancelled", harmlessly, once its
+                # last result lands)
+                error = "cancelled" if not self._closed.is_set() else "connection to coordinator lost"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"[Worker] Unit {unit_id} failed: {error}")
+        finally:
+            with self._lock:
+                del self._scanners[unit_id]
+        if batch:
+            self._send({"type": "results", "id": unit_id, "results": batch})
+        metrics = scanner.metrics.to_dict() if scanner.metrics is not None else None
+        self._send({"type": "done", "id": unit_id, "metrics": metrics, "error": error})
+
+
+def run_worker(address: Tuple[str, int], slots: int = 2, token: Optional[str] = None,
+               connect_timeout: float = 30.0) -> int:
+    """Process entry point: serve one coordinator's scan; returns units run"""
+    return Worker(address, slots, token).run(connect_timeout)
+
+
+def _run_local_worker(address: Tuple[str, int], slots: int, token: Optional[str]) -> None:
+    """Local worker process: logs go to stderr, so stdout stays the coordinator's"""
+    sys.stdout = sys.stderr
+    run_worker(address, slots, token)
+
+
+def _start_local_workers(address: Tuple[str, int], count: int, slots: int,
+                         token: Optional[str]) -> list:
+    """Start count worker processes on this machine, pointed at address"""
+    if count <= 0:
+        return []
+    import multiprocessing
+    host = {"0.0.0.0": "127.0.0.1", "::": "::1"}.get(address[0], address[0])
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_run_local_worker, args=((host, address[1]), slots, token), daemon=True)
+                 for _ in range(count)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def parse_address(text: str, default_host: str = "0.0.0.0") -> Tuple[str, int]:
+    """ "host:port", "[::1]:port" or ":port" -> (host, port)"""
+    host, sep, port = text.rpartition(":")
+    if not sep:
+        return default_host, int(text)
+    return host.strip("[]") or default_host, int(port)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m distributed",
+                                     description="Spread a scan across worker processes and nodes")
+    sub = parser.add_subparsers(dest="role", required=True)
+
+    coordinator = sub.add_parser("coordinator", help="hand out work and collect results")
+    coordinator.add_argument("targets", nargs="+", help="as for cli.py")
+    coordinator.add_argument("-p", "--ports", default="1-1024", help="ports or a preset (default 1-1024)")
+    coordinator.add_argument("--listen", default=f"0.0.0.0:{DEFAULT_PORT}", help="host:port for workers")
+    coordinator.add_argument("--local-workers", type=int, default=0, help="worker processes to start here")
+    coordinator.add_argument("--slots", type=int, default=2, help="concurrent units per local worker")
+    coordinator.add_argument("--unit-size", type=int, default=1024, help="ports per work unit")
+    coordinator.add_argument("-t", "--timeout", type=float, default=0.6)
+    coordinator.add_argument("-T", "--threads", type=int, default=200)
+    coordinator.add_argument("--engine", choices=PortScanner.ENGINES, default="thread")
+    coordinator.add_argument("--order", choices=PortScanner.PORT_ORDERS, default="sequential",
+                             help="frequency hands out the most-likely-open ports first")
+    coordinator.add_argument("--probe", action="store_true", help="identify services with protocol probes")
+    coordinator.add_argument("-a", "--all", action="store_true", help="also print closed and filtered ports")
+    coordinator.add_argument("-f", "--format", choices=("text", "jsonl"), default="text")
+    coordinator.add_argument("--token", help="shared secret workers must send")
+
+    worker = sub.add_parser("worker", help="run units for a coordinator")
+    worker.add_argument("coordinator", help="host:port of the coordinator")
+    worker.add_argument("--slots", type=int, default=2, help="units to run at once")
+    worker.add_argument("--token")
+    worker.add_argument("--forever", action="store_true", help="serve one scan after another")
+    args = parser.parse_args(argv)
+
+    if args.role == "worker":
+        address = parse_address(args.coordinator, "127.0.0.1")
+        while True:
+            try:
+                Worker(address, args.slots, args.token).run()
+            except OSError as e:
+                print(f"[Worker] Cannot reach coordinator {address[0]}:{address[1]}: {e}", file=sys.stderr)
+                if not args.forever:
+                    return 1
+            if not args.forever:
+                return 0
+
+    from cli import ResultWriter  # Same output formats as the single-node CLI
+
+    scanner = PortScanner(timeout=args.timeout, threads=args.threads, engine=args.engine,
+                          port_order=args.order, service_probes=args.probe)
+    ports = scanner.parse_ports(args.ports)
+    if not ports:
+        parser.error(f"no valid ports in '{args.ports}'")
+    host, port = parse_address(args.listen)
+    node = Coordinator(scanner, host, port, unit_size=args.unit_size, token=args.token)
+    writer = ResultWriter(sys.stdout, args.format, args.all, scanner.get_service_name)
+    with contextlib.redirect_stdout(sys.stderr):  # Logs to stderr, results to stdout
+        scan = node.run(args.targets, ports, host_callback=writer.write_host,
+                        local_workers=args.local_workers, worker_slots=args.slots)
+    return 0 if scan["success"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
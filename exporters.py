@@ -0,0 +1,389 @@
+"""
+Streaming result exporters: JSON Lines, CSV and a compact binary format
+
+Each writer appends one row per port as results arrive, so a sweep of
+millions of ports is written with flat memory, and each format has a
+reader that yields the rows back one at a time:
+
+    with open_writer("sweep.rpsr") as out:          # or .jsonl / .csv
+        scanner.set_result_callback(lambda r: out.write_result(ip, r))
+        scanner.scan(ip, range(1, 65536))
+
+    for host, port, status, service, banner in read_results("sweep.rpsr"):
+        ...
+
+Rows are (host, port, status, service, banner); service and banner are
+None when absent.
+
+Binary layout (all integers big-endian): the header b"RPSR" plus a version
+byte, then records that each start with a tag byte.
+    'H' u16 length, UTF-8 host   defines the next host id and switches to it
+    'S' u32 host id              switches back to an earlier host
+    status, u16 n, n x u16 port  a run of ports of the current host with one
+                                 status (a results.STATUS_CODES value) and
+                                 no service or banner
+    status | 0x80, u16 port      one port, followed by a u16-length UTF-8
+                                 service if 0x10 is set in the tag and then
+                                 a banner if 0x20 is set
+Ports with no service or banner cost 2 bytes each, and the reader turns a whole run
+into rows without a Python-level loop per port.
+"""
+import csv
+import json
+import os
+import struct
+import sys
+from array import array
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from results import STATUS_CODES, STATUS_NAMES, ScanResult
+
+Row = Tuple[str, int, str, Optional[str], Optional[str]]
+
+CSV_FIELDS = ("host", "port", "status", "service", "banner")
+
+BINARY_MAGIC = b"RPSR"
+BINARY_VERSION = 1
+
+_TAG_HOST = 0x48  # 'H'
+_TAG_SWITCH = 0x53  # 'S'
+_DETAILED = 0x80
+_HAS_SERVICE = 0x10
+_HAS_BANNER = 0x20
+_STATUS_MASK = 0x0F
+
+# Ports buffered per run; a run's count is a u16
+_MAX_RUN = 0xFFFF
+
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+_RUN = struct.Struct(">BH")
+
+# Bytes read per chunk by read_binary
+_CHUNK = 1 << 20
+
+# Extension -> format for open_writer / read_results
+EXTENSIONS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv", ".rpsr": "binary", ".bin": "binary"}
+
+
+class _Writer:
+    """Shared plumbing: owns the file when given a path, context manager"""
+
+    binary = False
+
+    def __init__(self, target):
+        """
+        Args:
+            target: Path to create, or an open file object (text, or
+                binary for BinaryWriter), which is left open on close()
+        """
+        if isinstance(target, (str, os.PathLike)):
+            if self.binary:
+                self._file = open(target, "wb")
+            else:
+                self._file = open(target, "w", encoding="utf-8", newline="")
+            self._owns_file = True
+        else:
+            self._file = target
+            self._owns_file = False
+        self.rows = 0
+
+    def write(self, host: str, port: int, status: str,
+              service: Optional[str] = None, banner: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def write_result(self, host: str, result: Dict) -> None:
+        """Write a port result dict as yielded by PortScanner.scan_iter"""
+        self.write(host, result["port"], result["status"], result.get("service"), result.get("banner"))
+
+    def write_host(self, ip: str, results: ScanResult,
+                   statuses: Iterable[str] = ("open", "closed", "filtered")) -> None:
+        """Write every port of a finished host with one of statuses (e.g. a scan_many host_callback)"""
+        for status in statuses:
+            if status == "open":
+                for port in results.ports(status):
+                    self.write(ip, port, status, results.service_of(port), results.banner_of(port))
+            else:
+                for port in results.ports(status):
+                    self.write(ip, port, status)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class JsonlWriter(_Writer):
+    """One JSON object per line: {"host", "port", "status", "service", "banner"}"""
+
+    def __init__(self, target):
+        super().__init__(target)
+        self._host = None
+        self._prefix = ""
+
+    def write(self, host: str, port: int, status: str,
+              service: Optional[str] = None, banner: Optional[str] = None) -> None:
+        if host != self._host:
+            self._host = host
+            self._prefix = '{"host": ' + json.dumps(host) + ', "port": '
+        # Formatted by hand: json.dumps per row is most of the cost of a sweep
+        self._file.write(f'{self._prefix}{port}, "status": "{status}", "service": '
+                         f'{"null" if service is None else json.dumps(service)}, "banner": '
+                         f'{"null" if banner is None else json.dumps(banner)}}}\n')
+        self.rows += 1
+
+
+class CsvWriter(_Writer):
+    """CSV with a header row; missing service / banner are empty fields"""
+
+    def __init__(self, target):
+        super().__init__(target)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(CSV_FIELDS)
+
+    def write(self, host: str, port: int, status: str,
+              service: Optional[str] = None, banner: Optional[str] = None) -> None:
+        self._writer.writerow((host, port, status, service or "", banner or ""))
+        self.rows += 1
+
+
+class BinaryWriter(_Writer):
+    """
+    Compact record format (see the module docstring). Consecutive ports of
+    one host and status are buffered into a run, written when the host or
+    status changes, the run is full, or on flush() / close().
+    """
+
+    binary = True
+
+    def __init__(self, target):
+        super().__init__(target)
+        self._host_ids: Dict[str, int] = {}
+        self._host = None
+        self._run_status = 0
+        self._run = array("H")
+        self._file.write(BINARY_MAGIC + bytes([BINARY_VERSION]))
+
+    def write(self, host: str, port: int, status: str,
+              service: Optional[str] = None, banner: Optional[str] = None) -> None:
+        code = STATUS_CODES[status]
+        if host != self._host:
+            self._flush_run()
+            self._switch(host)
+        if service is None and banner is None:
+            if code != self._run_status or len(self._run) == _MAX_RUN:
+                self._flush_run()
+                self._run_status = code
+            self._run.append(port)
+        else:
+            self._flush_run()
+            tag = code | _DETAILED
+            tail = b""
+            if service is not None:
+                tag |= _HAS_SERVICE
+                tail += _text(service)
+            if banner is not None:
+                tag |= _HAS_BANNER
+                tail += _text(banner)
+            self._file.write(_RUN.pack(tag, port) + tail)
+        self.rows += 1
+
+    def _switch(self, host: str) -> None:
+        host_id = self._host_ids.get(host)
+        if host_id is None:
+            self._host_ids[host] = len(self._host_ids)
+            self._file.write(bytes([_TAG_HOST]) + _text(host))
+        else:
+            self._file.write(bytes([_TAG_SWITCH]) + _U32.pack(host_id))
+        self._host = host
+
+    def _flush_run(self) -> None:
+        run = self._run
+        if run:
+            if sys.byteorder == "little":
+                run.byteswap()
+            self._file.write(_RUN.pack(self._run_status, len(run)) + run.tobytes())
+            self._run = array("H")
+
+    def flush(self) -> None:
+        self._flush_run()
+        super().flush()
+
+    def close(self) -> None:
+        self._flush_run()
+        super().close()
+
+
+def _text(value: str) -> bytes:
+    """u16 length-prefixed UTF-8, cut to 65535 bytes"""
+    data = value.encode("utf-8", "replace")[:0xFFFF]
+    return _U16.pack(len(data)) + data
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter, "binary": BinaryWriter}
+
+
+def format_for_path(path) -> str:
+    """Export format implied by a file name's extension"""
+    fmt = EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+    if fmt is None:
+        raise ValueError(f"Can't tell the export format of '{path}', expected one of "
+                         f"{', '.join(sorted(EXTENSIONS))}")
+    return fmt
+
+
+def open_writer(path, fmt: Optional[str] = None) -> _Writer:
+    """
+    Create a writer for path
+
+    Args:
+        path: Output file
+        fmt: "jsonl", "csv" or "binary" (default: from the extension)
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    fmt = fmt or format_for_path(path)
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {tuple(WRITERS)}")
+    return WRITERS[fmt](path)
+
+
+def read_jsonl(path) -> Iterator[Row]:
+    loads = json.loads
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = loads(line)
+                yield row["host"], row["port"], row["status"], row.get("service"), row.get("banner")
+
+
+def read_csv(path) -> Iterator[Row]:
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        if next(reader, None) is None:
+            return
+        for host, port, status, service, banner in reader:
+            yield host, int(port), status, service or None, banner or None
+
+
+def read_binary(path) -> Iterator[Row]:
+    """
+    Rows of a binary export, parsed a chunk at a time. A record cut off at
+    the end of the file (a writer that was killed) is ignored.
+
+    Raises:
+        ValueError: If the file is not a binary export
+    """
+    hosts = []
+    host = None
+    with open(path, "rb") as f:
+        header = f.read(len(BINARY_MAGIC) + 1)
+        if header[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+            raise ValueError(f"'{path}' is not a binary scan export")
+        if header[-1] != BINARY_VERSION:
+            raise ValueError(f"Unsupported binary export version {header[-1]}")
+        rest = b""  # Unparsed tail of the previous chunk
+        while True:
+            chunk = f.read(_CHUNK)
+            if not chunk:
+                return
+            buf = rest + chunk
+            pos, end = 0, len(buf)
+            while pos < end:
+                tag = buf[pos]
+                status = STATUS_NAMES.get(tag & _STATUS_MASK)
+                if tag == tag & _STATUS_MASK and status is not None:
+                    if pos + 3 > end:
+                        break
+                    count = (buf[pos + 1] << 8) | buf[pos + 2]
+                    stop = pos + 3 + 2 * count
+                    if stop > end:
+                        break
+                    ports = array("H", buf[pos + 3:stop])
+                    if sys.byteorder == "little":
+                        ports.byteswap()
+                    pos = stop
+                    yield from zip(repeat(host), ports, repeat(status), repeat(None), repeat(None))
+                elif tag & _DETAILED and status is not None:
+                    if pos + 3 > end:
+                        break
+                    port = (buf[pos + 1] << 8) | buf[pos + 2]
+                    cursor = pos + 3
+                    service = banner = None
+                    if tag & _HAS_SERVICE:
+                        service, cursor = _read_text(buf, cursor, end)
+                        if service is None:
+                            break
+                    if tag & _HAS_BANNER:
+                        banner, cursor = _read_text(buf, cursor, end)
+                        if banner is None:
+                            break
+                    pos = cursor
+                    yield host, port, status, service, banner
+                elif tag == _TAG_HOST:
+                    name, cursor = _read_text(buf, pos + 1, end)
+                    if name is None:
+                        break
+                    hosts.append(name)
+                    host, pos = name, cursor
+                elif tag == _TAG_SWITCH:
+                    if pos + 5 > end:
+                        break
+                    host = hosts[_U32.unpack_from(buf, pos + 1)[0]]
+                    pos += 5
+                else:
+                    raise ValueError(f"Corrupt binary export: bad record tag {tag:#x}")
+            rest = buf[pos:]
+
+
+def _read_text(buf: bytes, pos: int, end: int) -> Tuple[Optional[str], int]:
+    """(text, position after it), or (None, pos) if buf ends inside it"""
+    if pos + 2 > end:
+        return None, pos
+    length = (buf[pos] << 8) | buf[pos + 1]
+    if pos + 2 + length > end:
+        return None, pos
+    return buf[pos + 2:pos + 2 + length].decode("utf-8", "replace"), pos + 2 + length
+
+
+READERS = {"jsonl": read_jsonl, "csv": read_csv, "binary": read_binary}
+
+
+def read_results(path, fmt: Optional[str] = None) -> Iterator[Row]:
+    """
+    Iterate the rows of an export
+
+    Args:
+        path: File written by one of the writers
+        fmt: "jsonl", "csv" or "binary" (default: from the extension)
+    """
+    fmt = fmt or format_for_path(path)
+    if fmt not in READERS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {tuple(READERS)}")
+    return READERS[fmt](path)
+
+
+def load_results(path, fmt: Optional[str] = None) -> Dict[str, ScanResult]:
+    """
+    Rebuild per-host ScanResults from an export (64 KB per host however
+    many rows it has)
+    """
+    hosts: Dict[str, ScanResult] = {}
+    for host, port, status, service, banner in read_results(path, fmt):
+        results = hosts.get(host)
+        if results is None:
+            results = hosts[host] = ScanResult(host, host)
+        results.add(port, status, banner, service)
+    return hosts
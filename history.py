@@ -0,0 +1,212 @@
+import sqlite3
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from results import parse_port_ranges
+
+# Get the directory where this script is located
+APP_DIR = Path(__file__).resolve().parent
+
+# One row per scan() / scan_many() run
+Scans = "CREATE TABLE IF NOT EXISTS scans ( Scan_ID INTEGER PRIMARY KEY AUTOINCREMENT, Target TEXT, Started_At TEXT, Duration_S REAL, Total_Hosts INTEGER )"
+
+# One row per host in a scan; Port_Selection holds the scanned ports as ranges ("1-1024,3306")
+Hosts = "CREATE TABLE IF NOT EXISTS hosts ( Host_ID INTEGER PRIMARY KEY AUTOINCREMENT, Scan_ID INTEGER REFERENCES scans(Scan_ID) ON DELETE CASCADE, IP TEXT, Target TEXT, Scanned_At TEXT, Port_Selection TEXT, Total_Open INTEGER, Total_Closed INTEGER, Total_Filtered INTEGER )"
+
+# Only open and filtered ports are stored; any other scanned port was closed
+Port_Results = "CREATE TABLE IF NOT EXISTS port_results ( Host_ID INTEGER REFERENCES hosts(Host_ID) ON DELETE CASCADE, IP TEXT, Port INTEGER, Status TEXT, Banner TEXT, Scanned_At TEXT )"
+
+Indexes = (
+    "CREATE INDEX IF NOT EXISTS idx_hosts_ip_time ON hosts (IP, Scanned_At)",
+    "CREATE INDEX IF NOT EXISTS idx_port_results_ip_port_time ON port_results (IP, Port, Scanned_At)",
+    "CREATE INDEX IF NOT EXISTS idx_port_results_host ON port_results (Host_ID, Status, Port)"
+)
+
+
+class History_Manager:
+    """Scan history stored alongside profiles in data.db"""
+
+    def __init__(self, db_path: str = None):
+        if db_path is None:
+            db_path = str(APP_DIR / "data.db")
+        self.db_path = db_path
+        self.conn = None
+        self.cursor = None
+        self._connect()
+
+    def _connect(self):
+        """Establish database connection and create the history tables"""
+        try:
+            self.conn = sqlite3.connect(self.db_path)
+            # WAL lets the GUI read history while a sweep is being written
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            self.cursor = self.conn.cursor()
+            for statement in (Scans, Hosts, Port_Results) + Indexes:
+                self.cursor.execute(statement)
+            self.conn.commit()
+        except Exception as e:
+            print(f"Database connection error: {e}")
+            raise
+
+    def record_scan(self, results) -> int:
+        """
+        Save a finished scan in one transaction
+
+        Args:
+            results: scan()["results"] (a ScanResult) or scan_many()["results"]
+
+        Returns:
+            The new Scan_ID
+        """
+        if "hosts" in results:
+            hosts = list(results["hosts"].values())
+            target = ",".join(h.target or h.ip for h in hosts)
+            started_at, duration = results["timestamp_utc"], results["duration_s"]
+        else:
+            hosts = [results]
+            target = results.target
+            started_at, duration = results.timestamp_utc, results.duration_s
+
+        try:
+            with self.conn:
+                self.cursor.execute(
+                    "INSERT INTO scans (Target, Started_At, Duration_S, Total_Hosts) VALUES (?, ?, ?, ?)",
+                    (target, started_at, duration, len(hosts))
+                )
+                scan_id = self.cursor.lastrowid
+                for host in hosts:
+                    summary = host.summary
+                    self.cursor.execute(
+                        "INSERT INTO hosts (Scan_ID, IP, Target, Scanned_At, Port_Selection, Total_Open, Total_Closed, Total_Filtered) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (scan_id, host.ip, host.target, host.timestamp_utc,
+                         ",".join(host.compress_port_ranges(None)),
+                         summary["total_open"], summary["total_closed"], summary["total_filtered"])
+                    )
+                    host_id = self.cursor.lastrowid
+                    rows = [(host_id, host.ip, port, "open", host.banner_of(port), host.timestamp_utc)
+                            for port in host.ports("open")]
+                    rows += [(host_id, host.ip, port, "filtered", None, host.timestamp_utc)
+                             for port in host.ports("filtered")]
+                    self.cursor.executemany(
+                        "INSERT INTO port_results (Host_ID, IP, Port, Status, Banner, Scanned_At) VALUES (?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+            return scan_id
+        except Exception as e:
+            raise Exception(f"Error saving scan history: {e}")
+
+    def list_scans(self, limit: int = 50) -> List[Dict]:
+        """Most recent scans first"""
+        self.cursor.execute(
+            "SELECT Scan_ID, Target, Started_At, Duration_S, Total_Hosts FROM scans ORDER BY Scan_ID DESC LIMIT ?",
+            (limit,)
+        )
+        return [
+            {"Scan_ID": row[0], "Target": row[1], "Started_At": row[2],
+             "Duration_S": row[3], "Total_Hosts": row[4]}
+            for row in self.cursor.fetchall()
+        ]
+
+    def open_ports(self, ip: str) -> List[Tuple[int, Optional[str]]]:
+        """(port, banner) for every open port in the latest scan of ip"""
+        host = self._latest_host(ip)
+        if host is None:
+            return []
+        self.cursor.execute(
+            "SELECT Port, Banner FROM port_results WHERE Host_ID = ? AND Status = 'open' ORDER BY Port",
+            (host[0],)
+        )
+        return self.cursor.fetchall()
+
+    def diff_host(self, ip: str) -> Optional[Dict]:
+        """What changed between the two latest scans of ip, or None if it has fewer than two"""
+        new = self._latest_host(ip)
+        if new is None:
+            return None
+        return self._diff_hosts(self._previous_host(ip, new), new)
+
+    def changes_since_last(self, scan_id: int) -> Dict[str, Dict]:
+        """
+        For every host in a scan, what changed since that host's previous scan
+
+        Returns:
+            Dict mapping ip -> {"opened": [...], "closed": [...], "previous_scan": ts},
+            only for hosts that were seen before and actually changed
+        """
+        self.cursor.execute(
+            "SELECT Host_ID, IP, Scanned_At, Port_Selection FROM hosts WHERE Scan_ID = ?",
+            (scan_id,)
+        )
+        changes = {}
+        for new in self.cursor.fetchall():
+            diff = self._diff_hosts(self._previous_host(new[1], new), new)
+            if diff and (diff["opened"] or diff["closed"]):
+                changes[new[1]] = diff
+        return changes
+
+    def _latest_host(self, ip: str):
+        cursor = self.conn.execute(
+            "SELECT Host_ID, IP, Scanned_At, Port_Selection FROM hosts WHERE IP = ? ORDER BY Scanned_At DESC, Host_ID DESC LIMIT 1",
+            (ip,)
+        )
+        return cursor.fetchone()
+
+    def _previous_host(self, ip: str, host):
+        cursor = self.conn.execute(
+            "SELECT Host_ID, IP, Scanned_At, Port_Selection FROM hosts WHERE IP = ? AND (Scanned_At, Host_ID) < (?, ?) ORDER BY Scanned_At DESC, Host_ID DESC LIMIT 1",
+            (ip, host[2], host[0])
+        )
+        return cursor.fetchone()
+
+    def _diff_hosts(self, old, new) -> Optional[Dict]:
+        """Compare open ports of two host rows, limited to ports scanned both times"""
+        if old is None:
+            return None
+        old_open, new_open = self._open_set(old[0]), self._open_set(new[0])
+        opened, closed = new_open - old_open, old_open - new_open
+        old_ranges, new_ranges = parse_port_ranges(old[3] or ""), parse_port_ranges(new[3] or "")
+        return {
+            "opened": sorted(p for p in opened if _in_ranges(old_ranges, p)),
+            "closed": sorted(p for p in closed if _in_ranges(new_ranges, p)),
+            "previous_scan": old[2]
+        }
+
+    def _open_set(self, host_id: int) -> set:
+        cursor = self.conn.execute(
+            "SELECT Port FROM port_results WHERE Host_ID = ? AND Status = 'open'",
+            (host_id,)
+        )
+        return {row[0] for row in cursor}
+
+    def delete_scan(self, scan_id: int):
+        """Delete a scan and its host and port rows"""
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM port_results WHERE Host_ID IN (SELECT Host_ID FROM hosts WHERE Scan_ID = ?)",
+                    (scan_id,)
+                )
+                self.conn.execute("DELETE FROM hosts WHERE Scan_ID = ?", (scan_id,))
+                self.conn.execute("DELETE FROM scans WHERE Scan_ID = ?", (scan_id,))
+        except Exception as e:
+            print(f"Error deleting scan: {e}")
+
+    def close(self):
+        """Close database connection"""
+        try:
+            if self.conn:
+                self.conn.close()
+        except Exception as e:
+            print(f"Error closing database: {e}")
+
+    def __del__(self):
+        """Cleanup on deletion"""
+        self.close()
+
+
+def _in_ranges(ranges: List[Tuple[int, int]], port: int) -> bool:
+    i = bisect_right(ranges, (port, 65536)) - 1
+    return i >= 0 and ranges[i][0] <= port <= ranges[i][1]
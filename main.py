@@ -1,16 +1,25 @@
 import sys
 import os
+import threading
 from pathlib import Path
-from PyQt5.QtWidgets import QApplication, QMainWindow, QTableWidgetItem
-from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QApplication, QMainWindow
 from PyQt5.uic import loadUi
 from portscan import PortScanner
 from profiles import Profile_Manager
-from PyQt5.QtCore import QObject, pyqtSignal, QThread
+from history import History_Manager
+from results_model import ScanResultsModel
+from PyQt5.QtCore import QObject, pyqtSignal, QThread, QTimer, Qt
 
 # Get the directory where this script is located
 APP_DIR = Path(__file__).resolve().parent
 
+# Progress of an interrupted scan; running the same scan again resumes it
+CHECKPOINT_FILE = APP_DIR / "scan_checkpoint.json"
+
+# The progress bar counts in these steps: a sweep's port count can pass
+# the 2**31 a QProgressBar holds
+PROGRESS_STEPS = 1000
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -22,18 +31,37 @@ class MainWindow(QMainWindow):
         self.resize(1250, 800)
         self.scanner = PortScanner()
         self.profile_manager = Profile_Manager()
+        self.history = History_Manager()
         self.thread = None
         self.worker = None
+        self.progress_decile = -1
+        
+        # Pulls the running scan's buffered rows and progress once a frame
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(round(ScanWorker.FRAME_INTERVAL * 1000))
+        self.flush_timer.timeout.connect(self.flush_worker)
+        
+        # Results are served lazily from a model; open ports first by default
+        self.results_model = ScanResultsModel(self.scanner.get_service_name, self)
+        self.tableView.setModel(self.results_model)
+        self.tableView.horizontalHeader().setStretchLastSection(True)
+        self.tableView.sortByColumn(self.results_model.columns.index("Status"), Qt.AscendingOrder)
         
         # Signal connections
         self.StartScan_push.clicked.connect(self.start_scan)
         if hasattr(self, 'CancelScan_push'):
             self.CancelScan_push.clicked.connect(self.cancel_scan)
+        if hasattr(self, 'PauseScan_push'):
+            self.PauseScan_push.clicked.connect(self.pause_scan)
+        self.StatusFilter_combo.currentTextChanged.connect(self.filter_results)
     
     def closeEvent(self, event):
         """Clean up resources on window close"""
         self.cancel_scan()
+        if self.thread:
+            self.thread.wait()
         self.profile_manager.close()
+        self.history.close()
         event.accept()
     
     def start_scan(self):
@@ -61,7 +89,7 @@ class MainWindow(QMainWindow):
             if not ports:
                 self.Status_label.setText("No valid ports found")
                 return
-            print(f"[DEBUG] Parsed ports: {ports}")
+            print(f"[DEBUG] Parsed {len(ports)} ports")
         except Exception as e:
             error = f"Error parsing ports: {e}"
             self.Status_label.setText(error)
@@ -72,54 +100,113 @@ class MainWindow(QMainWindow):
         threads = int(self.Threads_spin.value()) or 200
         
         self.scanner.timeout = timeout
-        self.scanner.threads = threads
+        self.scanner.threads = threads  # Ceiling for the AIMD window
+        self.scanner.concurrency = "aimd"
+        
+        # CIDR blocks, ranges and lists go through the multi-host scanner
+        hosts = self.scanner.parse_targets(target)
+        if not hosts:
+            self.Status_label.setText("No valid targets found")
+            return
         
-        print(f"[DEBUG] Scan starting: target={target}, ports={len(ports)}, timeout={timeout}, threads={threads}")
-        self.Status_label.setText(f"Scanning {target} ({len(ports)} ports)...")
+        print(f"[DEBUG] Scan starting: target={target}, hosts={len(hosts)}, ports={len(ports)}, timeout={timeout}, threads={threads}")
+        self.Status_label.setText(f"Scanning {target} ({len(hosts)} hosts, {len(ports)} ports)..." if len(hosts) > 1
+                                  else f"Scanning {target} ({len(ports)} ports)...")
 
         self.thread = QThread()
-        self.worker = ScanWorker(target, ports, self.scanner)
+        self.worker = ScanWorker(target, hosts, ports, self.scanner, str(CHECKPOINT_FILE))
         self.worker.moveToThread(self.thread)
         self.worker.progress.connect(self.update_progress)
+        self.worker.results_ready.connect(self.results_model.append_results)
+        self.worker.hosts_ready.connect(self.add_hosts)
         
-        self.progressBar.setMaximum(len(ports))
+        self.progressBar.setMaximum(PROGRESS_STEPS)
         self.progressBar.setValue(0)
+        self.progressBar.setFormat("%p%")
+        self.progress_decile = -1
+        self.PauseScan_push.setText("Pause")
 
         self.worker.finished.connect(self.scan_finished)
 
-        self.tableWidget.setRowCount(0)  # Clear previous results
-        self.tableWidget.setColumnCount(4)
-        self.tableWidget.setHorizontalHeaderLabels(["Port", "Status", "Service", "Banner"])
+        # Clear previous results; the Host column shifts the sorted column
+        self.results_model.clear(show_host=len(hosts) > 1)
+        header = self.tableView.horizontalHeader()
+        header.setSortIndicator(self.results_model.sort_column(), header.sortIndicatorOrder())
 
         self.thread.started.connect(self.worker.run)
         self.thread.start()
+        self.flush_timer.start()
+
+    def flush_worker(self):
+        """Send the worker's buffered rows and progress to the window"""
+        if self.worker:
+            self.worker.flush()
 
     def update_progress(self, scanned, total):
-        self.progressBar.setMaximum(total)
-        self.progressBar.setValue(scanned)
-        # Print every 10% for debugging
-        if scanned % max(1, total // 10) == 0 or scanned == total:
-            print(f"[DEBUG] Progress: {scanned}/{total} ({100*scanned//total}%)")
+        self.progressBar.setValue(PROGRESS_STEPS * scanned // max(1, total))
+        
+        # Show the live congestion window and why it last changed
+        congestion = self.scanner.congestion
+        if congestion:
+            self.progressBar.setFormat(f"%p% - window {congestion.window}")
+            self.progressBar.setToolTip(congestion.reason)
+        # Print every 10% for debugging (updates are coalesced, so check
+        # for a crossed boundary rather than an exact multiple)
+        decile = 10 * scanned // max(1, total)
+        if decile != self.progress_decile:
+            self.progress_decile = decile
+            print(f"[DEBUG] Progress: {scanned}/{total} ({100*scanned//max(1, total)}%)")
+
+    def add_hosts(self, host_results):
+        """Append finished hosts of a multi-host scan to the results table"""
+        for host_result in host_results:
+            self.results_model.append_host(host_result)
+
+    def filter_results(self, text):
+        """Show only ports with the status picked in the filter combo"""
+        self.results_model.set_status_filter(None if text == "All Ports" else text.lower())
 
     def scan_finished(self, result):
+        self.flush_timer.stop()
+        
         # Clean up thread
         if self.thread:
             self.thread.quit()
             self.thread.wait()
             self.thread = None
         
-        print(f"[DEBUG] Scan finished with result: {result}")
+        print(f"[DEBUG] Scan finished: success={result.get('success')}, error={result.get('error')}")
+        self.PauseScan_push.setText("Pause")
         
-        if result.get("success"):
+        if self.scanner.cancelled:
+            self.Status_label.setText("Scan cancelled - run the same scan again to resume where it stopped")
+        elif result.get("success"):
             scan_results = result.get("results", {})
-            print(f"[DEBUG] Display results called with: {scan_results}")
-            self.display_results(scan_results)
+            
+            # Rows were streamed into the table while scanning; a resumed
+            # scan also has ports from the earlier run to show
+            if "hosts" not in scan_results and self.results_model.total_rows() < sum(scan_results.summary.values()):
+                self.display_results(scan_results)
             
             # Show detailed summary
             summary = scan_results.get("summary", {})
             duration = scan_results.get("duration_s", 0)
-            target = scan_results.get("target", "Unknown")
+            if "hosts" in scan_results:
+                target = f"{summary.get('total_hosts', 0)} hosts"
+            else:
+                target = scan_results.get("target", "Unknown")
             status_msg = f"Scan complete! {target}: {summary.get('total_open', 0)} open, {summary.get('total_closed', 0)} closed, {summary.get('total_filtered', 0)} filtered ({duration:.2f}s)"
+            
+            # Save to history and report what changed since the last scan
+            try:
+                scan_id = self.history.record_scan(scan_results)
+                changes = self.history.changes_since_last(scan_id).values()
+                if changes:
+                    opened = sum(len(c['opened']) for c in changes)
+                    closed = sum(len(c['closed']) for c in changes)
+                    status_msg += f" | Since last scan: {opened} opened, {closed} closed"
+            except Exception as e:
+                print(f"[ERROR] {e}")
             self.Status_label.setText(status_msg)
         else:
             error_msg = f"Scan failed: {result.get('error', 'Unknown error')}"
@@ -127,98 +214,99 @@ class MainWindow(QMainWindow):
             print(f"[ERROR] {error_msg}")
     
     def cancel_scan(self):
+        """Stop the scan; in-flight probes are torn down and progress is checkpointed"""
         if self.thread and self.thread.isRunning():
-            self.thread.quit()
-            self.thread.wait()
-            self.Status_label.setText("Scan cancelled")
+            self.scanner.cancel()
+            self.flush_worker()
+            self.Status_label.setText("Cancelling scan...")
+
+    def pause_scan(self):
+        """Toggle between pausing (and checkpointing) and resuming the scan"""
+        if not (self.thread and self.thread.isRunning()):
+            return
+        if self.scanner.paused:
+            self.scanner.resume()
+            self.PauseScan_push.setText("Pause")
+            self.Status_label.setText("Scan resumed")
+        else:
+            self.scanner.pause()
+            self.flush_worker()
+            self.PauseScan_push.setText("Resume")
+            self.Status_label.setText("Scan paused (progress saved)")
     
     def display_results(self, results):
-        """Display scan results in table widget"""
-        open_ports = results.get("open_ports", [])
-        closed_ports = results.get("closed_ports", [])
-        filtered_ports = results.get("filtered_ports", [])
-        
-        print(f"[DEBUG] display_results called with {len(open_ports)} open, {len(closed_ports)} closed, {len(filtered_ports)} filtered ports")
-        
-        # Set table row count to total scanned ports
-        total_ports = len(open_ports) + len(closed_ports) + len(filtered_ports)
-        self.tableWidget.setRowCount(total_ports)
-        
-        row = 0
-        
-        # Display open ports first (with green highlight)
-        for port_info in open_ports:
-            port = str(port_info.get("port", ""))
-            status = port_info.get("status", "unknown")
-            service = self.scanner.get_service_name(int(port)) if port else ""
-            banner = port_info.get("banner", "")
-            
-            # Truncate banner if too long
-            if banner and len(banner) > 50:
-                banner = banner[:47] + "..."
-            
-            port_item = QTableWidgetItem(port)
-            port_item.setBackground(QColor(76, 175, 80))  # Green for open
-            
-            self.tableWidget.setItem(row, 0, port_item)
-            self.tableWidget.setItem(row, 1, QTableWidgetItem(status))
-            self.tableWidget.setItem(row, 2, QTableWidgetItem(service))
-            self.tableWidget.setItem(row, 3, QTableWidgetItem(banner or "N/A"))
-            row += 1
-        
-        # Display closed ports with gray highlight
-        for port_info in closed_ports:
-            port = str(port_info.get("port", ""))
-            status = port_info.get("status", "closed")
-            service = self.scanner.get_service_name(int(port)) if port else ""
-            
-            port_item = QTableWidgetItem(port)
-            port_item.setBackground(QColor(158, 158, 158))  # Gray for closed
-            
-            self.tableWidget.setItem(row, 0, port_item)
-            self.tableWidget.setItem(row, 1, QTableWidgetItem(status))
-            self.tableWidget.setItem(row, 2, QTableWidgetItem(service))
-            self.tableWidget.setItem(row, 3, QTableWidgetItem("N/A"))
-            row += 1
-        
-        # Display filtered ports
-        for port_info in filtered_ports:
-            port = str(port_info.get("port", ""))
-            status = port_info.get("status", "filtered")
-            service = self.scanner.get_service_name(int(port)) if port else ""
-            
-            port_item = QTableWidgetItem(port)
-            port_item.setBackground(QColor(255, 193, 7))  # Yellow for filtered
-            
-            self.tableWidget.setItem(row, 0, port_item)
-            self.tableWidget.setItem(row, 1, QTableWidgetItem(status))
-            self.tableWidget.setItem(row, 2, QTableWidgetItem(service))
-            self.tableWidget.setItem(row, 3, QTableWidgetItem("N/A"))
-            row += 1
-        
-        print(f"[DEBUG] Table updated with {row} total rows")
+        """Show a finished single-host ScanResult in the results table"""
+        self.results_model.clear()
+        self.results_model.append_host(results)
+        print(f"[DEBUG] Table updated with {self.results_model.rowCount()} total rows")
 
 
 
 class ScanWorker(QObject):
-    progress = pyqtSignal(int, int)
+    progress = pyqtSignal(object, object)  # (scanned, total); may pass 2**31
+    results_ready = pyqtSignal(str, list)  # (host, port result dicts)
+    hosts_ready = pyqtSignal(list)  # Finished ScanResults of a multi-host scan
     finished = pyqtSignal(dict)
     
-    def __init__(self, target, ports, scanner):
+    # Progress and new rows are batched and sent this often (the window's
+    # flush timer calls flush()), so the GUI thread repaints at a steady
+    # frame rate instead of once per port, and a quiet scan still shows
+    # its last rows
+    FRAME_INTERVAL = 1 / 30
+    
+    def __init__(self, target, hosts, ports, scanner, checkpoint=None):
         super().__init__()
         self.target = target
+        self.hosts = hosts
         self.ports = ports
         self.scanner = scanner
+        self.checkpoint = checkpoint
+        self.pending_results = []
+        self.pending_hosts = []
+        self.pending_progress = None
+        # Scan threads fill the buffers while the GUI thread flushes them
+        self.lock = threading.Lock()
 
     def run(self):
-        # Define nested progress callback
+        # Define nested callbacks; they only buffer, flush() emits
         def on_progress(scanned, total):
-            self.progress.emit(scanned, total)
+            with self.lock:
+                self.pending_progress = (scanned, total)
         
-        # Set callback and run scan
+        def on_result(port_result):
+            with self.lock:
+                self.pending_results.append(port_result)
+        
+        def on_host(ip, host_results):
+            with self.lock:
+                self.pending_hosts.append(host_results)
+        
+        # Set callbacks and run scan
         self.scanner.set_progress_callback(on_progress)
-        result = self.scanner.scan(self.target, self.ports)
+        if len(self.hosts) > 1:
+            result = self.scanner.scan_many(self.hosts, self.ports, host_callback=on_host,
+                                            checkpoint=self.checkpoint)
+        else:
+            self.scanner.set_result_callback(on_result)
+            try:
+                result = self.scanner.scan(self.hosts[0], self.ports, checkpoint=self.checkpoint)
+            finally:
+                self.scanner.set_result_callback(None)
+        self.flush()
         self.finished.emit(result)
+    
+    def flush(self):
+        """Emit the buffered rows and the latest progress"""
+        with self.lock:
+            results, self.pending_results = self.pending_results, []
+            hosts, self.pending_hosts = self.pending_hosts, []
+            progress, self.pending_progress = self.pending_progress, None
+        if results:
+            self.results_ready.emit(self.hosts[0], results)
+        if hosts:
+            self.hosts_ready.emit(hosts)
+        if progress:
+            self.progress.emit(*progress)
         
 
 if __name__ == "__main__":
@@ -0,0 +1,236 @@
+import errno
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds, shared by every latency metric
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prometheus metric name and help text per histogram
+HISTOGRAMS = {
+    "connect": ("portscan_connect_latency_seconds", "Duration of each connect attempt"),
+    "banner": ("portscan_banner_latency_seconds", "Duration of each banner grab"),
+    "queue_wait": ("portscan_queue_wait_seconds",
+                   "Time a probe waited for a pool thread or congestion window slot"),
+}
+
+GAUGES = {
+    "inflight": ("portscan_connects_inflight", "Connect attempts in progress"),
+    "queue_depth": ("portscan_queue_depth", "Probes and results queued inside the engine"),
+}
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(LATENCY_BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum_s": round(self.sum, 6),
+            "p50_s": self.quantile(0.5),
+            "p99_s": self.quantile(0.99),
+            "buckets": {str(bound): n for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), self.counts)},
+        }
+
+
+class ScanMetrics:
+    """
+    Counters, latency histograms, gauges and phase timers for one scan
+
+    The scanner only creates one when constructed with metrics=True; with
+    metrics off every hook is a single "is not None" check. All updates
+    take one lock, so thread-engine workers can share an instance.
+
+    Export with to_dict() (JSON-friendly, also returned as scan()["metrics"])
+    or to_prometheus() (text exposition format).
+    """
+
+    __slots__ = ("phases", "histograms", "gauges", "errors", "statuses", "attempts",
+                 "retries", "_lock")
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.histograms = {name: Histogram() for name in HISTOGRAMS}
+        self.gauges: Dict[str, Tuple[int, int]] = {name: (0, 0) for name in GAUGES}  # (current, max)
+        self.errors: Dict[str, int] = {}  # errno name -> connect attempts that failed with it
+        self.statuses: Dict[str, int] = {}
+        self.attempts = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Add the wall time of the with-block to a named phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def observe(self, histogram: str, seconds: float) -> None:
+        with self._lock:
+            self.histograms[histogram].observe(seconds)
+
+    def gauge_add(self, gauge: str, delta: int) -> None:
+        with self._lock:
+            current, peak = self.gauges[gauge]
+            current += delta
+            self.gauges[gauge] = (current, max(peak, current))
+
+    def gauge_set(self, gauge: str, value: int) -> None:
+        with self._lock:
+            self.gauges[gauge] = (value, max(self.gauges[gauge][1], value))
+
+    def on_connect(self, res: Optional[int], elapsed: float, attempt: int) -> None:
+        """Record one connect attempt and its result code"""
+        with self._lock:
+            self.attempts += 1
+            self.retries += attempt > 0
+            self.histograms["connect"].observe(elapsed)
+            if res != 0:
+                name = "EXCEPTION" if res is None else errno.errorcode.get(res, str(res))
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def on_result(self, status: str) -> None:
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def merge(self, other: "ScanMetrics") -> None:
+        """Fold another scan's metrics (e.g. a scan_many shard) into this one"""
+        with self._lock:
+            for name, seconds in other.phases.items():
+                self.phases[name] = self.phases.get(name, 0.0) + seconds
+            for name, histogram in other.histograms.items():
+                self.histograms[name].merge(histogram)
+            for name, (current, peak) in other.gauges.items():
+                mine = self.gauges[name]
+                self.gauges[name] = (mine[0] + current, max(mine[1], peak))
+            for target, source in ((self.errors, other.errors), (self.statuses, other.statuses)):
+                for key, n in source.items():
+                    target[key] = target.get(key, 0) + n
+            self.attempts += other.attempts
+            self.retries += other.retries
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ScanMetrics":
+        """Rebuild metrics from to_dict() output (e.g. sent as JSON by a distributed worker)"""
+        metrics = cls()
+        metrics.phases = dict(data["phases_s"])
+        metrics.attempts = data["connect_attempts"]
+        metrics.retries = data["retries"]
+        metrics.statuses = dict(data["results"])
+        metrics.errors = dict(data["connect_errors"])
+        for name, summary in data["latency"].items():
+            histogram = metrics.histograms[name]
+            histogram.counts = list(summary["buckets"].values())
+            histogram.count = summary["count"]
+            histogram.sum = summary["sum_s"]
+        for name, gauge in data["gauges"].items():
+            metrics.gauges[name] = (gauge["current"], gauge["max"])
+        return metrics
+
+    # The lock can't be pickled; scan_many shards send their metrics back
+    # from worker processes
+
+    def __getstate__(self):
+        return (self.phases, self.histograms, self.gauges, self.errors, self.statuses,
+                self.attempts, self.retries)
+
+    def __setstate__(self, state):
+        (self.phases, self.histograms, self.gauges, self.errors, self.statuses,
+         self.attempts, self.retries) = state
+        self._lock = threading.Lock()
+
+    def to_dict(self) -> Dict:
+        """JSON-friendly summary"""
+        with self._lock:
+            return {
+                "phases_s": {name: round(s, 6) for name, s in self.phases.items()},
+                "connect_attempts": self.attempts,
+                "retries": self.retries,
+                "results": dict(self.statuses),
+                "connect_errors": dict(sorted(self.errors.items())),
+                "latency": {name: h.to_dict() for name, h in self.histograms.items()},
+                "gauges": {name: {"current": current, "max": peak}
+                           for name, (current, peak) in self.gauges.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            header("portscan_phase_seconds", "gauge", "Wall time spent in each scan phase")
+            for phase, seconds in self.phases.items():
+                lines.append(f'portscan_phase_seconds{{phase="{phase}"}} {seconds:.6f}')
+
+            header("portscan_connect_attempts_total", "counter", "Connect attempts including retries")
+            lines.append(f"portscan_connect_attempts_total {self.attempts}")
+            header("portscan_retries_total", "counter", "Connect attempts that were retries")
+            lines.append(f"portscan_retries_total {self.retries}")
+
+            header("portscan_ports_total", "counter", "Scanned ports by final status")
+            for status, n in sorted(self.statuses.items()):
+                lines.append(f'portscan_ports_total{{status="{status}"}} {n}')
+
+            header("portscan_connect_errors_total", "counter", "Failed connect attempts by errno")
+            for name, n in sorted(self.errors.items()):
+                lines.append(f'portscan_connect_errors_total{{errno="{name}"}} {n}')
+
+            for key, (name, help_text) in HISTOGRAMS.items():
+                histogram = self.histograms[key]
+                header(name, "histogram", help_text)
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum {histogram.sum:.6f}")
+                lines.append(f"{name}_count {histogram.count}")
+
+            for key, (name, help_text) in GAUGES.items():
+                current, peak = self.gauges[key]
+                header(name, "gauge", help_text)
+                lines.append(f"{name} {current}")
+                header(f"{name}_max", "gauge", f"Peak of {name}")
+                lines.append(f"{name}_max {peak}")
+        return "\n".join(lines) + "\n"
@@ -1,11 +1,61 @@
+import errno
+import ipaddress
+import os
+import queue
 import socket
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, List, Callable, Optional
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Callable, Optional, Sequence, Tuple, Union
+
+from metrics import ScanMetrics
+from portspec import PORT_FREQUENCY, FrequencyOrder, PortSpec
+from probes import MAX_RESPONSE, default_probe_set
+from resolver import Resolver
+from results import ScanResult
+import sockets
+from timing import ConnectionBudget, CongestionWindow, RttEstimator
+
+# asyncio, multiprocessing and checkpoint are imported where the async
+# engine, scan_many and checkpointed scans use them: together they are most
+# of this module's import time, and short thread-engine scans (e.g. cli.py
+# runs) never need them
+
+# connect() results that mean "no answer before the timeout"
+TIMEOUT_CODES = {errno.EAGAIN, errno.EWOULDBLOCK, errno.ETIMEDOUT, errno.EINPROGRESS}
+
+# Local resource exhaustion: too many fds or no free ephemeral ports
+RESOURCE_CODES = {errno.EMFILE, errno.ENFILE, errno.EADDRNOTAVAIL, errno.ENOBUFS}
+
+# Seconds without a single free socket before a scan gives up
+RESOURCE_WAIT_LIMIT = 30.0
+
+
+class ScanError(Exception):
+    """Raised by the streaming APIs when a scan cannot start"""
+
+
+class ResourceExhaustedError(ScanError):
+    """Raised when no socket could be had for RESOURCE_WAIT_LIMIT seconds (see sockets.Backpressure)"""
+
 
 class PortScanner:
     """Multi-threaded port scanner with progress callbacks"""
     
+    # Available scan backends
+    ENGINES = ("thread", "async")
+    
+    # Connect timeout strategies
+    TIMINGS = ("fixed", "adaptive")
+    
+    # In-flight connect limits
+    CONCURRENCY_MODES = ("static", "aimd")
+    
+    # Port probe orders
+    PORT_ORDERS = ("sequential", "frequency")
+    
     # Port categories as class constants
     PORT_CATEGORIES = {
         "web": {80: "HTTP", 443: "HTTPS", 8080: "HTTP-alt"},
@@ -23,17 +73,114 @@ class PortScanner:
         1433: "MSSQL", 27017: "MongoDB", 6379: "Redis"
     }
     
-    def __init__(self, timeout: float = 0.6, threads: int = 200):
+    # Host discovery pings: the COMMON_SERVICES ports most often found open
+    # (PORT_FREQUENCY order)
+    DISCOVERY_PORTS = (80, 23, 443, 21, 22, 25, 3389, 110)
+    
+    # Times scan_many resubmits a shard that raised before giving up on its host
+    SHARD_RETRIES = 1
+    
+    def __init__(self, timeout: float = 0.6, threads: int = 200,
+                 engine: str = "thread", max_inflight: int = 1000,
+                 banner_workers: int = 32, banner_timeout: float = 2.0,
+                 reuse_probe_socket: bool = True, timing: str = "fixed",
+                 max_retries: int = 2, min_timeout: float = 0.05,
+                 max_timeout: float = 3.0, concurrency: str = "static",
+                 initial_window: int = 32, cache=None,
+                 resolver: Optional[Resolver] = None, metrics: bool = False,
+                 port_order: str = "sequential", service_probes: bool = False,
+                 max_probes: int = 3, budget: Optional[ConnectionBudget] = None,
+                 abortive_close: bool = True):
         """
         Initialize scanner
         
         Args:
             timeout: Socket timeout in seconds
-            threads: Number of concurrent threads
+            threads: Number of concurrent threads (thread engine)
+            engine: "thread" for blocking connects on a thread pool,
+                "async" for non-blocking connects on an asyncio loop
+            max_inflight: Max concurrent connects (async engine)
+            banner_workers: Max concurrent banner grabs
+            banner_timeout: Banner read timeout in seconds
+            reuse_probe_socket: Read banners from the probe's own connection
+                instead of opening a second one
+            timing: "fixed" uses timeout for every connect, "adaptive"
+                derives a per-host timeout from measured RTTs and retries
+                timed-out ports
+            max_retries: Re-probes per timed-out port (adaptive timing)
+            min_timeout: Lower bound of the adaptive timeout
+            max_timeout: Upper bound of the adaptive timeout and retries
+            concurrency: "static" keeps threads / max_inflight connects in
+                flight, "aimd" grows and shrinks the in-flight window from
+                observed timeout and socket error rates (see congestion)
+            initial_window: Starting (and minimum) in-flight window for "aimd"
+            cache: Optional cache.ResultCache consulted before probing and
+                updated afterwards (single-host scans only)
+            resolver: Shared Resolver (DNS cache); a private one by default
+            metrics: Collect per-scan phase timers, latency histograms,
+                gauges and errno counters (see self.metrics)
+            port_order: "sequential" probes ports as given, "frequency"
+                probes the ports most often found open first (see
+                portspec.PORT_FREQUENCY), so services turn up early in
+                large scans
+            service_probes: Identify open ports by sending protocol probes
+                (HTTP request, TLS ClientHello, ...) in order of how likely
+                each is to match the port, matching replies against the
+                signatures in probes.py, instead of only reading a banner
+            max_probes: Most probes sent to one port (service_probes)
+            budget: ConnectionBudget shared with other scanners; every
+                socket this scanner opens takes one of its slots
+            abortive_close: Close connections to open ports with an RST
+                (SO_LINGER 0) rather than a FIN, so they don't pile up in
+                TIME_WAIT holding ephemeral ports
+
+        The sockets a scan holds, probes plus open ports' sockets waiting
+        for a banner, are capped to what the open-file limit (raised to the
+        hard limit on first use) and the ephemeral port range allow; see
+        sockets.socket_limit().
         """
         self.timeout = timeout
         self.threads = threads
+        self.engine = engine
+        self.max_inflight = max_inflight
+        self.banner_workers = banner_workers
+        self.banner_timeout = banner_timeout
+        self.reuse_probe_socket = reuse_probe_socket
+        self.timing = timing
+        self.max_retries = max_retries
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.concurrency = concurrency
+        self.initial_window = initial_window
+        # Window of the current (or last) aimd scan; read .window and .reason
+        self.congestion: Optional[CongestionWindow] = None
+        self.cache = cache
+        self.resolver = resolver or Resolver()
+        self.collect_metrics = metrics
+        self.port_order = port_order
+        self.max_probes = max_probes
+        # Compiled probe / signature database, shared by every scanner
+        self.probes = default_probe_set() if service_probes else None
+        self.budget = budget
+        self.abortive_close = abortive_close
+        # Pauses every scanner's connects after EMFILE and the like
+        self.backpressure = sockets.BACKPRESSURE
+        sockets.raise_fd_limit()
+        # Metrics of the current (or last) scan when enabled; see metrics.ScanMetrics
+        self.metrics: Optional[ScanMetrics] = None
         self.progress_callback: Optional[Callable] = None
+        self.result_callback: Optional[Callable] = None
+        
+        # Cooperative cancel / pause flags (see cancel, pause, resume) and the
+        # sockets cancel() tears down
+        self._cancelled = threading.Event()
+        self._unpaused = threading.Event()
+        self._unpaused.set()
+        self._stopped_early = threading.Event()  # scan() reached max_open
+        self._inflight_sockets = set()
+        self._sockets_lock = threading.Lock()
+        self._checkpoint = None  # checkpoint.ScanCheckpoint of the running scan
+        self._pool_events = None  # (cancelled, unpaused) shared with scan_many workers
     
     def set_progress_callback(self, callback: Callable[[int, int], None]) -> None:
         """
@@ -43,149 +190,1560 @@ class PortScanner:
             callback: Function that takes (scanned_count, total_count)
         """
         self.progress_callback = callback
-
+    
+    def set_result_callback(self, callback: Callable[[Dict], None]) -> None:
+        """
+        Set callback that receives each port result during scan()
+        
+        Args:
+            callback: Function that takes a port result dict ({"port",
+                "status"}, plus "banner" for open ports), in completion order
+        """
+        self.result_callback = callback
+    
+    def cancel(self) -> None:
+        """
+        Stop the running scan from any thread: no new probes start and
+        in-flight connects and banner reads are torn down instead of
+        running into their timeouts. The scan call then returns what had
+        finished (and saves it to its checkpoint, if one was given).
+        """
+        self._cancelled.set()
+        self._unpaused.set()  # Paused workers have to wake up to notice
+        pool_events = self._pool_events
+        if pool_events is not None:
+            pool_events[0].set()
+            pool_events[1].set()
+        self._abort_sockets()
+    
+    def pause(self) -> None:
+        """Hold new probes until resume(); in-flight ones finish. Saves the checkpoint"""
+        self._unpaused.clear()
+        pool_events = self._pool_events
+        if pool_events is not None:
+            pool_events[1].clear()
+        checkpoint = self._checkpoint
+        if checkpoint is not None:
+            checkpoint.save()
+    
+    def resume(self) -> None:
+        """Continue a paused scan"""
+        self._unpaused.set()
+        pool_events = self._pool_events
+        if pool_events is not None:
+            pool_events[1].set()
+    
+    @property
+    def paused(self) -> bool:
+        return not self._unpaused.is_set()
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether the current (or last) scan was cancelled"""
+        return self._cancelled.is_set()
+    
+    def _begin_scan(self) -> None:
+        """Clear a previous scan's cancel, early-stop and pause state"""
+        self._cancelled.clear()
+        self._stopped_early.clear()
+        self._unpaused.set()
+    
+    def settings(self) -> Dict:
+        """Constructor arguments needed to rebuild this scanner in another process"""
+        return {
+            "timeout": self.timeout,
+            "threads": self.threads,
+            "engine": self.engine,
+            "max_inflight": self.max_inflight,
+            "banner_workers": self.banner_workers,
+            "banner_timeout": self.banner_timeout,
+            "reuse_probe_socket": self.reuse_probe_socket,
+            "timing": self.timing,
+            "max_retries": self.max_retries,
+            "min_timeout": self.min_timeout,
+            "max_timeout": self.max_timeout,
+            "concurrency": self.concurrency,
+            "initial_window": self.initial_window,
+            "metrics": self.collect_metrics,
+            "port_order": self.port_order,
+            "service_probes": self.probes is not None,
+            "max_probes": self.max_probes,
+            "abortive_close": self.abortive_close
+        }
+    
+    def order_ports(self, ports: Iterable[int]) -> Sequence[int]:
+        """
+        Ports in the order this scanner probes them
+        
+        Args:
+            ports: Port numbers (a list or a PortSpec)
+            
+        Returns:
+            ports unchanged for "sequential" order; for "frequency", a lazy
+            sequence of the same ports with the most-likely-open first
+        """
+        if self.port_order not in self.PORT_ORDERS:
+            raise ValueError(f"Unknown port order '{self.port_order}', expected one of {self.PORT_ORDERS}")
+        if self.port_order == "frequency" and not isinstance(ports, FrequencyOrder):
+            return PortSpec.from_ports(ports).by_frequency()
+        return ports
 
     
-    def scan(self, target: str, ports: List[int]) -> Dict:
+    def scan(self, target: str, ports: List[int], engine: Optional[str] = None,
+             checkpoint: Optional[str] = None, max_open: Optional[int] = None) -> Dict:
         """
         Scan target for open ports
         
         Args:
             target: IP address or hostname
             ports: List of port numbers to scan
+            engine: Override the scanner's engine ("thread" or "async")
+            checkpoint: File finished ports are saved to while scanning; if
+                it holds an unfinished run of the same scan, only the
+                remaining ports are probed. Deleted once the scan completes.
+            max_open: Stop once this many open ports are found (pairs well
+                with port_order="frequency"); the scan still succeeds
             
         Returns:
             Dict with keys:
-                - success: bool
+                - success: bool (False with error "Scan cancelled" and the
+                  partial results after cancel(), or with the error and
+                  partial results if the machine ran out of sockets)
                 - error: str or None
-                - results: Dict with scan data or None
+                - results: ScanResult (reads like a dict of scan data) or None
+                - metrics: ScanMetrics.to_dict() summary, or None unless the
+                  scanner was built with metrics=True
         """
-        print(f"[PortScanner] Starting scan on {target} for {len(ports)} ports")
+        engine = engine or self.engine
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {self.ENGINES}")
+        ports = self.order_ports(ports)
+        
+        print(f"[PortScanner] Starting {engine} scan on {target} for {len(ports)} ports")
+        self._begin_scan()
+        metrics = self._new_metrics()
         
         # Resolve hostname to IP
+        resolve_start = time.perf_counter()
         ip = self._resolve_host(target)
+        if metrics is not None:
+            metrics.add_phase("resolve", time.perf_counter() - resolve_start)
         if not ip:
             error = f"Could not resolve {target}"
             print(f"[PortScanner ERROR] {error}")
             return {
                 "success": False,
                 "error": error,
-                "results": None
+                "results": None,
+                "metrics": metrics.to_dict() if metrics is not None else None
             }
         
-        # Run scan
         start_time = datetime.utcnow()
-        open_ports, closed_ports, filtered_ports = [], [], []
+        scan_start = time.perf_counter()
+        timestamp = start_time.strftime("%Y%m%dT%H%M%SZ")
+        state = None
+        to_probe = ports
+        if checkpoint:
+            from checkpoint import ScanCheckpoint
+            state = ScanCheckpoint(checkpoint, [target], ports)
+            results = state.host(ip, target, timestamp)
+            to_probe = state.remaining(ip, ports)
+            if state.resumed:
+                print(f"[PortScanner] Resuming from checkpoint: {len(ports) - len(to_probe)} ports already done")
+        else:
+            results = ScanResult(target, ip, timestamp)
+        
+        # Count ports finished in an earlier run as already scanned
+        callback = self.progress_callback
+        done = len(ports) - len(to_probe)
+        if callback and done:
+            self.progress_callback = lambda scanned, total: callback(scanned + done, total + done)
+        self._checkpoint = state
+        
+        # Run scan, recording each result straight into the compact store
+        open_count = 0
+        exhausted = None
+        port_results = self._iter_ports(ip, to_probe, engine)
+        try:
+            for port_result in port_results:
+                if state is not None:
+                    state.record(ip, port_result)
+                else:
+                    results.add_result(port_result)
+                if self.result_callback:
+                    self.result_callback(port_result)
+                if port_result["status"] == "open":
+                    open_count += 1
+                    if max_open is not None and open_count >= max_open:
+                        print(f"[PortScanner] Found {open_count} open ports, stopping early")
+                        # Refuse new connects first, so probes the pool starts
+                        # from here on can't slip past the teardown, then cut
+                        # in-flight connects and banner reads short as cancel()
+                        # does rather than waiting out their timeouts
+                        self._stopped_early.set()
+                        self._abort_sockets()
+                        break
+        except ResourceExhaustedError as e:
+            exhausted = e
+        finally:
+            port_results.close()
+            self.progress_callback = callback
+            self._checkpoint = None
+        
+        results.duration_s = (datetime.utcnow() - start_time).total_seconds()
+        summary_start = time.perf_counter()
+        summary = results.summary
+        if metrics is not None:
+            metrics.add_phase("scan", summary_start - scan_start)
+            metrics.add_phase("summarize", time.perf_counter() - summary_start)
+        
+        if exhausted is not None:
+            # Ports that never got a socket are left unscanned, not guessed
+            if state is not None:
+                state.save()
+            print(f"[PortScanner ERROR] {exhausted}")
+            return {
+                "success": False,
+                "error": str(exhausted),
+                "results": results,
+                "metrics": metrics.to_dict() if metrics is not None else None
+            }
+        if self._cancelled.is_set():
+            if state is not None:
+                state.save()
+            print(f"[PortScanner] Scan cancelled: {summary['total_open']} open, {summary['total_closed']} closed, {summary['total_filtered']} filtered so far")
+            return {
+                "success": False,
+                "error": "Scan cancelled",
+                "results": results,
+                "metrics": metrics.to_dict() if metrics is not None else None
+            }
+        if state is not None:
+            state.discard()
+        
+        print(f"[PortScanner] Scan complete: {summary['total_open']} open, {summary['total_closed']} closed, {summary['total_filtered']} filtered in {results.duration_s:.2f}s")
+        
+        # Return clean data
+        return {
+            "success": True,
+            "error": None,
+            "results": results,
+            "metrics": metrics.to_dict() if metrics is not None else None
+        }
+    
+    def scan_iter(self, target: str, ports: List[int], engine: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Scan target, yielding each port result as soon as it completes
+        
+        Args:
+            target: IP address or hostname
+            ports: List of port numbers to scan
+            engine: Override the scanner's engine ("thread" or "async")
+            
+        Yields:
+            Dicts shaped like scan()'s port entries ({"port", "status"},
+            plus "banner" for open ports), in completion order
+            
+        Raises:
+            ScanError: If the target cannot be resolved
+            ResourceExhaustedError: If this machine stays out of sockets
+                for RESOURCE_WAIT_LIMIT seconds mid-scan
+        """
+        engine = engine or self.engine
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {self.ENGINES}")
+        ports = self.order_ports(ports)
+        self._begin_scan()
+        self._new_metrics()
+        ip = self._resolve_host(target)
+        if not ip:
+            raise ScanError(f"Could not resolve {target}")
+        yield from self._iter_ports(ip, ports, engine)
+    
+    async def ascan_iter(self, target: str, ports: List[int]) -> AsyncIterator[Dict]:
+        """
+        Async-iterator variant of scan_iter, always using the async engine
+        
+        Args:
+            target: IP address or hostname
+            ports: List of port numbers to scan
+            
+        Yields:
+            Port result dicts in completion order
+            
+        Raises:
+            ScanError: If the target cannot be resolved
+            ResourceExhaustedError: As for scan_iter
+        """
+        ports = self.order_ports(ports)
+        self._begin_scan()
+        metrics = self._new_metrics()
+        addresses = await self.resolver.resolve_async(target)
+        ip = addresses[0] if addresses else None
+        if not ip:
+            raise ScanError(f"Could not resolve {target}")
+        async for result in self._aiter_ports(ip, ports):
+            if metrics is not None:
+                metrics.on_result(result["status"])
+            yield result
+    
+    def _iter_ports(self, ip: str, ports: List[int], engine: str) -> Iterator[Dict]:
+        """Dispatch to the engine's result stream for an already resolved IP"""
+        if self.cache is not None:
+            results = self._iter_cached(ip, ports, engine)
+        elif engine == "async":
+            results = self._drive_async(self._aiter_ports(ip, ports))
+        else:
+            results = self._iter_threaded(ip, ports)
+        if self.metrics is not None:
+            return self._count_results(results, self.metrics)
+        return results
+    
+    @staticmethod
+    def _count_results(results: Iterator[Dict], metrics: ScanMetrics) -> Iterator[Dict]:
+        """Pass results through, counting final statuses"""
+        for result in results:
+            metrics.on_result(result["status"])
+            yield result
+    
+    def _iter_cached(self, ip: str, ports: List[int], engine: str) -> Iterator[Dict]:
+        """Answer what the result cache can, probe the rest and cache it"""
+        cached, to_probe = self.cache.plan(ip, ports)
+        total_ports = len(cached) + len(to_probe)
+        print(f"[PortScanner] Cache answered {len(cached)} ports, probing {len(to_probe)}")
+        
+        callback = self.progress_callback
+        for scanned_count, result in enumerate(cached, 1):
+            if callback:
+                callback(scanned_count, total_ports)
+            yield result
+        
+        # Shift the engine's progress past the ports answered from cache
+        if callback:
+            self.progress_callback = lambda scanned, total: callback(scanned + len(cached), total_ports)
+        try:
+            if engine == "async":
+                results = self._drive_async(self._aiter_ports(ip, to_probe))
+            else:
+                results = self._iter_threaded(ip, to_probe)
+            for result in results:
+                self.cache.store(ip, result)
+                yield result
+        finally:
+            self.progress_callback = callback
+            self.cache.flush()
+    
+    @staticmethod
+    def _drive_async(agen) -> Iterator[Dict]:
+        """Step an async generator on a private event loop from sync code"""
+        import asyncio
+        try:
+            loop = asyncio.new_event_loop()
+        except OSError as e:
+            raise ResourceExhaustedError(f"Could not start the async engine: {e}") from e
+        try:
+            while True:
+                try:
+                    result = loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    break
+                yield result
+        finally:
+            loop.run_until_complete(agen.aclose())
+            loop.close()
+    
+    def _iter_threaded(self, ip: str, ports: List[int]) -> Iterator[Dict]:
+        """
+        Thread engine: one blocking connect per pool task. Only about two
+        pool-fulls of probes (or the aimd window) are queued at a time, and
+        open ports are handed
+        to a separate banner pool so closed and filtered results keep
+        flowing while banners are collected. An open port waiting for a
+        banner worker still holds its probe socket, so it counts against
+        that queue: probing slows down instead of piling up open sockets
+        when the banner stage falls behind.
+        """
+        total_ports = len(ports)
+        scanned_count = 0
+        port_iter = iter(ports)
+        threads = self._socket_concurrency(self.threads)
+        # Running probes and pending banners hold up to this many sockets
+        max_queued = min(threads * 2, sockets.socket_limit())
+        probes, banners = {}, {}  # future -> port / future -> probe socket
+        rtt = self._new_rtt_estimator()
+        cwnd = self._new_congestion_window(threads)
+        metrics = self.metrics
+        
+        executor = ThreadPoolExecutor(max_workers=threads)
+        banner_executor = ThreadPoolExecutor(max_workers=self.banner_workers)
+        try:
+            while True:
+                if self._cancelled.is_set():
+                    return
+                
+                # Top up the probe queue from the port iterator
+                limit = cwnd.window if cwnd else max_queued
+                while len(probes) + len(banners) < limit:
+                    port = next(port_iter, None)
+                    if port is None:
+                        break
+                    queued_at = time.perf_counter() if metrics is not None else None
+                    probes[executor.submit(self._probe, ip, port, rtt=rtt, cwnd=cwnd,
+                                           queued_at=queued_at)] = port
+                if not probes and not banners:
+                    break
+                if metrics is not None:
+                    metrics.gauge_set("queue_depth", len(probes) + len(banners))
+                
+                done, _ = wait(list(probes) + list(banners), return_when=FIRST_COMPLETED)
+                for future in done:
+                    # cancel() raises the flag before tearing sockets down, so
+                    # this drops every probe it cut short
+                    if self._cancelled.is_set():
+                        return
+                    if future in banners:
+                        del banners[future]
+                        yield future.result()
+                        continue
+                    
+                    port = probes.pop(future)
+                    scanned_count += 1
+                    
+                    # Emit progress
+                    if self.progress_callback:
+                        self.progress_callback(scanned_count, total_ports)
+                    
+                    try:
+                        result, sock = future.result()
+                    except ResourceExhaustedError:
+                        raise
+                    except Exception:
+                        result, sock = {"port": port, "status": "filtered"}, None
+                    
+                    if result["status"] == "open":
+                        banners[banner_executor.submit(self._grab_banner, ip, port, sock)] = sock
+                    else:
+                        yield result
+        finally:
+            # Stop early if the consumer abandoned the generator
+            executor.shutdown(wait=True, cancel_futures=True)
+            banner_executor.shutdown(wait=True, cancel_futures=True)
+            for future, sock in banners.items():
+                if future.cancelled() and sock is not None:
+                    self._close(sock)
+                    if self.budget is not None:
+                        self.budget.release()
+    
+    async def _aiter_ports(self, ip: str, ports: List[int]) -> AsyncIterator[Dict]:
+        """
+        Async engine: a fixed set of worker coroutines pull ports from a
+        shared iterator, so at most max_inflight sockets are open at once
+        no matter how many ports are queued. Banners are grabbed in
+        separate tasks bounded by banner_workers, and everything is fed
+        through a bounded queue to the consumer. An open port's socket keeps
+        its slot in socket_slots until its banner task is done with it, so
+        open ports waiting for a banner worker count towards max_inflight.
+        """
+        import asyncio
         total_ports = len(ports)
         scanned_count = 0
+        port_iter = iter(ports)
+        max_inflight = self._socket_concurrency(self.max_inflight)
+        queue = asyncio.Queue(maxsize=max(1, max_inflight))
+        banner_slots = asyncio.Semaphore(self.banner_workers)
+        socket_slots = asyncio.Semaphore(max_inflight)  # Probe connects + sockets held for banners
+        banner_tasks = set()
+        stopping = asyncio.Event()
+        rtt = self._new_rtt_estimator()
+        cwnd = self._new_congestion_window(max_inflight)
+        window_open = asyncio.Condition()
+        inflight = 0
+        failure = None  # ResourceExhaustedError that stopped the workers
+        metrics = self.metrics
+        
+        async def grab_banner(port, sock):
+            try:
+                try:
+                    await banner_slots.acquire()
+                except BaseException:
+                    if sock is not None:
+                        self._close(sock)  # Cancelled before the banner stage ran
+                        if self.budget is not None:
+                            self.budget.release()
+                    raise
+                try:
+                    # Closes sock (and frees its budget slot) even if cancelled
+                    result = await self._grab_banner_async(ip, port, sock)
+                finally:
+                    banner_slots.release()
+            finally:
+                socket_slots.release()  # Taken by the worker that probed port
+            await queue.put(result)
         
-        with ThreadPoolExecutor(max_workers=self.threads) as executor:
-            futures = {executor.submit(self._scan_port, ip, p): p for p in ports}
+        async def probe(port):
+            nonlocal inflight
+            if cwnd is None:
+                return await self._probe_async(ip, port, rtt=rtt)
             
-            for future in as_completed(futures):
+            # aimd: wait for room in the congestion window
+            queued_at = time.perf_counter()
+            async with window_open:
+                await window_open.wait_for(lambda: inflight < cwnd.window)
+                inflight += 1
+            if metrics is not None:
+                metrics.observe("queue_wait", time.perf_counter() - queued_at)
+            try:
+                return await self._probe_async(ip, port, rtt=rtt, cwnd=cwnd)
+            finally:
+                inflight -= 1
+                async with window_open:
+                    window_open.notify(max(1, cwnd.window - inflight))
+        
+        async def worker():
+            nonlocal scanned_count, failure
+            for port in port_iter:
+                while not self._unpaused.is_set() and not self._cancelled.is_set():
+                    await asyncio.sleep(0.05)
+                if stopping.is_set() or self._cancelled.is_set():
+                    return  # Consumer went away, scan cancelled or out of sockets
+                await socket_slots.acquire()
+                try:
+                    result, sock = await probe(port)
+                except ResourceExhaustedError as e:
+                    socket_slots.release()
+                    failure = failure or e
+                    stopping.set()
+                    return
+                except BaseException:
+                    socket_slots.release()
+                    raise
                 scanned_count += 1
                 
                 # Emit progress
                 if self.progress_callback:
                     self.progress_callback(scanned_count, total_ports)
                 
-                try:
-                    result = future.result()
-                except Exception:
-                    result = None
+                if result["status"] == "open":
+                    # The socket slot passes to the banner task
+                    task = asyncio.create_task(grab_banner(port, sock))
+                    banner_tasks.add(task)
+                    task.add_done_callback(banner_tasks.discard)
+                else:
+                    socket_slots.release()
+                    await queue.put(result)
+        
+        async def watch_cancel():
+            # cancel() may come from another thread or, for a scan_many
+            # shard, another process; either way tear down what's in flight
+            while not self._cancelled.is_set():
+                await asyncio.sleep(0.05)
+            self._abort_sockets()
+        
+        async def finish(workers):
+            await asyncio.gather(*workers)
+            while banner_tasks:
+                await asyncio.gather(*banner_tasks)
+            watcher.cancel()
+            await queue.put(None)
+        
+        workers = [asyncio.create_task(worker())
+                   for _ in range(max(1, min(max_inflight, total_ports)))]
+        watcher = asyncio.create_task(watch_cancel())
+        finisher = asyncio.create_task(finish(workers))
+        try:
+            while True:
+                if metrics is not None:
+                    metrics.gauge_set("queue_depth", queue.qsize())
+                result = await queue.get()
+                if result is None or self._cancelled.is_set():
+                    break  # Finished, or cancelled (probes cut short are dropped)
+                yield result
+            if failure is not None:
+                raise failure
+        finally:
+            # Consumer stopped early: cancel everything, draining the queue so
+            # a task that slipped past its cancellation can't block on put()
+            stopping.set()
+            while True:
+                tasks = [t for t in workers + list(banner_tasks) + [watcher, finisher] if not t.done()]
+                if not tasks:
+                    break
+                for task in tasks:
+                    task.cancel()
+                await asyncio.wait(tasks, timeout=0.05)
+                while not queue.empty():
+                    queue.get_nowait()
+    
+    def discover(self, targets: Union[str, Iterable[str]],
+                 ports: Optional[Sequence[int]] = None) -> Dict[str, bool]:
+        """
+        Find which hosts are up with TCP pings, e.g. to skip dead ones
+        before scan()
+        
+        Every ping port of a host is connected to at once; an answer or a
+        refusal (RST) on any of them means the host is up, and the rest
+        are dropped. A host is taken to be down once every ping has timed
+        out or been unreachable, so a host that firewalls all of the ping
+        ports but not others is missed.
+        
+        Args:
+            targets: CIDR blocks, IP ranges, hostnames, or a list of them
+                (see parse_targets)
+            ports: Ports to ping (default DISCOVERY_PORTS)
+            
+        Returns:
+            Dict of ip -> True if the host is up; names that do not
+            resolve are left out
+            
+        Raises:
+            ResourceExhaustedError: If the event loop cannot be created
+        """
+        ports = tuple(ports or self.DISCOVERY_PORTS)
+        ips = []
+        for addresses in self.resolver.resolve_many(self.parse_targets(targets)).values():
+            if addresses and addresses[0] not in ips:
+                ips.append(addresses[0])
+        self._begin_scan()
+        answered = dict(self._drive_async(self.adiscover(ips, ports)))
+        up = {ip: answered[ip] for ip in ips if ip in answered}  # Target order
+        print(f"[PortScanner] Host discovery: {sum(up.values())} of {len(up)} hosts up")
+        return up
+    
+    async def adiscover(self, ips: Iterable[str],
+                        ports: Optional[Sequence[int]] = None) -> AsyncIterator[Tuple[str, bool]]:
+        """
+        Async counterpart of discover() for resolved IPs: yields (ip, up)
+        as each host's pings finish, pinging as many hosts at once as the
+        socket limit allows. Like scan(), it starts fresh self.metrics, so
+        the pings don't land in an earlier scan's counters.
+        """
+        import asyncio
+        ports = tuple(ports or self.DISCOVERY_PORTS)
+        metrics = self._new_metrics()
+        start = time.perf_counter()
+        pending = iter(ips)
+        running = {}
+        slots = self._discovery_slots(ports)
+        try:
+            while True:
+                while len(running) < slots:
+                    ip = next(pending, None)
+                    if ip is None:
+                        break
+                    running[asyncio.ensure_future(self.aping(ip, ports))] = ip
+                if not running:
+                    return
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield running.pop(task), task.result()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            if metrics is not None:
+                metrics.add_phase("discovery", time.perf_counter() - start)
+    
+    async def aping(self, ip: str, ports: Optional[Sequence[int]] = None) -> bool:
+        """
+        Whether ip answers or refuses a connect on any of ports (default
+        DISCOVERY_PORTS), all tried at once; the async TCP ping discover()
+        uses
+        """
+        import asyncio
+        ports = ports or self.DISCOVERY_PORTS
+        tasks = [asyncio.ensure_future(self._probe_async(ip, port, keep_open=False)) for port in ports]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result, _ = await next_done
+                if result["status"] != "filtered":
+                    return True
+            return False
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def _discovery_slots(self, ports: Sequence[int]) -> int:
+        """Hosts pinged at once: each takes a socket per ping port"""
+        return max(1, self._socket_concurrency(self.max_inflight) // max(1, len(ports)))
+    
+    def scan_many(self, targets: Union[str, Iterable[str]], ports: List[int],
+                  processes: Optional[int] = None, shard_size: int = 4096,
+                  host_callback: Optional[Callable[[str, Dict], None]] = None,
+                  checkpoint: Optional[str] = None, discover: bool = True,
+                  discovery_ports: Optional[Sequence[int]] = None) -> Dict:
+        """
+        Scan several hosts, sharding (host, ports) work across a process pool
+        
+        Each worker process runs the async engine on its shard, so connect
+        throughput scales with the number of cores instead of one GIL.
+        
+        Args:
+            targets: CIDR blocks, IP ranges, hostnames, or a list of them
+                (see parse_targets)
+            ports: List of port numbers to scan on every host
+            processes: Worker process count (default: os.cpu_count())
+            shard_size: Max ports per work unit
+            host_callback: Called with (ip, host_results) as soon as every
+                shard of a host has finished
+            checkpoint: File finished shards are saved to, as in scan();
+                a rerun of the same sweep skips every port already done
+            discover: Ping each host first (see discover()) and only scan
+                the ones that are up; False scans every host
+            discovery_ports: Ports to ping (default DISCOVERY_PORTS)
+            
+        A shard that raises is resubmitted up to SHARD_RETRIES times, then
+        its host is reported under "failed" and the scan fails. A shard out
+        of sockets (ResourceExhaustedError) stops the whole scan as it does
+        scan(). Either way a checkpoint is kept for a rerun.
+        
+        Pings run on an event loop in this process while live hosts'
+        shards are already being scanned; hosts a checkpoint has already
+        started are not pinged again. The result cache is not consulted
+        here; worker processes probe every port.
+            
+        Returns:
+            Dict with keys:
+                - success: bool (False with error "Scan cancelled" after
+                  cancel(), or when a host failed or sockets ran out;
+                  results then hold the hosts that finished)
+                - error: str or None
+                - results: Dict with keys "hosts" (ip -> ScanResult, as in
+                  scan()["results"]), "unresolved", "down" (IPs that did not
+                  answer discovery), "failed" (ip -> error of a host whose
+                  shard kept failing), "duration_s", "summary"
+                - metrics: Every shard's metrics merged, as in scan()
+        """
+        hosts = self.parse_targets(targets)
+        if not hosts:
+            error = f"No valid targets in {targets!r}"
+            print(f"[PortScanner ERROR] {error}")
+            return {"success": False, "error": error, "results": None, "metrics": None}
+        
+        print(f"[PortScanner] Starting multi-target scan on {len(hosts)} hosts for {len(ports)} ports each")
+        self._begin_scan()
+        
+        start_time = datetime.utcnow()
+        timestamp = start_time.strftime("%Y%m%dT%H%M%SZ")
+        ports = self.order_ports(ports if isinstance(ports, Sequence) else list(ports))
+        shard_size = max(1, shard_size)
+        shards = [ports[i:i + shard_size] for i in range(0, len(ports), shard_size)]
+        settings = self.settings()
+        metrics = self._new_metrics()
+        state = None
+        if checkpoint:
+            from checkpoint import ScanCheckpoint
+            state = ScanCheckpoint(checkpoint, hosts, ports)
+            if state.resumed:
+                print(f"[PortScanner] Resuming from checkpoint with {len(state.hosts)} hosts started")
+        
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        
+        # Worker processes share these to see cancel() / pause()
+        self._pool_events = (multiprocessing.Event(), multiprocessing.Event())
+        self._pool_events[1].set()
+        
+        # Host discovery: at most ping_slots hosts are pinged at once, the
+        # rest wait their turn in ping_queue
+        ping_ports = tuple(discovery_ports or self.DISCOVERY_PORTS) if discover else ()
+        ping_loop = None
+        if ping_ports:
+            import asyncio
+            try:
+                ping_loop = asyncio.new_event_loop()
+            except OSError as e:
+                error = f"Could not start host discovery: {e}"
+                print(f"[PortScanner ERROR] {error}")
+                return {"success": False, "error": error, "results": None, "metrics": None}
+            ping_thread = threading.Thread(target=ping_loop.run_forever, name="discovery", daemon=True)
+            ping_thread.start()
+        ping_slots = self._discovery_slots(ping_ports)
+        ping_queue, ping_futures, down = deque(), set(), []
+        
+        # Per-host accumulators, finalised once the last shard lands
+        ips, unresolved = {}, []
+        pending, partial, hosts_results, failed = {}, {}, {}, {}
+        total_ports = len(hosts) * len(ports)
+        scanned_count = 0
+        
+        # Name lookups and shards both report into one completion queue, so
+        # a host's shards start as soon as its name resolves
+        completed = queue.Queue()
+        outstanding = 0
+        shard_futures = {}  # future -> (ip, ports, attempt)
+        cancelling = False
+        exhausted = None  # ResourceExhaustedError that stopped the scan
+        
+        def track(future, kind, key):
+            nonlocal outstanding
+            outstanding += 1
+            future.add_done_callback(lambda f: completed.put((kind, key, f)))
+        
+        def finish_host(ip):
+            hosts_results[ip] = partial.pop(ip)
+            hosts_results[ip].duration_s = (datetime.utcnow() - start_time).total_seconds()
+            if host_callback:
+                host_callback(ip, hosts_results[ip])
+        
+        def start_host(ip):
+            nonlocal scanned_count
+            host_shards = shards
+            if state is not None:
+                partial[ip] = state.host(ip, ips[ip], timestamp)
+                remaining = state.remaining(ip, ports)
+                if len(remaining) < len(ports):
+                    scanned_count += len(ports) - len(remaining)
+                    host_shards = [remaining[i:i + shard_size]
+                                   for i in range(0, len(remaining), shard_size)]
+            else:
+                partial[ip] = ScanResult(ips[ip], ip, timestamp)
+            pending[ip] = len(host_shards)
+            if not host_shards:
+                finish_host(ip)  # Finished in an earlier run
+            for shard in host_shards:
+                submit_shard(ip, shard)
+        
+        def submit_shard(ip, shard, attempt=0):
+            shard_future = executor.submit(_scan_shard, settings, ip, shard)
+            shard_futures[shard_future] = (ip, shard, attempt)
+            track(shard_future, "shard", ip)
+        
+        def ping_next():
+            while ping_queue and len(ping_futures) < ping_slots:
+                ip = ping_queue.popleft()
+                future = asyncio.run_coroutine_threadsafe(self.aping(ip, ping_ports), ping_loop)
+                ping_futures.add(future)
+                track(future, "pinged", ip)
+        
+        self._checkpoint = state
+        try:
+            with ProcessPoolExecutor(max_workers=processes or os.cpu_count(),
+                                     initializer=_init_shard_worker,
+                                     initargs=self._pool_events) as executor:
+                for host in hosts:
+                    track(self.resolver.submit(host), "resolved", host)
                 
-                if result:
-                    status = result["status"]
-                    if status == "open":
-                        port_num = result["port"]
-                        banner = self._grab_banner(ip, port_num)
-                        open_ports.append({
-                            "port": port_num,
-                            "status": status,
-                            "banner": banner
-                        })
-                    elif status == "closed":
-                        closed_ports.append(result)
+                while outstanding:
+                    try:
+                        kind, key, future = completed.get(timeout=0.1)
+                    except queue.Empty:
+                        kind = None
+                    
+                    # Cancelled: drop queued shards and pings, running ones
+                    # return early
+                    if self._cancelled.is_set() and not cancelling:
+                        cancelling = True
+                        ping_queue.clear()
+                        for pending_future in shard_futures.keys() | ping_futures:
+                            pending_future.cancel()
+                    if kind is None:
+                        continue
+                    outstanding -= 1
+                    
+                    if kind == "resolved":
+                        addresses = future.result()
+                        ip = addresses[0] if addresses else None
+                        if not ip:
+                            print(f"[PortScanner] Failed to resolve {key}")
+                            unresolved.append(key)
+                            total_ports -= len(ports)
+                            continue
+                        if ip in ips:
+                            total_ports -= len(ports)  # Another name for a host already queued
+                            continue
+                        print(f"[PortScanner] Resolved {key} -> {ip}")
+                        ips[ip] = key
+                        if cancelling:
+                            continue
+                        if ping_loop is not None and (state is None or ip not in state.hosts):
+                            ping_queue.append(ip)
+                            ping_next()
+                        else:
+                            start_host(ip)
+                        continue
+                    
+                    if kind == "pinged":
+                        ping_futures.discard(future)
+                        ping_next()
+                        try:
+                            up = future.result()
+                        except CancelledError:
+                            continue
+                        except Exception as e:
+                            print(f"[PortScanner ERROR] Discovery failed for {key}: {e}")
+                            up = True  # Scan it rather than lose it
+                        if cancelling:
+                            continue
+                        if not up:
+                            down.append(key)
+                            total_ports -= len(ports)
+                            if self.progress_callback:
+                                self.progress_callback(scanned_count, total_ports)
+                        else:
+                            start_host(key)
+                        continue
+                    
+                    ip, shard, attempt = shard_futures.pop(future)
+                    try:
+                        ip, shard_len, shard_results, shard_metrics = future.result()
+                    except CancelledError:
+                        continue
+                    except ResourceExhaustedError as e:
+                        # Out of sockets: stop as scan() does. Running shards
+                        # see the shared cancel event and hand back what they
+                        # finished; queued ones are dropped
+                        if exhausted is None:
+                            exhausted = e
+                            cancelling = True
+                            ping_queue.clear()
+                            self._pool_events[0].set()
+                            for pending_future in shard_futures.keys() | ping_futures:
+                                pending_future.cancel()
+                        continue
+                    except Exception as e:
+                        if attempt < self.SHARD_RETRIES and not cancelling:
+                            print(f"[PortScanner] Shard of {ip} failed ({e}), retrying")
+                            try:
+                                submit_shard(ip, shard, attempt + 1)
+                                continue
+                            except RuntimeError as submit_error:  # Pool broken or shut down
+                                e = submit_error
+                        failed.setdefault(ip, f"{type(e).__name__}: {e}")
+                        pending[ip] -= 1
+                        continue
+                    
+                    merge_start = time.perf_counter()
+                    if state is not None:
+                        state.merge(ip, shard_results)
                     else:
-                        filtered_ports.append(result)
+                        partial[ip].update(shard_results)
+                    if metrics is not None:
+                        metrics.merge(shard_metrics)
+                        metrics.add_phase("merge", time.perf_counter() - merge_start)
+                    scanned_count += shard_len
+                    
+                    # Emit progress
+                    if self.progress_callback:
+                        self.progress_callback(scanned_count, total_ports)
+                    
+                    pending[ip] -= 1
+                    if pending[ip] == 0 and not cancelling and ip not in failed:
+                        finish_host(ip)
+        finally:
+            self._checkpoint = None
+            self._pool_events = None
+            if ping_loop is not None:
+                # Stop the loop thread, then finish any cancelled pings here
+                ping_loop.call_soon_threadsafe(ping_loop.stop)
+                ping_thread.join()
+                leftover = asyncio.all_tasks(ping_loop)
+                for task in leftover:
+                    task.cancel()
+                if leftover:
+                    ping_loop.run_until_complete(asyncio.gather(*leftover, return_exceptions=True))
+                ping_loop.close()
         
         duration = (datetime.utcnow() - start_time).total_seconds()
+        summary = {
+            "total_hosts": len(hosts_results),
+            "hosts_down": len(down),
+            "hosts_failed": len(failed),
+            "total_open": sum(r.count("open") for r in hosts_results.values()),
+            "total_closed": sum(r.count("closed") for r in hosts_results.values()),
+            "total_filtered": sum(r.count("filtered") for r in hosts_results.values())
+        }
         
-        print(f"[PortScanner] Scan complete: {len(open_ports)} open, {len(closed_ports)} closed, {len(filtered_ports)} filtered in {duration:.2f}s")
+        if metrics is not None:
+            metrics.add_phase("scan", duration)
+        # Resolved hosts that were neither scanned to the end nor found down
+        unfinished = [ip for ip in ips if ip not in hosts_results and ip not in down]
+        if exhausted is not None:
+            error = str(exhausted)
+            print(f"[PortScanner ERROR] {error}")
+        elif self._cancelled.is_set():
+            error = "Scan cancelled"
+            print(f"[PortScanner] Multi-target scan cancelled: {summary['total_hosts']} hosts finished")
+        elif failed:
+            error = f"{len(failed)} hosts failed: " + "; ".join(f"{ip}: {e}" for ip, e in failed.items())
+            print(f"[PortScanner ERROR] Multi-target scan incomplete: {error}")
+        elif unfinished:
+            error = f"{len(unfinished)} hosts did not finish: {', '.join(unfinished)}"
+            print(f"[PortScanner ERROR] Multi-target scan incomplete: {error}")
+        else:
+            error = None
+            print(f"[PortScanner] Multi-target scan complete: {summary['total_hosts']} hosts, {summary['total_open']} open ports in {duration:.2f}s"
+                  + (f" ({len(down)} hosts down, not scanned)" if down else ""))
+        
+        # Keep the checkpoint for a rerun unless every host is accounted for
+        if state is not None:
+            if error is not None:
+                state.save()
+            else:
+                state.discard()
         
-        # Return clean data
         return {
-            "success": True,
-            "error": None,
+            "success": error is None,
+            "error": error,
             "results": {
-                "target": target,
-                "ip": ip,
-                "timestamp_utc": start_time.strftime("%Y%m%dT%H%M%SZ"),
+                "timestamp_utc": timestamp,
                 "duration_s": duration,
-                "open_ports": sorted(open_ports, key=lambda x: x["port"]),
-                "closed_ports": sorted(closed_ports, key=lambda x: x["port"]),
-                "filtered_ports": sorted(filtered_ports, key=lambda x: x["port"]),
-                "summary": {
-                    "total_open": len(open_ports),
-                    "total_closed": len(closed_ports),
-                    "total_filtered": len(filtered_ports)
-                }
-            }
+                "hosts": hosts_results,
+                "unresolved": unresolved,
+                "down": down,
+                "failed": failed,
+                "summary": summary
+            },
+            "metrics": metrics.to_dict() if metrics is not None else None
         }
     
     def _scan_port(self, host: str, port: int) -> Dict:
         """Scan a single port"""
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.settimeout(self.timeout)
+        result, sock = self._probe(host, port, keep_open=False)
+        return result
+    
+    def _probe(self, host: str, port: int, keep_open: Optional[bool] = None,
+               rtt: Optional[RttEstimator] = None, cwnd: Optional[CongestionWindow] = None,
+               queued_at: Optional[float] = None):
+        """
+        Scan a single port for the pipeline. Returns (result, sock) where
+        sock is the still-connected probe socket when the port is open and
+        reuse_probe_socket is set, otherwise None.
+        
+        With an RTT estimator, answered connects feed it and timed-out
+        connects are retried up to max_retries times with backed-off timeouts.
+        Every attempt is reported to the congestion window, if any.
+        queued_at is the perf_counter() time the probe was submitted to the
+        pool, for the queue-wait metric.
+        """
+        if keep_open is None:
+            keep_open = self.reuse_probe_socket
+        metrics = self.metrics
+        if metrics is not None and queued_at is not None:
+            metrics.observe("queue_wait", time.perf_counter() - queued_at)
+        if not self._unpaused.is_set():
+            self._unpaused.wait()
+        budget = self.budget
+        attempt = 0
+        while True:
+            pause = self.backpressure.wait_time()
+            if pause:
+                self._cancelled.wait(pause)
+            if budget is not None:
+                budget.acquire()
+            if metrics is not None:
+                metrics.gauge_add("inflight", 1)
+            res, s, elapsed = self._connect(host, port, self._probe_timeout(rtt, attempt))
+            if metrics is not None:
+                metrics.gauge_add("inflight", -1)
+            if self._observe(rtt, cwnd, res, elapsed, attempt):
+                if budget is not None:
+                    budget.release()
+                attempt += 1
+                continue
+            if res in RESOURCE_CODES and not self._cancelled.is_set():
+                if budget is not None:
+                    budget.release()
+                self._exhausted(port, res)
+                continue
+            if self.backpressure.stalled_since is not None:
+                self.backpressure.relieved()
+            break
+        
+        if res == 0 and keep_open:
+            return {"port": port, "status": "open"}, s  # s keeps its budget slot until the banner stage
+        if budget is not None:
+            budget.release()
+        if res is None:
+            return {"port": port, "status": "filtered"}, None
+        if s is not None:
+            self._close(s)
+        return {"port": port, "status": self._status_for_code(res)}, None
+    
+    def _connect(self, host: str, port: int, timeout: float):
+        """
+        One blocking connect attempt. Returns (code, sock, elapsed) where
+        code is the connect_ex result (None if the socket call raised, or
+        e.g. EMFILE if no socket could be created) and sock is only set for
+        a successful connect.
+        """
+        start = time.monotonic()
+        try:
+            s = socket.socket(self._family(host), socket.SOCK_STREAM)
+        except OSError as e:
+            return e.errno, None, time.monotonic() - start  # e.g. EMFILE
+        s.settimeout(timeout)
+        if not self._track(s):
+            s.close()
+            return None, None, time.monotonic() - start  # Cancelled
         try:
             res = s.connect_ex((host, port))
+        except Exception:
             s.close()
-            if res == 0:
-                return {"port": port, "status": "open"}
-            elif res == 111:
-                return {"port": port, "status": "filtered"}
-            else:
-                return {"port": port, "status": "closed"}
+            return None, None, time.monotonic() - start
+        finally:
+            self._untrack(s)
+        elapsed = time.monotonic() - start
+        if res != 0:
+            s.close()
+            return res, None, elapsed
+        if sockets.is_self_connect(s):
+            # A loopback port in the ephemeral range can "answer" a connect
+            # from itself (simultaneous open); nothing is listening there
+            s.close()
+            return errno.ECONNREFUSED, None, elapsed
+        return res, s, elapsed
+    
+    async def _scan_port_async(self, host: str, port: int) -> Dict:
+        """Scan a single port with a non-blocking connect"""
+        result, sock = await self._probe_async(host, port, keep_open=False)
+        return result
+    
+    async def _probe_async(self, host: str, port: int, keep_open: Optional[bool] = None,
+                           rtt: Optional[RttEstimator] = None,
+                           cwnd: Optional[CongestionWindow] = None):
+        """Non-blocking counterpart of _probe"""
+        import asyncio
+        if keep_open is None:
+            keep_open = self.reuse_probe_socket
+        metrics = self.metrics
+        budget = self.budget
+        attempt = 0
+        while True:
+            pause = self.backpressure.wait_time()
+            if pause:
+                await asyncio.sleep(pause)
+            if budget is not None:
+                await budget.acquire_async()
+            if metrics is not None:
+                metrics.gauge_add("inflight", 1)
+            try:
+                res, s, elapsed = await self._connect_async(host, port, self._probe_timeout(rtt, attempt))
+            except BaseException:
+                if budget is not None:
+                    budget.release()  # Cancelled mid-connect
+                raise
+            finally:
+                if metrics is not None:
+                    metrics.gauge_add("inflight", -1)
+            if self._observe(rtt, cwnd, res, elapsed, attempt):
+                if budget is not None:
+                    budget.release()
+                attempt += 1
+                continue
+            if res in RESOURCE_CODES and not self._cancelled.is_set():
+                if budget is not None:
+                    budget.release()
+                self._exhausted(port, res)
+                continue
+            if self.backpressure.stalled_since is not None:
+                self.backpressure.relieved()
+            break
+        
+        if res == 0 and keep_open:
+            return {"port": port, "status": "open"}, s  # s keeps its budget slot until the banner stage
+        if budget is not None:
+            budget.release()
+        if res is None:
+            return {"port": port, "status": "filtered"}, None
+        if s is not None:
+            self._close(s)
+        return {"port": port, "status": self._status_for_code(res)}, None
+    
+    async def _connect_async(self, host: str, port: int, timeout: float):
+        """Non-blocking counterpart of _connect"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        try:
+            s = socket.socket(self._family(host), socket.SOCK_STREAM)
+        except OSError as e:
+            return e.errno, None, time.monotonic() - start  # e.g. EMFILE
+        s.setblocking(False)
+        if not self._track(s):
+            s.close()
+            return None, None, time.monotonic() - start  # Cancelled
+        try:
+            await asyncio.wait_for(loop.sock_connect(s, (host, port)), timeout)
+            res = 0
+        except asyncio.TimeoutError:
+            # Same code connect_ex reports when settimeout() expires
+            res = errno.EAGAIN
+        except OSError as e:
+            res = e.errno
         except Exception:
-            return {"port": port, "status": "filtered"}
+            s.close()
+            return None, None, time.monotonic() - start
+        except BaseException:
+            s.close()  # Cancelled mid-connect
+            raise
+        finally:
+            self._untrack(s)
+        elapsed = time.monotonic() - start
+        if res != 0:
+            s.close()
+            return res, None, elapsed
+        if sockets.is_self_connect(s):
+            # A loopback port in the ephemeral range can "answer" a connect
+            # from itself (simultaneous open); nothing is listening there
+            s.close()
+            return errno.ECONNREFUSED, None, elapsed
+        return res, s, elapsed
+    
+    def _exhausted(self, port: int, res: int) -> None:
+        """
+        A probe hit a resource error: pause every probe (see
+        sockets.Backpressure) and retry it, rather than report the port
+        filtered. Raises ResourceExhaustedError once no probe has got a
+        socket for RESOURCE_WAIT_LIMIT seconds.
+        """
+        if self.backpressure.stalled_for() >= RESOURCE_WAIT_LIMIT:
+            raise ResourceExhaustedError(
+                f"Out of local sockets ({errno.errorcode.get(res, res)}) for "
+                f"{RESOURCE_WAIT_LIMIT:.0f}s while probing port {port}")
+        self.backpressure.exhausted()
+    
+    def _close(self, sock: socket.socket) -> None:
+        """Close a connected socket, with an RST if abortive_close is set"""
+        if self.abortive_close:
+            sockets.abortive_close(sock)
+        else:
+            sock.close()
+    
+    def _socket_concurrency(self, requested: int) -> int:
+        """
+        requested capped at sockets.socket_limit(), the most sockets one
+        scan may hold at once. Both engines count probe connects and open
+        ports' sockets waiting for or in a banner grab against this.
+        """
+        limit = sockets.socket_limit()
+        if requested > limit:
+            print(f"[PortScanner] Limiting concurrency to {limit} (open-file limit / ephemeral ports)")
+            return limit
+        return requested
+    
+    def _track(self, sock: socket.socket) -> bool:
+        """
+        Register a socket for cancel() to tear down; False if the scan was
+        already cancelled or stopped early (max_open)
+        """
+        with self._sockets_lock:
+            self._inflight_sockets.add(sock)
+        return not (self._cancelled.is_set() or self._stopped_early.is_set())
+    
+    def _untrack(self, sock: socket.socket) -> None:
+        with self._sockets_lock:
+            self._inflight_sockets.discard(sock)
     
-    def _grab_banner(self, host: str, port: int) -> Optional[str]:
+    def _abort_sockets(self) -> None:
+        """
+        Shut down every tracked socket. shutdown() (unlike close()) wakes a
+        thread blocked in connect or recv on it, which then cleans up.
+        """
+        with self._sockets_lock:
+            sockets = list(self._inflight_sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    
+    def _new_rtt_estimator(self) -> Optional[RttEstimator]:
+        """Fresh per-host RTT estimator, or None with fixed timing"""
+        if self.timing != "adaptive":
+            return None
+        return RttEstimator(self.timeout, self.min_timeout, self.max_timeout)
+    
+    def _probe_timeout(self, rtt: Optional[RttEstimator], attempt: int) -> float:
+        """Connect timeout for a probe attempt"""
+        if rtt is None:
+            return self.timeout
+        return rtt.backoff(attempt)
+    
+    def _new_metrics(self) -> Optional[ScanMetrics]:
+        """Fresh metrics for a scan (also exposed as self.metrics), or None"""
+        self.metrics = ScanMetrics() if self.collect_metrics else None
+        return self.metrics
+    
+    def _new_congestion_window(self, maximum: int) -> Optional[CongestionWindow]:
+        """Fresh AIMD window for a scan (also exposed as self.congestion), or None"""
+        if self.concurrency != "aimd":
+            return None
+        # Never shrink below the starting window: long runs of filtered
+        # ports look like loss but don't call for crawling
+        self.congestion = CongestionWindow(self.initial_window, minimum=self.initial_window,
+                                           maximum=maximum)
+        return self.congestion
+    
+    def _observe(self, rtt: Optional[RttEstimator], cwnd: Optional[CongestionWindow],
+                 res: Optional[int], elapsed: float, attempt: int) -> bool:
+        """
+        Feed one connect attempt to the metrics, RTT estimator and congestion
+        window, and decide whether to re-probe a timed-out port
+        """
+        if self.metrics is not None:
+            self.metrics.on_connect(res, elapsed, attempt)
+        answered = res == 0 or res == errno.ECONNREFUSED
+        if cwnd is not None:
+            cwnd.on_result(error=not answered, resource_error=res in RESOURCE_CODES)
+        if rtt is None:
+            return False
+        if answered:
+            rtt.sample(elapsed)
+            return False
+        # Only retransmit once the host has answered something; a host that
+        # never answers is down or fully filtered and retries just cost time
+        return (res in TIMEOUT_CODES and rtt.samples > 0 and attempt < self.max_retries
+                and not self._cancelled.is_set())
+    
+    @staticmethod
+    def _status_for_code(res: int) -> str:
+        """
+        Map a connect result code to a port status: an answer is open,
+        a refusal (RST) is closed, and a timeout or unreachable is filtered
+        """
+        if res == 0:
+            return "open"
+        elif res == errno.ECONNREFUSED:
+            return "closed"
+        else:
+            return "filtered"
+    
+    def _grab_banner(self, host: str, port: int, sock: Optional[socket.socket] = None) -> Dict:
+        """
+        Banner pipeline stage: read from the probe's socket if given,
+        otherwise reconnect. Returns the finished open-port result.
+        """
+        budget = self.budget
+        if budget is not None and sock is None:
+            budget.acquire()  # A given sock already holds its slot
+        try:
+            metrics = self.metrics
+            if metrics is None and self.probes is None:
+                return {"port": port, "status": "open", "banner": self._read_banner(host, port, sock)}
+            start = time.perf_counter()
+            if self.probes is not None:
+                banner, service = self._identify(host, port, sock)
+            else:
+                banner, service = self._read_banner(host, port, sock), None
+            if metrics is not None:
+                metrics.observe("banner", time.perf_counter() - start)
+            return self._open_result(port, banner, service)
+        finally:
+            if budget is not None:
+                budget.release()
+    
+    @staticmethod
+    def _open_result(port: int, banner: Optional[str], service: Optional[str]) -> Dict:
+        result = {"port": port, "status": "open", "banner": banner}
+        if service:
+            result["service"] = service
+        return result
+    
+    def _read_banner(self, host: str, port: int, sock: Optional[socket.socket] = None) -> Optional[str]:
         """Try to grab service banner from open port"""
+        s = sock
         try:
-            s = socket.socket()
-            s.settimeout(2)
-            s.connect((host, port))
+            if s is None:
+                s = socket.socket(self._family(host), socket.SOCK_STREAM)
+            if not self._track(s):
+                return None  # Cancelled
+            s.settimeout(self.banner_timeout)
+            if sock is None:
+                s.connect((host, port))
             banner_bytes = s.recv(1024)
-            s.close()
-            
-            # Try UTF-8 first, then Latin-1 as fallback
-            try:
-                banner = banner_bytes.decode('utf-8').strip()
-            except UnicodeDecodeError:
-                try:
-                    banner = banner_bytes.decode('latin-1').strip()
-                except UnicodeDecodeError:
-                    banner = repr(banner_bytes[:50])  # Fall back to repr
-            
-            # Filter out control characters
-            banner = ''.join(c for c in banner if c.isprintable() or c in '\n\r\t')
-            return banner if banner else None
+            return self._decode_banner(banner_bytes)
+        except Exception:
+            return None
+        finally:
+            if s is not None:
+                self._untrack(s)
+                self._close(s)
+    
+    async def _grab_banner_async(self, host: str, port: int,
+                                 sock: Optional[socket.socket] = None) -> Dict:
+        """Non-blocking counterpart of _grab_banner"""
+        budget = self.budget
+        if budget is not None and sock is None:
+            await budget.acquire_async()
+        try:
+            metrics = self.metrics
+            start = time.perf_counter()
+            if self.probes is not None:
+                banner, service = await self._identify_async(host, port, sock)
+            else:
+                banner, service = await self._read_banner_async(host, port, sock), None
+            if metrics is not None:
+                metrics.observe("banner", time.perf_counter() - start)
+            return self._open_result(port, banner, service)
+        finally:
+            if budget is not None:
+                budget.release()
+    
+    async def _read_banner_async(self, host: str, port: int,
+                                 sock: Optional[socket.socket] = None) -> Optional[str]:
+        """Try to grab service banner from open port without blocking the loop"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        s = sock
+        try:
+            if s is None:
+                s = socket.socket(self._family(host), socket.SOCK_STREAM)
+                s.setblocking(False)
+            if not self._track(s):
+                return None  # Cancelled
+            if sock is None:
+                await asyncio.wait_for(loop.sock_connect(s, (host, port)), self.banner_timeout)
+            banner_bytes = await asyncio.wait_for(loop.sock_recv(s, 1024), self.banner_timeout)
+            return self._decode_banner(banner_bytes)
         except Exception:
             return None
+        finally:
+            if s is not None:
+                self._untrack(s)
+                self._close(s)
+    
+    def _identify(self, host: str, port: int,
+                  sock: Optional[socket.socket] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Send the port's probes, most likely first (see probes.ProbeSet),
+        until a reply matches a signature. The probe's own connection
+        serves the first probe; later ones reconnect unless the connection
+        has only been listened on so far.
+        
+        Returns:
+            (banner, service): the matching (else first) reply as text and
+            the identified service; either may be None
+        """
+        banner = None
+        s = sock
+        fresh = sock is not None  # Connected, nothing sent or received yet
+        try:
+            for probe in self.probes.order(port, self.max_probes):
+                if not fresh:
+                    if s is not None:
+                        self._untrack(s)
+                        self._close(s)
+                    s = socket.socket(self._family(host), socket.SOCK_STREAM)
+                if not self._track(s):
+                    break  # Cancelled
+                s.settimeout(self.banner_timeout)
+                if not fresh:
+                    s.connect((host, port))
+                payload = probe.payload_for(host)
+                try:
+                    if payload:
+                        s.sendall(payload)
+                    reply = s.recv(MAX_RESPONSE)
+                except socket.timeout:
+                    reply = None  # Silent; the connection is still usable
+                except OSError:
+                    reply = b""  # Reset: the service rejected this probe
+                fresh = not payload and reply is None
+                if not reply:
+                    continue
+                service = self.probes.match(reply)
+                if service or banner is None:
+                    banner = self._probe_banner(reply, service)
+                if service:
+                    return banner, service
+        except OSError:
+            pass  # Reconnect refused, or torn down by cancel()
+        finally:
+            if s is not None:
+                self._untrack(s)
+                self._close(s)
+        return banner, None
+    
+    async def _identify_async(self, host: str, port: int,
+                              sock: Optional[socket.socket] = None) -> Tuple[Optional[str], Optional[str]]:
+        """Non-blocking counterpart of _identify"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        banner = None
+        s = sock
+        fresh = sock is not None
+        try:
+            for probe in self.probes.order(port, self.max_probes):
+                if not fresh:
+                    if s is not None:
+                        self._untrack(s)
+                        self._close(s)
+                    s = socket.socket(self._family(host), socket.SOCK_STREAM)
+                    s.setblocking(False)
+                if not self._track(s):
+                    break  # Cancelled
+                if not fresh:
+                    await asyncio.wait_for(loop.sock_connect(s, (host, port)), self.banner_timeout)
+                payload = probe.payload_for(host)
+                try:
+                    if payload:
+                        await asyncio.wait_for(loop.sock_sendall(s, payload), self.banner_timeout)
+                    reply = await asyncio.wait_for(loop.sock_recv(s, MAX_RESPONSE), self.banner_timeout)
+                except asyncio.TimeoutError:
+                    reply = None
+                except OSError:
+                    reply = b""
+                fresh = not payload and reply is None
+                if not reply:
+                    continue
+                service = self.probes.match(reply)
+                if service or banner is None:
+                    banner = self._probe_banner(reply, service)
+                if service:
+                    return banner, service
+        except (OSError, asyncio.TimeoutError):
+            pass  # Reconnect refused or timed out, or torn down by cancel()
+        finally:
+            if s is not None:
+                self._untrack(s)
+                self._close(s)
+        return banner, None
+    
+    @classmethod
+    def _probe_banner(cls, reply: bytes, service: Optional[str]) -> Optional[str]:
+        """Banner text for a probe reply; binary replies (e.g. a TLS ServerHello) that matched a signature get none"""
+        head = reply[:1024]
+        sample = head[:256]
+        printable = sum(1 for b in sample if 32 <= b < 127 or b in b"\t\r\n")
+        if service and printable < 0.8 * len(sample):
+            return None
+        return cls._decode_banner(head)
+    
+    @staticmethod
+    def _decode_banner(banner_bytes: bytes) -> Optional[str]:
+        """Decode raw banner bytes into printable text"""
+        # Try UTF-8 first, then Latin-1 as fallback
+        try:
+            banner = banner_bytes.decode('utf-8').strip()
+        except UnicodeDecodeError:
+            try:
+                banner = banner_bytes.decode('latin-1').strip()
+            except UnicodeDecodeError:
+                banner = repr(banner_bytes[:50])  # Fall back to repr
+        
+        # Filter out control characters
+        banner = ''.join(c for c in banner if c.isprintable() or c in '\n\r\t')
+        return banner if banner else None
     
     def get_service_name(self, port: int) -> str:
         """Get common service name for port"""
-        return self.COMMON_SERVICES.get(port, "")
+        return self.COMMON_SERVICES.get(port) or PORT_FREQUENCY.get(port, "")
     
     def _resolve_host(self, host: str) -> Optional[str]:
-        """Resolve hostname to IP address"""
-        try:
-            ip = socket.gethostbyname(host)
-            print(f"[PortScanner] Resolved {host} -> {ip}")
-            return ip
-        except Exception as e:
-            print(f"[PortScanner] Failed to resolve {host}: {e}")
+        """Resolve hostname to IP address (IPv4 preferred, else IPv6)"""
+        addresses = self.resolver.resolve(host)
+        if not addresses:
+            print(f"[PortScanner] Failed to resolve {host}")
             return None
+        print(f"[PortScanner] Resolved {host} -> {addresses[0]}")
+        return addresses[0]
+    
+    @staticmethod
+    def _family(host: str) -> int:
+        """Socket address family for an IP address string"""
+        return socket.AF_INET6 if ":" in host else socket.AF_INET
     
     @staticmethod
     def compress_port_ranges(ports_list: List[Dict]) -> List[str]:
@@ -215,38 +1773,89 @@ class PortScanner:
         return compressed
     
     # PORT PARSER GOES HERE
-    # Parse preset (Web, Database, etc.) or custom range (1-1024, 80,443)
-    # Returns: set of port integers
-    # Example: parse_ports("Web") → {80, 443, 8080}
-    # Example: parse_ports("1-100,443") → {1, 2, ..., 100, 443}
+    # Parse preset (Web, Database, etc.), top-N or custom range (1-1024, 80,443)
+    # Returns: PortSpec, an ascending sequence of port integers stored as ranges
+    # Example: parse_ports("Web") → PortSpec('80,443,8080')
+    # Example: parse_ports("1-100,443") → PortSpec('1-100,443')
+    # Example: parse_ports("top20") → the 20 ports most often found open
 
-    def parse_ports(self, port_input: str) -> List[int]:
+    def parse_ports(self, port_input: str) -> PortSpec:
         port_input = port_input.strip().lower()
-        ports_set = set()
 
         # Check if input matches a preset category
         if port_input in self.PORT_CATEGORIES:
-            ports_set.update(self.PORT_CATEGORIES[port_input].keys())
-        else:
-            parts = port_input.split(',')
-            for part in parts:
-                part = part.strip()
-                if '-' in part:
+            return PortSpec.from_ports(self.PORT_CATEGORIES[port_input])
+        if port_input.startswith("top") and port_input[3:].isdigit():
+            return PortSpec.top(int(port_input[3:]))
+        return PortSpec.parse(port_input)
+
+    # TARGET PARSER
+    # Accepts CIDR blocks, dashed ranges, hostnames, or lists of them
+    # Example: parse_targets("10.0.0.0/30") → ["10.0.0.1", "10.0.0.2"]
+    # Example: parse_targets("10.0.0.5-7, example.com") → ["10.0.0.5", "10.0.0.6", "10.0.0.7", "example.com"]
+
+    def parse_targets(self, targets: Union[str, Iterable[str]]) -> List[str]:
+        if isinstance(targets, str):
+            targets = [targets]
+        
+        hosts = []
+        for entry in targets:
+            for part in entry.replace(',', ' ').split():
+                if '/' in part:
                     try:
-                        start, end = part.split('-')
-                        start, end = int(start.strip()), int(end.strip())
-                        ports_set.update(range(start, end + 1))
+                        network = ipaddress.ip_network(part, strict=False)
                     except ValueError:
-                        pass
+                        continue
+                    # /32 and /31 have no "usable" hosts but should still be scanned
+                    found = list(network.hosts()) or [network.network_address]
+                    hosts.extend(str(ip) for ip in found)
+                elif '-' in part:
+                    hosts.extend(self._expand_ip_range(part))
                 else:
-                    try:
-                        ports_set.add(int(part))
-                    except ValueError:
-                        pass
+                    hosts.append(part)
         
-        return sorted(list(ports_set))
+        # Drop duplicates but keep the caller's order
+        return list(dict.fromkeys(hosts))
+    
+    @staticmethod
+    def _expand_ip_range(part: str) -> List[str]:
+        """Expand "10.0.0.1-10.0.0.9" or "10.0.0.1-9" into addresses"""
+        start, end = part.split('-', 1)
+        try:
+            first = ipaddress.ip_address(start.strip())
+        except ValueError:
+            return [part]  # Hostname containing a dash
+        try:
+            end = end.strip()
+            if end.isdigit() and first.version == 4:
+                last = ipaddress.ip_address(start.rsplit('.', 1)[0] + '.' + end)
+            else:
+                last = ipaddress.ip_address(end)
+        except ValueError:
+            return []
+        return [str(ipaddress.ip_address(i)) for i in range(int(first), int(last) + 1)]
 
 
+# (cancelled, unpaused) events of the scan_many call this worker process serves
+_shard_events = None
+
+
+def _init_shard_worker(cancelled, unpaused):
+    """Process-pool initializer: keep the parent's cancel / pause events"""
+    global _shard_events
+    _shard_events = (cancelled, unpaused)
 
-    
 
+def _scan_shard(settings, ip: str, ports: List[int]):
+    """
+    Process-pool entry point: scan one (host, ports) shard with the async
+    engine. A cancelled shard returns the ports it finished.
+    """
+    scanner = PortScanner(**dict(settings, engine="async"))
+    if _shard_events is not None:
+        scanner._cancelled, scanner._unpaused = _shard_events
+    metrics = scanner._new_metrics()
+    results = ScanResult(ip=ip)
+    for port_result in scanner._iter_ports(ip, ports, "async"):
+        results.add_result(port_result)
+    return ip, len(ports), results, metrics
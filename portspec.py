@@ -0,0 +1,262 @@
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+MIN_PORT = 1
+MAX_PORT = 65535
+
+# TCP ports by how often they are found open on the internet, most common
+# first (nmap's top-100 ordering), then the rest of COMMON_SERVICES and
+# other widely deployed services. Scans in "frequency" order probe these
+# first; get_service_name() also falls back to the names here.
+PORT_FREQUENCY = {
+    80: "HTTP", 23: "Telnet", 443: "HTTPS", 21: "FTP", 22: "SSH", 25: "SMTP",
+    3389: "RDP", 110: "POP3", 445: "SMB", 139: "NetBIOS-SSN", 143: "IMAP",
+    53: "DNS", 135: "MSRPC", 3306: "MySQL", 8080: "HTTP-ALT", 1723: "PPTP",
+    111: "RPCbind", 995: "POP3S", 993: "IMAPS", 5900: "VNC", 1025: "NFS-or-IIS",
+    587: "Submission", 8888: "HTTP-ALT", 199: "SMUX", 1720: "H.323", 465: "SMTPS",
+    548: "AFP", 113: "Ident", 81: "HTTP-ALT", 6001: "X11:1", 10000: "Webmin",
+    514: "RSH", 5060: "SIP", 179: "BGP", 1026: "MSRPC", 2000: "Cisco-SCCP",
+    8443: "HTTPS-ALT", 8000: "HTTP-ALT", 32768: "RPC", 554: "RTSP", 26: "SMTP-ALT",
+    1433: "MSSQL", 49152: "MSRPC", 2001: "DC", 515: "LPD", 8008: "HTTP-ALT",
+    49154: "MSRPC", 1027: "MSRPC", 5666: "NRPE", 646: "LDP", 5000: "UPnP",
+    5631: "pcAnywhere", 631: "IPP", 49153: "MSRPC", 8081: "HTTP-ALT", 2049: "NFS",
+    88: "Kerberos", 79: "Finger", 5800: "VNC-HTTP", 106: "POP3PW", 2121: "FTP-ALT",
+    1110: "NFSD-Status", 49155: "MSRPC", 6000: "X11", 513: "Rlogin", 990: "FTPS",
+    5357: "WSDAPI", 427: "SLP", 49156: "MSRPC", 543: "Klogin", 544: "Kshell",
+    5101: "Admdog", 144: "NeWS", 7: "Echo", 389: "LDAP", 8009: "AJP13",
+    3128: "Squid", 444: "SNPP", 9999: "Abyss", 5009: "AirPort-Admin",
+    7070: "RealServer", 5190: "AOL", 3000: "HTTP-ALT", 5432: "PostgreSQL",
+    1900: "UPnP", 3986: "MAPPER-WS", 13: "Daytime", 1029: "MSRPC", 9: "Discard",
+    5051: "IDA-Agent", 6646: "McAfee", 49157: "MSRPC", 1028: "MSRPC", 873: "Rsync",
+    1755: "WMS", 2717: "PN-Requester", 4899: "Radmin", 9100: "JetDirect",
+    119: "NNTP", 37: "Time",
+    20: "FTP-DATA", 27017: "MongoDB", 6379: "Redis", 636: "LDAPS", 1521: "Oracle",
+    5985: "WinRM", 5986: "WinRM-HTTPS", 9200: "Elasticsearch", 11211: "Memcached",
+    5672: "AMQP", 2375: "Docker", 2376: "Docker-TLS", 6443: "Kubernetes-API",
+    9090: "HTTP-ALT", 1883: "MQTT", 3268: "LDAP-GC",
+    5984: "CouchDB", 9418: "Git", 50000: "SAP",
+}
+
+
+class PortSpec(Sequence):
+    """
+    Ascending set of ports stored as merged (start, end) intervals
+
+    "1-65535" is one tuple rather than 65k ints. It reads like the sorted
+    list parse_ports used to return (len, indexing, slicing and iteration
+    are lazy), supports membership tests and |, & and - with other specs,
+    and prints back in range notation (str(spec) == "1-1024,8080").
+    """
+
+    __slots__ = ("_intervals", "_starts", "_offsets", "_count")
+
+    def __init__(self, intervals: Iterable[Tuple[int, int]] = ()):
+        """
+        Args:
+            intervals: Inclusive (start, end) pairs in any order; they are
+                clipped to 1-65535, merged and sorted
+        """
+        merged: List[List[int]] = []
+        for start, end in sorted((max(start, MIN_PORT), min(end, MAX_PORT)) for start, end in intervals):
+            if start > end:
+                continue
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._intervals = tuple((start, end) for start, end in merged)
+        self._starts = [start for start, _ in self._intervals]
+        # Index of each interval's first port within the whole spec
+        self._offsets, count = [], 0
+        for start, end in self._intervals:
+            self._offsets.append(count)
+            count += end - start + 1
+        self._count = count
+
+    @classmethod
+    def parse(cls, text: str) -> "PortSpec":
+        """
+        "22,80,8000-8100" -> PortSpec; parts that aren't ports or ranges
+        are skipped, as parse_ports always has
+        """
+        intervals = []
+        for part in text.split(","):
+            start, sep, end = part.strip().partition("-")
+            try:
+                start = int(start)
+                intervals.append((start, int(end) if sep else start))
+            except ValueError:
+                continue
+        return cls(intervals)
+
+    @classmethod
+    def from_ports(cls, ports: Iterable[int]) -> "PortSpec":
+        """Build from individual ports (any order, duplicates allowed)"""
+        if isinstance(ports, PortSpec):
+            return ports
+        intervals: List[List[int]] = []
+        for port in sorted(set(ports)):
+            if intervals and intervals[-1][1] == port - 1:
+                intervals[-1][1] = port
+            else:
+                intervals.append([port, port])
+        return cls(intervals)
+
+    @classmethod
+    def top(cls, n: int) -> "PortSpec":
+        """The n ports most often found open (see PORT_FREQUENCY)"""
+        return cls.from_ports(list(PORT_FREQUENCY)[:max(0, n)])
+
+    @property
+    def intervals(self) -> Tuple[Tuple[int, int], ...]:
+        return self._intervals
+
+    def by_frequency(self) -> "FrequencyOrder":
+        """These ports, most-likely-open first (see FrequencyOrder)"""
+        return FrequencyOrder(self)
+
+    # Sequence / set interface
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            first, stop, step = index.indices(self._count)
+            if step != 1:
+                return [self[i] for i in range(first, stop, step)]
+            if first >= stop:
+                return PortSpec()
+            return PortSpec(self._slice_intervals(first, stop))
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("PortSpec index out of range")
+        i = bisect_right(self._offsets, index) - 1
+        return self._intervals[i][0] + index - self._offsets[i]
+
+    def _slice_intervals(self, first: int, stop: int) -> Iterator[Tuple[int, int]]:
+        """Intervals covering positions first..stop-1"""
+        i = bisect_right(self._offsets, first) - 1
+        while i < len(self._intervals) and self._offsets[i] < stop:
+            start, end = self._intervals[i]
+            offset = self._offsets[i]
+            yield (start + max(0, first - offset), min(end, start + stop - 1 - offset))
+            i += 1
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in self._intervals:
+            yield from range(start, end + 1)
+
+    def __reversed__(self) -> Iterator[int]:
+        for start, end in reversed(self._intervals):
+            yield from range(end, start - 1, -1)
+
+    def __contains__(self, port) -> bool:
+        i = bisect_right(self._starts, port) - 1
+        return i >= 0 and port <= self._intervals[i][1]
+
+    def index(self, port, start: int = 0, stop: Optional[int] = None) -> int:
+        if port not in self:
+            raise ValueError(f"{port} is not in PortSpec")
+        i = bisect_right(self._starts, port) - 1
+        position = self._offsets[i] + port - self._intervals[i][0]
+        if position < start or (stop is not None and position >= stop):
+            raise ValueError(f"{port} is not in PortSpec")
+        return position
+
+    def count(self, port) -> int:
+        return int(port in self)
+
+    def __or__(self, other: Iterable[int]) -> "PortSpec":
+        return PortSpec(self._intervals + PortSpec.from_ports(other)._intervals)
+
+    def __and__(self, other: Iterable[int]) -> "PortSpec":
+        other = PortSpec.from_ports(other)._intervals
+        intervals, i, j = [], 0, 0
+        while i < len(self._intervals) and j < len(other):
+            (a_start, a_end), (b_start, b_end) = self._intervals[i], other[j]
+            start, end = max(a_start, b_start), min(a_end, b_end)
+            if start <= end:
+                intervals.append((start, end))
+            if a_end < b_end:
+                i += 1
+            else:
+                j += 1
+        return PortSpec(intervals)
+
+    def __sub__(self, other: Iterable[int]) -> "PortSpec":
+        other = PortSpec.from_ports(other)._intervals
+        intervals, j = [], 0
+        for start, end in self._intervals:
+            while j < len(other) and other[j][1] < start:
+                j += 1
+            k = j
+            while k < len(other) and other[k][0] <= end:
+                if other[k][0] > start:
+                    intervals.append((start, other[k][0] - 1))
+                start = max(start, other[k][1] + 1)
+                k += 1
+            if start <= end:
+                intervals.append((start, end))
+        return PortSpec(intervals)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PortSpec):
+            return self._intervals == other._intervals
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self._intervals)
+
+    def __str__(self) -> str:
+        return ",".join(f"{start}-{end}" if start != end else str(start)
+                        for start, end in self._intervals)
+
+    def __repr__(self) -> str:
+        return f"PortSpec('{self}')"
+
+    # Slots without __dict__: pickle (scan_many shards) by interval list
+
+    def __reduce__(self):
+        return (PortSpec, (self._intervals,))
+
+
+class FrequencyOrder(Sequence):
+    """
+    A PortSpec's ports with the PORT_FREQUENCY ones first, in table order,
+    then the rest ascending
+
+    Only the (at most ~130) table ports are materialised; the remainder
+    stays a PortSpec, so ordering a full 1-65535 scan is cheap. Slices are
+    plain lists, which is what scan_many shards need.
+    """
+
+    __slots__ = ("_first", "_rest")
+
+    def __init__(self, spec: PortSpec):
+        self._first = [port for port in PORT_FREQUENCY if port in spec]
+        self._rest = spec - self._first
+
+    def __len__(self) -> int:
+        return len(self._first) + len(self._rest)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < len(self._first):
+            return self._first[index]
+        return self._rest[index - len(self._first)]
+
+    def __iter__(self) -> Iterator[int]:
+        return chain(self._first, self._rest)
+
+    def __contains__(self, port) -> bool:
+        return port in self._rest or port in self._first
+
+    def __repr__(self) -> str:
+        return f"FrequencyOrder(first={len(self._first)}, rest={self._rest!r})"
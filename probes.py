@@ -0,0 +1,215 @@
+import re
+import struct
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+# Keep the first bytes of each response; every signature matches on those
+MAX_RESPONSE = 4096
+
+
+def _vector(data: bytes, length_bytes: int) -> bytes:
+    """TLS variable-length vector: big-endian length prefix, then data"""
+    return len(data).to_bytes(length_bytes, "big") + data
+
+
+def _client_hello() -> bytes:
+    """
+    A TLS 1.2 ClientHello record offering common AEAD and CBC suites
+
+    Any TLS server answers it with a ServerHello or an alert, which is all
+    the TLS signatures need; the handshake is never completed.
+    """
+    ciphers = (0x1301, 0x1302, 0x1303, 0xC02B, 0xC02F, 0xC02C, 0xC030, 0xCCA9,
+               0xCCA8, 0xC013, 0xC014, 0x009C, 0x009D, 0x002F, 0x0035)
+    sig_algs = (0x0403, 0x0804, 0x0401, 0x0503, 0x0805, 0x0501, 0x0806, 0x0601, 0x0201)
+    extensions = b"".join(struct.pack(">H", ext) + _vector(data, 2) for ext, data in (
+        (0x000A, _vector(struct.pack(">3H", 0x001D, 0x0017, 0x0018), 2)),  # supported_groups
+        (0x000B, _vector(b"\x00", 1)),  # ec_point_formats: uncompressed
+        (0x000D, _vector(struct.pack(f">{len(sig_algs)}H", *sig_algs), 2)),  # signature_algorithms
+        (0xFF01, b"\x00"),  # renegotiation_info
+    ))
+    hello = (b"\x03\x03" + bytes(range(32))  # client_version, random
+             + _vector(b"", 1)  # session_id
+             + _vector(struct.pack(f">{len(ciphers)}H", *ciphers), 2)
+             + _vector(b"\x00", 1)  # compression: null
+             + _vector(extensions, 2))
+    handshake = b"\x01" + _vector(hello, 3)
+    return b"\x16\x03\x01" + _vector(handshake, 2)
+
+
+class Probe:
+    """
+    One request sent to an open port; an empty payload just listens for
+    the greeting that FTP, SSH, SMTP and the like send on connect
+    """
+
+    __slots__ = ("name", "payload", "ports", "rarity")
+
+    def __init__(self, name: str, payload: bytes, ports: Iterable[int] = (), rarity: int = 5):
+        """
+        Args:
+            name: Probe name, for logs
+            payload: Bytes to send; b"{host}" is replaced by the target
+            ports: Ports this probe is tried first on
+            rarity: 1 (tried early on any port) to 9 (only when listed)
+        """
+        self.name = name
+        self.payload = payload
+        self.ports = frozenset(ports)
+        self.rarity = rarity
+
+    def payload_for(self, host: str) -> bytes:
+        if b"{host}" not in self.payload:
+            return self.payload
+        host = f"[{host}]" if ":" in host else host
+        return self.payload.replace(b"{host}", host.encode("idna"))
+
+    def __repr__(self) -> str:
+        return f"Probe({self.name!r})"
+
+
+# Probes in database order; ProbeSet.order() puts those listing a port first
+PROBES = (
+    Probe("NULL", b"", rarity=1, ports=(
+        21, 22, 23, 25, 110, 143, 587, 2121, 3306, 5900, 5901, 6001, 1883, 5672)),
+    Probe("GetRequest", b"GET / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: RadarPortScanner\r\n"
+                        b"Accept: */*\r\n\r\n", rarity=1, ports=(
+        80, 81, 591, 631, 2375, 3000, 3128, 5000, 5357, 5800, 5984, 7070, 8000, 8008,
+        8080, 8081, 8088, 8888, 9090, 9200, 9999, 10000)),
+    Probe("TLSClientHello", _client_hello(), rarity=2, ports=(
+        443, 465, 563, 636, 853, 990, 992, 993, 994, 995, 2376, 5061, 5986, 6443,
+        8443, 9443)),
+    Probe("RedisPing", b"*1\r\n$4\r\nPING\r\n", rarity=6, ports=(6379,)),
+    Probe("MemcachedVersion", b"version\r\n", rarity=7, ports=(11211,)),
+    Probe("RTSPRequest", b"OPTIONS / RTSP/1.0\r\nCSeq: 1\r\n\r\n", rarity=7, ports=(554, 8554)),
+    Probe("GenericLines", b"\r\n\r\n", rarity=8),
+)
+
+# (service, pattern, product) in priority order: the first signature that
+# matches the start of a response wins, so specific ones come before
+# catch-alls. product may use $1, $2 ... for the pattern's groups.
+SIGNATURES = (
+    ("SSH", rb"SSH-([\d.]+)-([^\r\n]+)", "$2"),
+    ("HTTP", rb"HTTP/1\.[01] \d\d\d(?:[^\r\n]*\r?\n)*?(?i:server):[ \t]*([^\r\n]+)", "$1"),
+    ("HTTP", rb"HTTP/1\.[01] \d\d\d", ""),
+    ("RTSP", rb"RTSP/1\.0 \d\d\d(?:[^\r\n]*\r?\n)*?(?i:server):[ \t]*([^\r\n]+)", "$1"),
+    ("RTSP", rb"RTSP/1\.0 \d\d\d", ""),
+    ("TLS", rb"\x16\x03[\x00-\x04]..\x02...\x03\x03", "TLSv1.2"),
+    ("TLS", rb"\x16\x03[\x00-\x04]..\x02...\x03\x02", "TLSv1.1"),
+    ("TLS", rb"\x16\x03[\x00-\x04]..\x02...\x03\x01", "TLSv1.0"),
+    ("TLS", rb"\x15\x03[\x00-\x04]\x00\x02[\x01\x02]", "alert"),
+    ("SMTP", rb"220[ -][^\r\n]*?((?:E?SMTP|Postfix|Exim|Sendmail|Microsoft ESMTP)[^\r\n]*)", "$1"),
+    ("FTP", rb"220[ -][^\r\n]*?((?:FTP|FileZilla|vsFTPd|ProFTPD|Pure-FTPd)[^\r\n()]*)", "$1"),
+    ("FTP", rb"220[ -]", ""),
+    ("POP3", rb"\+OK[ \t]*([^\r\n]*)", "$1"),
+    ("IMAP", rb"\* (?:OK|PREAUTH)[ \t]*([^\r\n]*)", "$1"),
+    ("MySQL", rb"...\x00\x0a([0-9][^\x00]{0,60})\x00", "$1"),
+    ("MySQL", rb"...\x00\xff[\x00-\xff]{2}(?:#[0-9A-Z]{5})?[^\x00]*(?i:mysql|mariadb)", ""),
+    ("VNC", rb"RFB (\d\d\d\.\d\d\d)\n", "RFB $1"),
+    ("Redis", rb"\+PONG\r\n", ""),
+    ("Redis", rb"-(?:NOAUTH|DENIED|ERR (?:unknown command|wrong number))", ""),
+    ("Memcached", rb"VERSION ([^\r\n]+)", "$1"),
+    ("AMQP", rb"AMQP\x00([\x00-\x09])([\x00-\x09])([\x00-\x09])", "$1-$2-$3"),
+    ("MQTT", rb"\x20\x02\x00[\x00-\x05]", ""),
+    ("Telnet", rb"\xff[\xfb-\xfe][\x00-\xff]", ""),
+    ("SIP", rb"SIP/2\.0 \d\d\d", ""),
+)
+
+
+class SignatureMatcher:
+    """
+    Signature database compiled into one regex
+
+    Each signature becomes an alternative wrapped in its own group, so a
+    response is identified by a single match() however many signatures
+    there are; m.lastindex (the outermost group that matched) says which
+    alternative won, and that signature's own groups sit right after it.
+    Alternatives are tried in database order, so the first listed
+    signature that matches wins.
+    """
+
+    def __init__(self, signatures: Sequence[Tuple[str, bytes, str]] = SIGNATURES):
+        """
+        Args:
+            signatures: (service, pattern, product) triples; patterns are
+                bytes, matched from the start of the response with
+                re.DOTALL, and may not use backreferences or named groups
+        """
+        parts = []
+        # Outer group -> (service, product template split into literal text
+        # and absolute group numbers)
+        self._by_group: Dict[int, Tuple[str, Tuple]] = {}
+        group = 1
+        for service, pattern, product in signatures:
+            inner = re.compile(pattern, re.DOTALL).groups  # Raises re.error on a bad pattern
+            parts.append(b"(" + pattern + b")")
+            template = tuple(int(piece) + group if i % 2 else piece
+                             for i, piece in enumerate(re.split(r"\$(\d)", product)))
+            self._by_group[group] = (service, template)
+            group += 1 + inner
+        self._regex = re.compile(b"|".join(parts), re.DOTALL)
+
+    def match(self, response: bytes) -> Optional[str]:
+        """
+        Identify a response
+
+        Returns:
+            "SERVICE" or "SERVICE (product)", e.g. "SSH (OpenSSH_9.6)", or
+            None if no signature matches
+        """
+        m = self._regex.match(response, 0, MAX_RESPONSE)
+        if m is None:
+            return None
+        service, template = self._by_group[m.lastindex]
+        if len(template) == 1 and not template[0]:
+            return service
+        product = "".join(_printable(m.group(piece)) if i % 2 else piece
+                          for i, piece in enumerate(template)).strip()
+        return f"{service} ({product})" if product else service
+
+
+def _printable(value: Optional[bytes]) -> str:
+    if value is None:
+        return ""
+    if len(value) == 1 and value[0] < 10:
+        return str(value[0])  # A version byte, e.g. AMQP's 0-9-1
+    text = value.decode("latin-1")
+    if not text.isprintable():
+        text = "".join(c for c in text if c.isprintable())
+    return text.strip()
+
+
+class ProbeSet:
+    """
+    Probes plus the signature matcher, with a precomputed probe order per
+    port: probes that list the port first, in database order, then the
+    rest from least to most rare
+    """
+
+    def __init__(self, probes: Sequence[Probe] = PROBES,
+                 signatures: Sequence[Tuple[str, bytes, str]] = SIGNATURES):
+        self.probes = tuple(probes)
+        self.matcher = SignatureMatcher(signatures)
+        self._default = tuple(sorted(self.probes, key=lambda probe: probe.rarity))
+        self._by_port: Dict[int, Tuple[Probe, ...]] = {}
+        for port in sorted(set().union(*(probe.ports for probe in self.probes))):
+            listed = [probe for probe in self.probes if port in probe.ports]
+            self._by_port[port] = tuple(listed + [p for p in self._default if p not in listed])
+
+    def order(self, port: int, limit: Optional[int] = None) -> Tuple[Probe, ...]:
+        """Probes to try on port, most likely to get a matching answer first"""
+        probes = self._by_port.get(port, self._default)
+        return probes if limit is None else probes[:limit]
+
+    def match(self, response: bytes) -> Optional[str]:
+        return self.matcher.match(response)
+
+
+_default_probe_set: Optional[ProbeSet] = None
+
+
+def default_probe_set() -> ProbeSet:
+    """The built-in probes and signatures, compiled once per process"""
+    global _default_probe_set
+    if _default_probe_set is None:
+        _default_probe_set = ProbeSet()
+    return _default_probe_set
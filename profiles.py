@@ -1,61 +1,154 @@
 import sqlite3
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Optional
 from pathlib import Path
 
+from portspec import PortSpec
+
 # Get the directory where this script is located
 APP_DIR = Path(__file__).resolve().parent
 
+# Port_Selection holds the ports as ranges ("1-1024,3306"), like history's hosts table
 Scan_Profiles = "CREATE TABLE IF NOT EXISTS profiles ( Scan_Profile_ID INTEGER PRIMARY KEY AUTOINCREMENT, Profile_Name TEXT UNIQUE, TargetIP TEXT, Port_Selection TEXT, Timeout REAL, Threads INTEGER, Created_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP )"
 
+# PRAGMA user_version of data.db: 0 = every port comma-joined, 1 = range specs
+PROFILES_SCHEMA_VERSION = 1
+
+
 class Profile_Manager:
-    def __init__(self, db_path: str = None):
+    """
+    Saved scan profiles in data.db
+
+    Each thread gets its own sqlite connection, so one manager can be
+    shared by the GUI, the scheduler and worker threads. Decoded profiles
+    are kept in a small LRU cache; save_profile and delete_profile
+    invalidate it, and so does any commit to the database from another
+    connection or process.
+    """
+
+    def __init__(self, db_path: str = None, cache_size: int = 128):
         if db_path is None:
             db_path = str(APP_DIR / "data.db")
         self.db_path = db_path
-        self.conn = None
-        self.cursor = None
+        self.cache_size = cache_size
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()  # Guards _connections and _cache
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
         self._connect()
-    
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._local, "conn", None)
+        return conn if conn is not None else self._connect()
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        if getattr(self._local, "conn", None) is None:
+            self._connect()
+        return self._local.cursor
+
     def _connect(self):
-        """Establish database connection"""
+        """Establish this thread's database connection"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.cursor = self.conn.cursor()
-            self.cursor.execute(Scan_Profiles)
-            self.conn.commit()
+            # Only this thread uses it, but close() may run on another
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # WAL lets threads read profiles while another one saves
+            conn.execute("PRAGMA journal_mode=WAL")
+            cursor = conn.cursor()
+            cursor.execute(Scan_Profiles)
+            conn.commit()
+            self._migrate(conn)
+            self._local.conn, self._local.cursor = conn, cursor
+            self._local.data_version = None
+            with self._lock:
+                self._connections.append(conn)
+            return conn
         except Exception as e:
             print(f"Database connection error: {e}")
             raise
 
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Rewrite comma-joined port lists from older data.db files as range specs"""
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= PROFILES_SCHEMA_VERSION:
+            return
+        with conn:
+            rows = conn.execute("SELECT Scan_Profile_ID, Port_Selection FROM profiles").fetchall()
+            for profile_id, ports in rows:
+                conn.execute("UPDATE profiles SET Port_Selection = ? WHERE Scan_Profile_ID = ?",
+                             (str(PortSpec.parse(ports or "")), profile_id))
+            conn.execute(f"PRAGMA user_version = {PROFILES_SCHEMA_VERSION}")
+        if rows:
+            print(f"[Profiles] Migrated {len(rows)} profiles to range storage")
+
+    def _check_cache(self) -> None:
+        """Drop cached profiles if another connection has committed since we last looked"""
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._local.data_version:
+            if self._local.data_version is not None:
+                self._invalidate()
+            self._local.data_version = version
+
+    def _invalidate(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(name, None)
+
     def save_profile(self, name, target, ports, timeout, threads):
         """Save a scan profile"""
         try:
-            ports_list = ",".join(map(str, ports))
-            self.cursor.execute(
-                "INSERT INTO profiles (Profile_Name, TargetIP, Port_Selection, Timeout, Threads) VALUES (?, ?, ?, ?, ?)",
-                (name, target, ports_list, timeout, threads)
-            )
-            self.conn.commit()
+            port_spec = str(PortSpec.from_ports(ports))
+            # Rolls back on failure so a duplicate name doesn't leave the write lock held
+            with self.conn:
+                self.cursor.execute(
+                    "INSERT INTO profiles (Profile_Name, TargetIP, Port_Selection, Timeout, Threads) VALUES (?, ?, ?, ?, ?)",
+                    (name, target, port_spec, timeout, threads)
+                )
         except sqlite3.IntegrityError:
             raise ValueError(f"Profile '{name}' already exists")
         except Exception as e:
             raise Exception(f"Error saving profile: {e}")
+        finally:
+            self._invalidate(name)
 
     def load_profile(self, name):
-        """Load a saved profile by name"""
+        """
+        Load a saved profile by name
+
+        Returns:
+            Profile dict (Port_Selection is a PortSpec), or None if there
+            is no such profile
+        """
         try:
+            self._check_cache()
+            with self._lock:
+                profile = self._cache.get(name)
+                if profile is not None:
+                    self._cache.move_to_end(name)
+                    return dict(profile)
+
             self.cursor.execute("SELECT * FROM profiles WHERE Profile_Name = ?", (name,))
-            fetchone = self.cursor.fetchone()
+            # fetchall() finishes the statement so this thread holds no read lock
+            fetchone = next(iter(self.cursor.fetchall()), None)
             if fetchone:
                 profile = {
                     "Profile_Name": fetchone[1],
                     "TargetIP": fetchone[2],
-                    "Port_Selection": list(map(int, fetchone[3].split(","))),
+                    "Port_Selection": PortSpec.parse(fetchone[3] or ""),
                     "Timeout": fetchone[4],
                     "Threads": fetchone[5],
                     "Created_At": fetchone[6]
                 }
-                return profile
+                with self._lock:
+                    self._cache[name] = profile
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                return dict(profile)
             return None
         except Exception as e:
             print(f"Error loading profile: {e}")
@@ -70,19 +163,25 @@ class Profile_Manager:
     def delete_profile(self, name):
         """Delete a saved profile"""
         try:
-            self.cursor.execute("DELETE FROM profiles WHERE Profile_Name = ?", (name,))
-            self.conn.commit()
+            with self.conn:
+                self.cursor.execute("DELETE FROM profiles WHERE Profile_Name = ?", (name,))
         except Exception as e:
             print(f"Error deleting profile: {e}")
-    
+        finally:
+            self._invalidate(name)
+
     def close(self):
-        """Close database connection"""
-        try:
-            if self.conn:
-                self.conn.close()
-        except Exception as e:
-            print(f"Error closing database: {e}")
-    
+        """Close every thread's database connection"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._cache.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                print(f"Error closing database: {e}")
+        self._local = threading.local()
+
     def __del__(self):
         """Cleanup on deletion"""
         self.close()
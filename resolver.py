@@ -0,0 +1,117 @@
+import ipaddress
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class Resolver:
+    """
+    Hostname resolver with a TTL cache and IPv4 + IPv6 answers
+
+    Lookups go through getaddrinfo, so /etc/hosts and the system resolver
+    are honoured, and batches run concurrently on a small thread pool (or
+    the event loop's executor for resolve_async). getaddrinfo doesn't expose
+    record TTLs, so answers are kept for a fixed ttl and failures for
+    negative_ttl. Addresses come back IPv4 first, then IPv6.
+    """
+
+    def __init__(self, ttl: float = 300, negative_ttl: float = 30,
+                 max_entries: int = 10000, workers: int = 32):
+        """
+        Args:
+            ttl: Seconds a successful answer is cached
+            negative_ttl: Seconds a failed lookup is cached
+            max_entries: Max cached names (least recently used evicted)
+            workers: Max concurrent getaddrinfo calls for batches
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.workers = workers
+        self._cache: "OrderedDict[str, Tuple[List[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def resolve(self, host: str) -> List[str]:
+        """All addresses of host (empty if it does not resolve)"""
+        cached = self._cached(host)
+        if cached is not None:
+            return cached
+        return self._store(host, self._lookup(host))
+
+    async def resolve_async(self, host: str) -> List[str]:
+        """resolve() without blocking the event loop"""
+        cached = self._cached(host)
+        if cached is not None:
+            return cached
+        import asyncio  # Only needed by the async engine; keeps sync imports light
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            infos = []
+        return self._store(host, self._addresses(infos))
+
+    def submit(self, host: str) -> "Future[List[str]]":
+        """Start resolving host in the background; cached names complete immediately"""
+        cached = self._cached(host)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="resolver")
+        return self._executor.submit(self.resolve, host)
+
+    def resolve_many(self, hosts: Iterable[str]) -> Dict[str, List[str]]:
+        """Resolve a batch of names concurrently"""
+        futures = {host: self.submit(host) for host in dict.fromkeys(hosts)}
+        return {host: future.result() for host, future in futures.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _cached(self, host: str) -> Optional[List[str]]:
+        # IP literals never need a lookup
+        try:
+            return [str(ipaddress.ip_address(host))]
+        except ValueError:
+            pass
+        with self._lock:
+            entry = self._cache.get(host)
+            if entry is None:
+                return None
+            addresses, expires = entry
+            if time.monotonic() > expires:
+                del self._cache[host]
+                return None
+            self._cache.move_to_end(host)
+            return addresses
+
+    def _store(self, host: str, addresses: List[str]) -> List[str]:
+        ttl = self.ttl if addresses else self.negative_ttl
+        with self._lock:
+            self._cache[host] = (addresses, time.monotonic() + ttl)
+            self._cache.move_to_end(host)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return addresses
+
+    def _lookup(self, host: str) -> List[str]:
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            infos = []
+        return self._addresses(infos)
+
+    @staticmethod
+    def _addresses(infos) -> List[str]:
+        """getaddrinfo results -> unique addresses, IPv4 first"""
+        v4 = [info[4][0] for info in infos if info[0] == socket.AF_INET]
+        v6 = [info[4][0] for info in infos if info[0] == socket.AF_INET6]
+        return list(dict.fromkeys(v4 + v6))
@@ -0,0 +1,197 @@
+import re
+import zlib
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from portspec import PortSpec
+
+# One status byte per port; 0 means the port was not scanned
+STATUS_CODES = {"open": 1, "closed": 2, "filtered": 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# Matches a run of identical status bytes, e.g. ports 1-1024 all closed
+_RUNS = {code: re.compile(re.escape(bytes([code])) + b"+") for code in STATUS_NAMES}
+_SCANNED_RUNS = re.compile(b"[^\\x00]+")
+
+# Keys of the JSON-shaped dict scan() has always returned
+RESULT_KEYS = ("target", "ip", "timestamp_utc", "duration_s",
+               "open_ports", "closed_ports", "filtered_ports", "summary")
+
+
+class ScanResult(Mapping):
+    """
+    Compact per-host scan result
+
+    Port statuses live in a 65536-byte array indexed by port number and
+    banners (and services identified by probes) in sparse dicts, so a full-range scan costs 64 KB instead of
+    65k small dicts. Counts, per-status iteration and range compression
+    run directly on the array.
+
+    It still reads like the dict scan() used to return (results["summary"],
+    results.get("open_ports"), ...); those lists are built on access. Use
+    to_dict() when a real dict is needed, e.g. for json.dumps().
+    """
+
+    __slots__ = ("target", "ip", "timestamp_utc", "duration_s", "_status", "_banners", "_services")
+
+    def __init__(self, target: str = "", ip: str = "", timestamp_utc: str = "",
+                 duration_s: float = 0.0):
+        self.target = target
+        self.ip = ip
+        self.timestamp_utc = timestamp_utc
+        self.duration_s = duration_s
+        self._status = bytearray(65536)
+        self._banners: Dict[int, Optional[str]] = {}
+        self._services: Dict[int, str] = {}
+
+    def add(self, port: int, status: str, banner: Optional[str] = None,
+            service: Optional[str] = None) -> None:
+        """Record the status (and banner and identified service, for open ports) of one port"""
+        self._status[port] = STATUS_CODES[status]
+        if status == "open":
+            self._banners[port] = banner
+            if service:
+                self._services[port] = service
+            else:
+                self._services.pop(port, None)
+        else:
+            self._banners.pop(port, None)
+            self._services.pop(port, None)
+
+    def add_range(self, start: int, end: int, status: str) -> None:
+        """Record one status for every port from start to end inclusive (no banners)"""
+        self._status[start:end + 1] = bytes([STATUS_CODES[status]]) * (end - start + 1)
+        if status != "open":
+            for port in [p for p in self._banners if start <= p <= end]:
+                del self._banners[port]
+                self._services.pop(port, None)
+
+    def add_result(self, result: Dict) -> None:
+        """Record a port result dict as yielded by PortScanner.scan_iter"""
+        self.add(result["port"], result["status"], result.get("banner"), result.get("service"))
+
+    def update(self, other: "ScanResult") -> None:
+        """Merge every scanned port of another result into this one"""
+        for pattern in _RUNS.values():
+            for run in pattern.finditer(other._status):
+                self._status[run.start():run.end()] = other._status[run.start():run.end()]
+        self._banners.update(other._banners)
+        for port in other._banners:
+            if port in other._services:
+                self._services[port] = other._services[port]
+            else:
+                self._services.pop(port, None)
+
+    def status_of(self, port: int) -> Optional[str]:
+        """Status of a port, or None if it was not scanned"""
+        return STATUS_NAMES.get(self._status[port])
+
+    def banner_of(self, port: int) -> Optional[str]:
+        """Banner grabbed from an open port, if any"""
+        return self._banners.get(port)
+
+    def service_of(self, port: int) -> Optional[str]:
+        """Service a probe identified on an open port, e.g. "SSH (OpenSSH_9.6)", if any"""
+        return self._services.get(port)
+
+    def count(self, status: str) -> int:
+        """Number of ports with the given status"""
+        return self._status.count(STATUS_CODES[status])
+
+    def ports(self, status: str) -> Iterator[int]:
+        """Iterate ports with the given status in ascending order"""
+        for run in _RUNS[STATUS_CODES[status]].finditer(self._status):
+            yield from range(run.start(), run.end())
+
+    def compress_port_ranges(self, status: Optional[str] = "open") -> List[str]:
+        """
+        Consecutive ports with the given status as "start-end" ranges;
+        status=None covers every scanned port
+        """
+        pattern = _SCANNED_RUNS if status is None else _RUNS[STATUS_CODES[status]]
+        compressed = []
+        for run in pattern.finditer(self._status):
+            start, end = run.start(), run.end() - 1
+            compressed.append(f"{start}-{end}" if start != end else str(start))
+        return compressed
+
+    @property
+    def summary(self) -> Dict[str, int]:
+        return {
+            "total_open": self.count("open"),
+            "total_closed": self.count("closed"),
+            "total_filtered": self.count("filtered")
+        }
+
+    def port_dicts(self, status: str) -> List[Dict]:
+        """Materialise the per-port dicts for one status, sorted by port"""
+        if status == "open":
+            dicts = []
+            for p in self.ports(status):
+                entry = {"port": p, "status": status, "banner": self._banners.get(p)}
+                service = self._services.get(p)
+                if service:  # Only when identified, as in scan results
+                    entry["service"] = service
+                dicts.append(entry)
+            return dicts
+        return [{"port": p, "status": status} for p in self.ports(status)]
+
+    def to_dict(self) -> Dict:
+        """Build the full JSON-shaped results dict"""
+        return {key: self[key] for key in RESULT_KEYS}
+
+    # Mapping interface, so existing dict-style callers keep working
+
+    def __getitem__(self, key: str):
+        if key in ("open_ports", "closed_ports", "filtered_ports"):
+            return self.port_dicts(key[:-len("_ports")])
+        if key == "summary":
+            return self.summary
+        if key in RESULT_KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(RESULT_KEYS)
+
+    def __len__(self) -> int:
+        return len(RESULT_KEYS)
+
+    def __repr__(self) -> str:
+        summary = self.summary
+        return (f"ScanResult(target={self.target!r}, ip={self.ip!r}, open={summary['total_open']}, "
+                f"closed={summary['total_closed']}, filtered={summary['total_filtered']})")
+
+    # The status array is mostly zeros, so it pickles (e.g. back from a
+    # scan_many worker process) as a few hundred compressed bytes
+
+    def __getstate__(self):
+        return (self.target, self.ip, self.timestamp_utc, self.duration_s,
+                zlib.compress(self._status, 1), self._banners, self._services)
+
+    def __setstate__(self, state):
+        (self.target, self.ip, self.timestamp_utc, self.duration_s,
+         status, self._banners, self._services) = state
+        self._status = bytearray(zlib.decompress(status))
+
+
+def format_port_ranges(ports: Iterable[int]) -> str:
+    """[1, 2, 3, 80] -> "1-3,80" (duplicates and order don't matter)"""
+    if isinstance(ports, PortSpec):
+        return str(ports)  # Already merged ranges
+    ranges = []
+    for port in sorted(set(ports)):
+        if ranges and ranges[-1][1] == port - 1:
+            ranges[-1][1] = port
+        else:
+            ranges.append([port, port])
+    return ",".join(f"{start}-{end}" if start != end else str(start) for start, end in ranges)
+
+
+def parse_port_ranges(spec: str) -> List[Tuple[int, int]]:
+    """"1-3,80" -> [(1, 3), (80, 80)]"""
+    ranges = []
+    for part in filter(None, spec.split(",")):
+        start, _, end = part.partition("-")
+        ranges.append((int(start), int(end or start)))
+    return ranges
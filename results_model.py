@@ -0,0 +1,240 @@
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, Iterable, List, Optional
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QColor
+
+from results import STATUS_CODES, STATUS_NAMES, ScanResult
+
+# Port cell highlight per status code, as the old table used
+STATUS_COLORS = {
+    STATUS_CODES["open"]: QColor(76, 175, 80),  # Green
+    STATUS_CODES["closed"]: QColor(158, 158, 158),  # Gray
+    STATUS_CODES["filtered"]: QColor(255, 193, 7)  # Yellow
+}
+
+
+class ScanResultsModel(QAbstractTableModel):
+    """
+    Table model over scan results for a QTableView
+
+    Each row is stored as a few bytes in parallel arrays (host index, port,
+    status code) plus a sparse banner dict; cell text is only built when the
+    view asks for a visible cell, so a 65k-port scan costs kilobytes instead
+    of 260k QTableWidgetItems. Rows are appended in batches while a scan
+    runs. Status filtering and sorting rebuild an index of visible rows
+    rather than touching the rows themselves.
+    """
+
+    COLUMNS = ("Port", "Status", "Service", "Banner")
+
+    # Longer banners are cut in the cell; the tooltip shows all of it
+    BANNER_WIDTH = 50
+
+    def __init__(self, service_name: Callable[[int], str], parent=None):
+        """
+        Args:
+            service_name: Maps a port to its service name (PortScanner.get_service_name)
+        """
+        super().__init__(parent)
+        self.service_name = service_name
+        self.columns = self.COLUMNS
+        self._status_filter: Optional[int] = None
+        self._sort_key: Optional[str] = None  # Column name, so it survives the Host column toggling
+        self._sort_order = Qt.AscendingOrder
+        self._reset_rows()
+
+    def _reset_rows(self):
+        self._hosts: List[str] = []
+        self._host_ids: Dict[str, int] = {}
+        self._row_host = array("I")
+        self._row_port = array("H")
+        self._row_status = array("B")
+        self._banners: Dict[int, str] = {}  # row id -> banner, open ports only
+        self._services: Dict[int, str] = {}  # row id -> service identified by probes
+        self._visible = array("I")  # Visible row ids, ascending by the sort key
+
+    # Loading rows
+
+    def clear(self, show_host: bool = False) -> None:
+        """Drop every row; show_host adds a Host column for multi-host scans"""
+        self.beginResetModel()
+        self.columns = (("Host",) if show_host else ()) + self.COLUMNS
+        self._reset_rows()
+        self.endResetModel()
+
+    def append_results(self, host: str, results: Iterable[Dict]) -> None:
+        """Append a batch of port result dicts (as yielded by scan_iter) for one host"""
+        host_id = self._host_id(host)
+        first = len(self._row_port)
+        for result in results:
+            row_id = len(self._row_port)
+            self._row_host.append(host_id)
+            self._row_port.append(result["port"])
+            self._row_status.append(STATUS_CODES[result["status"]])
+            if result.get("banner"):
+                self._banners[row_id] = result["banner"]
+            if result.get("service"):
+                self._services[row_id] = result["service"]
+        self._show_new_rows(first)
+
+    def append_host(self, result: ScanResult) -> None:
+        """Append every scanned port of a finished host"""
+        host_id = self._host_id(result.ip)
+        first = len(self._row_port)
+        for status, code in STATUS_CODES.items():
+            ports = array("H", result.ports(status))
+            self._row_port.extend(ports)
+            self._row_status.extend(bytes([code]) * len(ports))
+            if status == "open":
+                for offset, port in enumerate(ports):
+                    row_id = len(self._row_port) - len(ports) + offset
+                    banner = result.banner_of(port)
+                    if banner:
+                        self._banners[row_id] = banner
+                    service = result.service_of(port)
+                    if service:
+                        self._services[row_id] = service
+        self._row_host.extend([host_id] * (len(self._row_port) - first))
+        self._show_new_rows(first)
+
+    def _service(self, row_id: int) -> str:
+        """Service a probe identified, else the usual one for the port"""
+        return self._services.get(row_id) or self.service_name(self._row_port[row_id])
+
+    def _host_id(self, host: str) -> int:
+        if host not in self._host_ids:
+            self._host_ids[host] = len(self._hosts)
+            self._hosts.append(host)
+        return self._host_ids[host]
+
+    def _show_new_rows(self, first: int) -> None:
+        """Make rows first.. visible, honouring the current filter and sort"""
+        new_rows = [row_id for row_id in range(first, len(self._row_port))
+                    if self._status_filter is None or self._row_status[row_id] == self._status_filter]
+        if not new_rows:
+            return
+        count = len(self._visible)
+        if self._sort_key is not None and len(new_rows) * 16 < count:
+            # A frame's worth of rows into a big sorted table: place each one
+            key = self._key_function()
+            for row_id in new_rows:
+                position = bisect_right(self._visible, key(row_id), key=key)
+                row = position if self._ascending() else len(self._visible) - position
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._visible.insert(position, row_id)
+                self.endInsertRows()
+            return
+        self.beginInsertRows(QModelIndex(), count, count + len(new_rows) - 1)
+        self._visible.extend(new_rows)
+        self.endInsertRows()
+        if self._sort_key is not None:
+            self._relayout(self._sorted(self._visible))
+
+    # Filtering and sorting
+
+    def set_status_filter(self, status: Optional[str]) -> None:
+        """Only show ports with this status (None shows all)"""
+        self.beginResetModel()
+        self._status_filter = None if status is None else STATUS_CODES[status]
+        self._visible = self._sorted(self._filtered())
+        self.endResetModel()
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder) -> None:
+        """Called by the view when a header is clicked; column -1 restores arrival order"""
+        self._sort_key = self.columns[column] if 0 <= column < len(self.columns) else None
+        self._sort_order = order
+        self._relayout(self._sorted(self._filtered()))
+
+    def total_rows(self) -> int:
+        """Rows held, including ones hidden by the status filter"""
+        return len(self._row_port)
+
+    def sort_column(self) -> int:
+        """Index of the column rows are sorted by, or -1"""
+        return self.columns.index(self._sort_key) if self._sort_key is not None else -1
+
+    def _filtered(self) -> array:
+        if self._status_filter is None:
+            return array("I", range(len(self._row_port)))
+        code = self._status_filter
+        return array("I", (row_id for row_id, status in enumerate(self._row_status) if status == code))
+
+    def _ascending(self) -> bool:
+        return self._sort_key is None or self._sort_order == Qt.AscendingOrder
+
+    def _row_id(self, row: int) -> int:
+        """Row id shown at a view row; descending order reads _visible backwards"""
+        return self._visible[row] if self._ascending() else self._visible[len(self._visible) - 1 - row]
+
+    def _key_function(self) -> Callable[[int], object]:
+        column = self._sort_key
+        port, status, host = self._row_port, self._row_status, self._row_host
+        if column == "Port":
+            return lambda r: (port[r] << 32) | host[r]
+        if column == "Status":
+            return lambda r: (status[r] << 16) | port[r]
+        if column == "Host":
+            return lambda r: (self._hosts[host[r]], port[r])
+        if column == "Service":
+            return lambda r: (self._service(r), port[r])
+        return lambda r: (self._banners.get(r, ""), port[r])
+
+    def _sorted(self, rows: array) -> array:
+        if self._sort_key is None:
+            return rows
+        return array("I", sorted(rows, key=self._key_function()))
+
+    def _relayout(self, visible: array) -> None:
+        """Swap in a new row order, keeping selections on the same rows"""
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        old_ids = [self._row_id(index.row()) for index in persistent]
+        self._visible = visible
+        if persistent:
+            position = {self._row_id(row): row for row in range(len(visible))}
+            moved = [QModelIndex() if position.get(row_id) is None
+                     else self.index(position[row_id], index.column())
+                     for index, row_id in zip(persistent, old_ids)]
+            self.changePersistentIndexList(persistent, moved)
+        self.layoutChanged.emit()
+
+    # Qt model interface
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._visible)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.columns[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row_id = self._row_id(index.row())
+        column = self.columns[index.column()]
+
+        if role == Qt.DisplayRole:
+            port = self._row_port[row_id]
+            if column == "Port":
+                return str(port)
+            if column == "Status":
+                return STATUS_NAMES[self._row_status[row_id]]
+            if column == "Service":
+                return self._service(row_id)
+            if column == "Host":
+                return self._hosts[self._row_host[row_id]]
+            banner = self._banners.get(row_id)
+            if banner and len(banner) > self.BANNER_WIDTH:
+                banner = banner[:self.BANNER_WIDTH - 3] + "..."
+            return banner or "N/A"
+        if role == Qt.BackgroundRole and column == "Port":
+            return STATUS_COLORS[self._row_status[row_id]]
+        if role == Qt.ToolTipRole and column == "Banner":
+            return self._banners.get(row_id)
+        return None
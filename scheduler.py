@@ -0,0 +1,549 @@
+"""
+Scheduled scans of saved profiles
+
+Usage:
+    python -m scheduler add web-edge --every 15m --jitter 60
+    python -m scheduler add nightly --cron "0 2 * * *"
+    python -m scheduler list
+    python -m scheduler run --max-connections 512 --max-jobs 8
+
+The daemon runs every job on one asyncio loop with the async engine, so a
+job costs coroutines rather than its own thread pool. All jobs take their
+sockets from one ConnectionBudget and at most max_jobs run at once. When a
+profile comes due while its previous run is still queued or running, the
+two runs are coalesced into the one in progress. Each finished run is
+saved to the scan history; database calls run on a thread of their own so
+a slow disk never stalls the scans sharing the loop.
+"""
+import argparse
+import math
+import random
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from history import History_Manager
+from portscan import PortScanner
+from portspec import PortSpec
+from profiles import Profile_Manager
+from resolver import Resolver
+from results import ScanResult
+from sockets import default_max_connections, raise_fd_limit
+from timing import ConnectionBudget
+
+# Get the directory where this script is located
+APP_DIR = Path(__file__).resolve().parent
+
+Scan_Schedules = "CREATE TABLE IF NOT EXISTS schedules ( Schedule_ID INTEGER PRIMARY KEY AUTOINCREMENT, Profile_Name TEXT UNIQUE, Schedule TEXT, Jitter_S REAL, Enabled INTEGER DEFAULT 1, Last_Run TEXT, Created_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP )"
+
+# Without an explicit jitter a run is delayed by up to 10% of the gap to
+# the next one, capped here
+MAX_DEFAULT_JITTER = 300.0
+
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+
+class IntervalSchedule:
+    """Fires every `seconds`, e.g. "every 15m" (units s, m, h, d; bare numbers are seconds)"""
+
+    def __init__(self, text: str):
+        value = text.strip().lower()
+        if value.startswith("every "):
+            value = value[len("every "):].strip()
+        unit = INTERVAL_UNITS.get(value[-1:])
+        try:
+            self.seconds = float(value[:-1] if unit else value) * (unit or 1)
+        except ValueError:
+            raise ValueError(f"bad interval '{text}', expected e.g. 30s, 15m, 2h or 1d")
+        if self.seconds < 1:
+            raise ValueError(f"interval '{text}' is shorter than a second")
+        self.text = f"every {value}"
+
+    def first_after(self, t: float) -> float:
+        return t  # Start straight away (plus jitter), then every interval
+
+    def next_after(self, t: float) -> float:
+        return t + self.seconds
+
+
+class CronSchedule:
+    """
+    Five-field cron expression (minute hour day-of-month month day-of-week)
+    in local time
+
+    Fields take *, numbers, a-b ranges, comma lists and /step; day-of-week
+    0 and 7 are Sunday. As in cron, when both day fields are restricted
+    (neither starts with *) a day matching either one fires; otherwise a
+    day must match both, so "0 0 */2 * 1" is Mondays on odd days.
+    """
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, text: str):
+        expression = CRON_ALIASES.get(text.strip(), text.strip())
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression '{text}' needs 5 fields")
+        minutes, hours, days, months, weekdays = (
+            self._field(field, low, high) for field, (low, high) in zip(fields, self.FIELDS))
+        self.minutes, self.hours, self.days, self.months = minutes, hours, days, months
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        # Cron's test for a restricted day field: "*/2" counts as
+        # unrestricted although it is not every day
+        self._either_day = not (fields[2].startswith("*") or fields[4].startswith("*"))
+        self.text = text.strip()
+
+    @staticmethod
+    def _field(text: str, low: int, high: int) -> frozenset:
+        values = set()
+        for part in text.split(","):
+            span, slash, step = part.partition("/")
+            try:
+                step = int(step) if slash else 1
+                if span == "*":
+                    start, end = low, high
+                elif "-" in span:
+                    start, end = map(int, span.split("-", 1))
+                else:
+                    start = int(span)
+                    end = high if slash else start  # "5/15" means 5-59/15
+            except ValueError:
+                raise ValueError(f"bad cron field '{text}'")
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"cron field '{text}' is outside {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    def _day_matches(self, when: datetime) -> bool:
+        in_month = when.day in self.days
+        in_week = when.isoweekday() % 7 in self.weekdays
+        if self._either_day:
+            return in_month or in_week
+        return in_month and in_week
+
+    def first_after(self, t: float) -> float:
+        return self.next_after(t)
+
+    def next_after(self, t: float) -> float:
+        """Epoch time of the first matching minute after t"""
+        when = datetime.fromtimestamp(t).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = when + timedelta(days=366 * 8)  # "0 0 29 2 1" can take years to come round
+        while when < limit:
+            if when.month not in self.months:
+                when = (when.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(when):
+                when = when.replace(hour=0, minute=0) + timedelta(days=1)
+            elif when.hour not in self.hours:
+                when = when.replace(minute=0) + timedelta(hours=1)
+            elif when.minute not in self.minutes:
+                when += timedelta(minutes=1)
+            else:
+                return when.timestamp()
+        raise ValueError(f"cron expression '{self.text}' never fires")
+
+
+def parse_schedule(text: str):
+    """ "every 15m" / "90s" -> IntervalSchedule, "*/5 * * * *" / "@daily" -> CronSchedule"""
+    text = text.strip()
+    if text.startswith("@") or len(text.split()) == 5:
+        return CronSchedule(text)
+    return IntervalSchedule(text)
+
+
+class Schedule_Manager:
+    """Profile schedules stored alongside the profiles in data.db"""
+
+    def __init__(self, db_path: str = None):
+        if db_path is None:
+            db_path = str(APP_DIR / "data.db")
+        self.db_path = db_path
+        self.conn = None
+        self.cursor = None
+        self._connect()
+
+    def _connect(self):
+        """Establish database connection"""
+        try:
+            self.conn = sqlite3.connect(self.db_path)
+            self.cursor = self.conn.cursor()
+            self.cursor.execute(Scan_Schedules)
+            self.conn.commit()
+        except Exception as e:
+            print(f"Database connection error: {e}")
+            raise
+
+    def add_schedule(self, name: str, schedule: str, jitter: Optional[float] = None) -> None:
+        """
+        Schedule a saved profile, replacing its previous schedule
+
+        Args:
+            name: Profile name
+            schedule: Interval ("every 15m") or cron expression ("0 2 * * *")
+            jitter: Max random delay per run in seconds (default: 10% of
+                the gap between runs, up to 5 minutes)
+
+        Raises:
+            ValueError: If the schedule does not parse
+        """
+        schedule = parse_schedule(schedule).text
+        self.cursor.execute(
+            "INSERT INTO schedules (Profile_Name, Schedule, Jitter_S) VALUES (?, ?, ?) "
+            "ON CONFLICT(Profile_Name) DO UPDATE SET Schedule = excluded.Schedule, "
+            "Jitter_S = excluded.Jitter_S, Enabled = 1",
+            (name, schedule, jitter)
+        )
+        self.conn.commit()
+
+    def remove_schedule(self, name: str) -> bool:
+        """Unschedule a profile; False if it had no schedule"""
+        self.cursor.execute("DELETE FROM schedules WHERE Profile_Name = ?", (name,))
+        self.conn.commit()
+        return self.cursor.rowcount > 0
+
+    def list_schedules(self) -> List[Dict]:
+        self.cursor.execute(
+            "SELECT Profile_Name, Schedule, Jitter_S, Enabled, Last_Run FROM schedules ORDER BY Profile_Name")
+        return [
+            {"Profile_Name": row[0], "Schedule": row[1], "Jitter_S": row[2],
+             "Enabled": bool(row[3]), "Last_Run": row[4]}
+            for row in self.cursor.fetchall()
+        ]
+
+    def mark_run(self, name: str, when: str) -> None:
+        self.cursor.execute("UPDATE schedules SET Last_Run = ? WHERE Profile_Name = ?", (when, name))
+        self.conn.commit()
+
+    def close(self):
+        """Close database connection"""
+        try:
+            if self.conn:
+                self.conn.close()
+        except Exception as e:
+            print(f"Error closing database: {e}")
+
+    def __del__(self):
+        """Cleanup on deletion"""
+        self.close()
+
+
+class _Job:
+    """A scheduled profile and the state of its current run"""
+
+    __slots__ = ("name", "spec", "schedule", "jitter", "base", "due",
+                 "task", "scanner", "runs", "coalesced", "failures", "retired")
+
+    def __init__(self, name: str, spec: str, jitter: Optional[float], now: float):
+        self.name = name
+        self.spec = (spec, jitter)
+        self.schedule = parse_schedule(spec)
+        self.jitter = jitter
+        self.base = self.schedule.first_after(now)  # Un-jittered fire time
+        self.due = self.base + self._jitter(self.schedule.next_after(self.base) - self.base)
+        self.task = None  # Queued or running asyncio task
+        self.scanner: Optional[PortScanner] = None  # Set while running
+        self.runs = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.retired = False  # Unscheduled while running; dropped once the run ends
+
+    def _jitter(self, gap: float) -> float:
+        limit = self.jitter if self.jitter is not None else min(gap * 0.1, MAX_DEFAULT_JITTER)
+        return random.uniform(0, max(0.0, limit))
+
+    def advance(self, now: float) -> None:
+        """Move to the next fire time, skipping any that were missed"""
+        base = self.schedule.next_after(self.base)
+        if base <= now:
+            base = self.schedule.next_after(now)
+        self.base = base
+        self.due = base + self._jitter(self.schedule.next_after(base) - base)
+
+
+class Scheduler:
+    """
+    Runs scheduled profiles until stop()
+
+    Every job scans with the async engine on the scheduler's one event
+    loop. Sockets come from a shared ConnectionBudget and at most max_jobs
+    jobs scan at once; the rest queue. A job that comes due while its
+    previous run is queued or running is coalesced into that run (counted
+    in job.coalesced) rather than started twice. Schedules are re-read
+    from the database every reload_interval seconds.
+    """
+
+    def __init__(self, db_path: str = None, max_connections: Optional[int] = None,
+                 max_jobs: int = 8, reload_interval: float = 30.0, record_history: bool = True):
+        """
+        Args:
+            db_path: data.db holding profiles, schedules and history
+            max_connections: Sockets open at once across all jobs
+                (default: half of sockets.socket_limit(), at most 1024)
+            max_jobs: Jobs scanning at once
+            reload_interval: Seconds between re-reading the schedules
+            record_history: Save every finished run to the scan history
+        """
+        self.db_path = db_path
+        raise_fd_limit()
+        self.budget = ConnectionBudget(max_connections or default_max_connections())
+        self.max_jobs = max(1, max_jobs)
+        self.reload_interval = reload_interval
+        self.record_history = record_history
+        self.resolver = Resolver()
+        self.jobs: Dict[str, _Job] = {}
+        self._stop = threading.Event()
+        self._schedules = self._profiles = self._history = None
+        # The managers' connections belong to the thread that opened them,
+        # so every database call goes through this one thread
+        self._db: Optional[ThreadPoolExecutor] = None
+
+    def run(self) -> None:
+        """Block, running jobs as they come due, until stop() is called"""
+        import asyncio
+        asyncio.run(self._run())
+
+    def stop(self) -> None:
+        """Stop from any thread (or a signal handler): running scans are cancelled"""
+        self._stop.set()
+        for job in list(self.jobs.values()):
+            if job.scanner is not None:
+                job.scanner.cancel()
+
+    async def _db_call(self, func, *args):
+        """Run a blocking database call on the database thread, off the loop"""
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(self._db, func, *args)
+
+    async def _run(self) -> None:
+        import asyncio
+        self._job_slots = asyncio.Semaphore(self.max_jobs)
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scheduler-db")
+        self._schedules = await self._db_call(Schedule_Manager, self.db_path)
+        self._profiles = await self._db_call(Profile_Manager, self.db_path)
+        if self.record_history:
+            self._history = await self._db_call(History_Manager, self.db_path)
+        print(f"[Scheduler] Started: up to {self.max_jobs} jobs and {self.budget.limit} connections at once")
+        next_reload = 0.0
+        try:
+            while not self._stop.is_set():
+                now = time.time()
+                if now >= next_reload:
+                    await self._reload(now)
+                    next_reload = now + self.reload_interval
+                for job in list(self.jobs.values()):
+                    if job.due <= now:
+                        self._fire(job, now)
+                wake = min([job.due for job in self.jobs.values()] + [next_reload])
+                await asyncio.sleep(min(max(0.0, wake - time.time()), 0.5))
+        finally:
+            self.stop()
+            tasks = [job.task for job in self.jobs.values() if job.task is not None]
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._db_call(self._close_managers)
+            self._db.shutdown()
+            print("[Scheduler] Stopped")
+
+    def _close_managers(self) -> None:
+        """Close and let go of the managers, on the database thread (their __del__ closes again)"""
+        for manager in (self._schedules, self._profiles, self._history):
+            if manager is not None:
+                manager.close()
+        self._schedules = self._profiles = self._history = None
+
+    async def _reload(self, now: float) -> None:
+        """Pick up added, changed and removed schedules"""
+        wanted = {}
+        for row in await self._db_call(self._schedules.list_schedules):
+            if row["Enabled"]:
+                wanted[row["Profile_Name"]] = (row["Schedule"], row["Jitter_S"])
+        for name, job in list(self.jobs.items()):
+            if name in wanted or job.retired:
+                continue
+            if job.task is None:
+                print(f"[Scheduler] {name}: unscheduled")
+                del self.jobs[name]
+            else:
+                # Never fire again; _run_job drops it when this run ends
+                print(f"[Scheduler] {name}: unscheduled, finishing the current run")
+                job.retired = True
+                job.due = math.inf
+        for name, (spec, jitter) in wanted.items():
+            current = self.jobs.get(name)
+            if current is not None and current.spec == (spec, jitter) and not current.retired:
+                continue
+            try:
+                job = _Job(name, spec, jitter, now)
+            except ValueError as e:
+                print(f"[Scheduler ERROR] {name}: {e}")
+                continue
+            if current is not None:  # Rescheduled; a run in progress carries on
+                job.task, job.scanner = current.task, current.scanner
+                job.runs, job.coalesced, job.failures = current.runs, current.coalesced, current.failures
+            self.jobs[name] = job
+            print(f"[Scheduler] {name}: {job.schedule.text}, first run at "
+                  f"{datetime.fromtimestamp(job.due):%Y-%m-%d %H:%M:%S}")
+
+    def _fire(self, job: _Job, now: float) -> None:
+        import asyncio
+        if job.task is not None:
+            job.coalesced += 1
+            state = "running" if job.scanner is not None else "queued"
+            print(f"[Scheduler] {job.name}: due again while still {state}; coalesced")
+        else:
+            job.task = asyncio.create_task(self._run_job(job))
+        job.advance(now)
+
+    async def _run_job(self, job: _Job) -> None:
+        import asyncio
+        try:
+            async with self._job_slots:
+                if not self._stop.is_set():
+                    await self._scan_profile(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            print(f"[Scheduler ERROR] {job.name}: {type(e).__name__}: {e}")
+        finally:
+            job.task = None
+            job.scanner = None
+            current = self.jobs.get(job.name)
+            if current is not job and current is not None and current.task is asyncio.current_task():
+                current.task = current.scanner = None  # Rescheduled while this run was going
+            elif current is job and job.retired:
+                del self.jobs[job.name]
+
+    async def _scan_profile(self, job: _Job) -> None:
+        """One run of a job: scan every host of its profile, then record it"""
+        profile = await self._db_call(self._profiles.load_profile, job.name)
+        if profile is None:
+            print(f"[Scheduler ERROR] {job.name}: no such profile")
+            job.failures += 1
+            return
+        scanner = PortScanner(timeout=profile["Timeout"] or 0.6, engine="async",
+                              max_inflight=min(profile["Threads"] or 200, self.budget.limit),
+                              budget=self.budget, resolver=self.resolver)
+        job.scanner = scanner
+        ports = PortSpec.from_ports(profile["Port_Selection"])
+        start_time = datetime.utcnow()
+        timestamp = start_time.strftime("%Y%m%dT%H%M%SZ")
+        print(f"[Scheduler] {job.name}: starting run {job.runs + 1} ({len(ports)} ports)")
+
+        hosts_results, unresolved, down = {}, [], []
+        targets = {}  # ip -> name
+        for host in scanner.parse_targets(profile["TargetIP"]):
+            if self._stop.is_set():
+                break
+            addresses = await self.resolver.resolve_async(host)
+            if not addresses:
+                unresolved.append(host)
+                continue
+            targets.setdefault(addresses[0], host)
+        if len(targets) > 1:
+            # Skip hosts that don't answer discovery pings (see PortScanner.discover)
+            async for ip, up in scanner.adiscover(list(targets)):
+                if not up:
+                    down.append(ip)
+                    del targets[ip]
+
+        for ip, host in targets.items():
+            if self._stop.is_set():
+                break
+            results = ScanResult(host, ip, timestamp)
+            async for port_result in scanner.ascan_iter(ip, ports):
+                results.add_result(port_result)
+            results.duration_s = (datetime.utcnow() - start_time).total_seconds()
+            hosts_results[ip] = results
+
+        duration = (datetime.utcnow() - start_time).total_seconds()
+        if self._stop.is_set():
+            print(f"[Scheduler] {job.name}: run cancelled")
+            return
+        job.runs += 1
+        total_open = sum(results.count("open") for results in hosts_results.values())
+        print(f"[Scheduler] {job.name}: {len(hosts_results)} hosts, {total_open} open ports "
+              f"in {duration:.1f}s" + (f", {len(unresolved)} unresolved" if unresolved else "")
+              + (f", {len(down)} down" if down else ""))
+        if self._history is not None and hosts_results:
+            await self._db_call(self._history.record_scan,
+                                {"hosts": hosts_results, "timestamp_utc": timestamp,
+                                 "duration_s": duration})
+        await self._db_call(self._schedules.mark_run, job.name, timestamp)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m scheduler",
+                                     description="Run saved profiles on intervals or cron schedules")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="schedule a saved profile (replaces its schedule)")
+    add.add_argument("profile")
+    when = add.add_mutually_exclusive_group(required=True)
+    when.add_argument("--every", metavar="INTERVAL", help="e.g. 30s, 15m, 6h, 1d")
+    when.add_argument("--cron", metavar="EXPR", help='e.g. "0 2 * * *" or @hourly')
+    add.add_argument("--jitter", type=float, metavar="SECONDS",
+                     help="max random delay per run (default 10%% of the interval, up to 5 min)")
+
+    remove = sub.add_parser("remove", help="unschedule a profile")
+    remove.add_argument("profile")
+
+    sub.add_parser("list", help="show schedules")
+
+    run = sub.add_parser("run", help="run scheduled scans until interrupted")
+    run.add_argument("--max-connections", type=int,
+                     help="sockets open at once across all jobs (default: half the fd limit, up to 1024)")
+    run.add_argument("--max-jobs", type=int, default=8, help="jobs scanning at once (default 8)")
+    run.add_argument("--no-history", action="store_true", help="don't save runs to the scan history")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        scheduler = Scheduler(max_connections=args.max_connections, max_jobs=args.max_jobs,
+                              record_history=not args.no_history)
+        signal.signal(signal.SIGINT, lambda signum, frame: scheduler.stop())
+        signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+        scheduler.run()
+        return 0
+
+    manager = Schedule_Manager()
+    try:
+        if args.command == "add":
+            profiles = Profile_Manager()
+            try:
+                if profiles.load_profile(args.profile) is None:
+                    parser.error(f"no profile named '{args.profile}'")
+            finally:
+                profiles.close()
+            try:
+                manager.add_schedule(args.profile, f"every {args.every}" if args.every else args.cron,
+                                     args.jitter)
+            except ValueError as e:
+                parser.error(str(e))
+        elif args.command == "remove":
+            if not manager.remove_schedule(args.profile):
+                print(f"No schedule for '{args.profile}'", file=sys.stderr)
+                return 1
+        else:
+            for row in manager.list_schedules():
+                jitter = "auto" if row["Jitter_S"] is None else f"{row['Jitter_S']:g}s"
+                state = "" if row["Enabled"] else "  (disabled)"
+                print(f"{row['Profile_Name']}\t{row['Schedule']}\tjitter {jitter}\t"
+                      f"last run {row['Last_Run'] or 'never'}{state}")
+    finally:
+        manager.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
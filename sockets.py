@@ -0,0 +1,192 @@
+"""
+OS limits on how many sockets a scan can have open
+
+Every probe holds a file descriptor and a local ephemeral port, and every
+connection the scanner closes first sits in TIME_WAIT for a minute or two
+afterwards. This module reads (and where allowed raises) the open-file
+limit, reads the ephemeral port range, closes connected sockets with an
+RST so they skip TIME_WAIT, and keeps one process-wide Backpressure that
+pauses new connects after EMFILE / EADDRNOTAVAIL instead of letting them
+turn into bogus results.
+"""
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Optional, Tuple
+
+# IANA dynamic range; the Windows and macOS default
+DEFAULT_EPHEMERAL_RANGE = (49152, 65535)
+
+# File descriptors left for everything that isn't a probe socket (the
+# database, checkpoint files, DNS lookups, the GUI)
+FD_RESERVE = 64
+
+# macOS refuses a soft limit above OPEN_MAX even when the hard limit is
+# RLIM_INFINITY
+_DARWIN_OPEN_MAX = 10240
+
+_fd_limit_raised = False
+_ephemeral_range: Optional[Tuple[int, int]] = None
+
+
+def fd_limit() -> Optional[int]:
+    """Soft RLIMIT_NOFILE, or None where there is none (Windows) or it is unlimited"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    return None if soft == resource.RLIM_INFINITY else soft
+
+
+def raise_fd_limit(target: Optional[int] = None) -> Optional[int]:
+    """
+    Raise the soft open-file limit towards the hard limit, once per process
+
+    Args:
+        target: Soft limit wanted (default: the hard limit)
+
+    Returns:
+        The soft limit now in effect (None as for fd_limit)
+    """
+    global _fd_limit_raised
+    try:
+        import resource
+    except ImportError:
+        return None
+    if _fd_limit_raised and target is None:
+        return fd_limit()
+    _fd_limit_raised = True
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = hard if target is None else target
+    if hard != resource.RLIM_INFINITY:
+        wanted = min(wanted, hard)
+    elif wanted == resource.RLIM_INFINITY and sys.platform == "darwin":
+        wanted = _DARWIN_OPEN_MAX
+    if soft != resource.RLIM_INFINITY and wanted > soft:
+        for candidate in (wanted, _DARWIN_OPEN_MAX):
+            if candidate <= soft:
+                break
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (candidate, hard))
+                break
+            except (ValueError, OSError):
+                continue
+    return fd_limit()
+
+
+def ephemeral_port_range() -> Tuple[int, int]:
+    """Local ports the OS hands out to outgoing connections (inclusive)"""
+    global _ephemeral_range
+    if _ephemeral_range is None:
+        _ephemeral_range = DEFAULT_EPHEMERAL_RANGE
+        try:
+            with open("/proc/sys/net/ipv4/ip_local_port_range") as f:
+                low, high = map(int, f.read().split())
+            if 0 < low <= high:
+                _ephemeral_range = (low, high)
+        except (OSError, ValueError):
+            pass  # Not Linux
+    return _ephemeral_range
+
+
+def socket_limit() -> int:
+    """
+    Sockets this process can have open at once: the open-file limit less
+    FD_RESERVE, and no more than there are ephemeral ports
+    """
+    low, high = ephemeral_port_range()
+    limit = high - low + 1
+    fds = fd_limit()
+    if fds is not None:
+        limit = min(limit, fds - FD_RESERVE)
+    return max(16, limit)
+
+
+def default_max_connections() -> int:
+    """Default size of a ConnectionBudget: half of socket_limit(), at most 1024"""
+    return max(16, min(1024, socket_limit() // 2))
+
+
+def abortive_close(sock: socket.socket) -> None:
+    """
+    Close a connected socket with an RST (SO_LINGER 0) instead of a FIN,
+    so the local end doesn't sit in TIME_WAIT holding its ephemeral port
+    """
+    try:
+        # struct linger is two ints, or two u_shorts on Windows
+        linger = struct.pack("HH" if sys.platform == "win32" else "ii", 1, 0)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, linger)
+    except OSError:
+        pass  # Already reset by the peer
+    sock.close()
+
+
+def is_self_connect(sock: socket.socket) -> bool:
+    """
+    Whether a connect to a local port in the ephemeral range was answered
+    by the socket itself (TCP simultaneous open) rather than a listener
+    """
+    try:
+        return sock.getsockname() == sock.getpeername()
+    except OSError:
+        return False
+
+
+class Backpressure:
+    """
+    Shared pause on new connects after a resource error
+
+    EMFILE, ENFILE, ENOBUFS and EADDRNOTAVAIL say nothing about the target
+    port; they mean this machine is out of fds, buffers or ephemeral
+    ports. Every probe waits out wait_time() before connecting, and an
+    error soon after a pause ends doubles the next one (from min_delay up
+    to max_delay), so all scanners in the process ease off together
+    while sockets in TIME_WAIT and other scans' sockets are freed. The
+    first connect that gets a socket again calls relieved(); stalled_for()
+    is how long that has not happened.
+    """
+
+    __slots__ = ("min_delay", "max_delay", "delay", "until", "stalled_since", "_lock")
+
+    def __init__(self, min_delay: float = 0.01, max_delay: float = 1.0):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = 0.0
+        self.until = 0.0
+        self.stalled_since: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def exhausted(self) -> None:
+        """Record a resource error and start (or lengthen) the pause"""
+        with self._lock:
+            now = time.monotonic()
+            if now >= self.until:  # Errors during a pause belong to the same episode
+                if now < self.until + self.delay:
+                    self.delay = min(self.max_delay, max(self.min_delay, self.delay * 2))
+                else:
+                    self.delay = self.min_delay
+                self.until = now + self.delay
+            if self.stalled_since is None:
+                self.stalled_since = now
+
+    def relieved(self) -> None:
+        """A connect got a socket: end the pause"""
+        with self._lock:
+            self.delay = 0.0
+            self.stalled_since = None
+
+    def stalled_for(self) -> float:
+        """Seconds since a connect last got a socket, while exhausted (else 0)"""
+        since = self.stalled_since
+        return 0.0 if since is None else time.monotonic() - since
+
+    def wait_time(self) -> float:
+        """Seconds to hold off before the next connect"""
+        return max(0.0, self.until - time.monotonic())
+
+
+# One per process: fds and ephemeral ports are shared by every scanner
+BACKPRESSURE = Backpressure()
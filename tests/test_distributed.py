@@ -0,0 +1,53 @@
+import json
+import socket
+import threading
+
+import distributed
+from distributed import PROTOCOL_VERSION, Coordinator, Worker
+from portscan import PortScanner
+
+
+def _start_when_listening(coordinator, target):
+    def run():
+        coordinator.listening.wait(10)
+        target(coordinator.address)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_unit_outlasting_socket_timeout(monkeypatch, silent_port):
+    # The banner read keeps the unit busy (and the link quiet) for longer
+    # than the connect timeout; the worker must not take that as a dead link
+    monkeypatch.setattr(distributed, "CONNECT_TIMEOUT", 0.5)
+    scanner = PortScanner(timeout=0.5, banner_timeout=1.5)
+    coordinator = Coordinator(scanner, host="127.0.0.1", port=0, heartbeat_timeout=5)
+    worker = _start_when_listening(coordinator, lambda address: Worker(address, slots=1, heartbeat=0.2).run())
+
+    scan = coordinator.run("127.0.0.1", [silent_port])
+    worker.join(10)
+
+    assert scan["success"], scan["error"]
+    assert scan["results"]["hosts"]["127.0.0.1"].status_of(silent_port) == "open"
+    assert sum(scan["results"]["workers"].values()) == 1
+
+
+def test_scan_fails_when_every_worker_leaves():
+    coordinator = Coordinator(PortScanner(timeout=0.2), host="127.0.0.1", port=0, heartbeat_timeout=0.5)
+
+    def quitter(address):
+        # Joins, takes a unit and hangs up without finishing it
+        with socket.create_connection(address) as sock:
+            hello = {"type": "hello", "version": PROTOCOL_VERSION, "name": "quitter", "slots": 1}
+            sock.sendall(json.dumps(hello).encode() + b"\n")
+            reader = sock.makefile("rb")
+            for line in reader:
+                if json.loads(line)["type"] == "unit":
+                    break
+
+    _start_when_listening(coordinator, quitter)
+    scan = coordinator.run("127.0.0.1", [1, 2, 3])
+
+    assert not scan["success"]
+    assert "No workers left" in scan["error"]
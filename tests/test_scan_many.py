@@ -0,0 +1,102 @@
+import os
+import socket
+from concurrent.futures import CancelledError
+
+import pytest
+
+import portscan
+from portscan import PortScanner, ResourceExhaustedError
+
+# Shards run in a forked pool, so these stand-ins must be importable by name
+_real_scan_shard = portscan._scan_shard
+
+
+def _broken_shard(settings, ip, ports):
+    raise RuntimeError("shard blew up")
+
+
+def _exhausted_shard(settings, ip, ports):
+    raise ResourceExhaustedError("No socket could be had")
+
+
+def _dropped_shard(settings, ip, ports):
+    # Comes back as if cancelled although the sweep was not
+    raise CancelledError()
+
+
+def _flaky_shard(settings, ip, ports):
+    # Fails the first time it runs, then scans for real
+    try:
+        os.close(os.open(os.environ["FLAKY_SHARD_MARKER"], os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return _real_scan_shard(settings, ip, ports)
+    raise RuntimeError("first attempt fails")
+
+
+@pytest.fixture
+def open_port():
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(16)
+    yield listener.getsockname()[1]
+    listener.close()
+
+
+def _sweep(port, **kwargs):
+    scanner = PortScanner(timeout=0.5, banner_timeout=0.2)
+    return scanner.scan_many("127.0.0.1", [port], processes=1, discover=False, **kwargs)
+
+
+def test_failing_shard_fails_its_host(monkeypatch, open_port, tmp_path):
+    monkeypatch.setattr(portscan, "_scan_shard", _broken_shard)
+    checkpoint = tmp_path / "sweep.json"
+
+    sweep = _sweep(open_port, checkpoint=str(checkpoint))
+
+    assert not sweep["success"]
+    assert "127.0.0.1" in sweep["error"]
+    assert "shard blew up" in sweep["results"]["failed"]["127.0.0.1"]
+    assert sweep["results"]["hosts"] == {}
+    assert sweep["results"]["summary"]["hosts_failed"] == 1
+    assert checkpoint.exists()
+
+
+def test_failing_shard_is_retried(monkeypatch, open_port, tmp_path):
+    monkeypatch.setattr(portscan, "_scan_shard", _flaky_shard)
+    monkeypatch.setenv("FLAKY_SHARD_MARKER", str(tmp_path / "failed-once"))
+
+    sweep = _sweep(open_port)
+
+    assert sweep["success"], sweep["error"]
+    assert sweep["results"]["failed"] == {}
+    assert sweep["results"]["hosts"]["127.0.0.1"].status_of(open_port) == "open"
+
+
+def test_exhausted_shard_fails_the_scan(monkeypatch, open_port):
+    monkeypatch.setattr(portscan, "_scan_shard", _exhausted_shard)
+
+    sweep = _sweep(open_port)
+
+    assert not sweep["success"]
+    assert sweep["error"] == "No socket could be had"
+    assert sweep["results"]["hosts"] == {}
+
+
+def test_unfinished_host_keeps_checkpoint(monkeypatch, open_port, tmp_path):
+    monkeypatch.setattr(portscan, "_scan_shard", _dropped_shard)
+    checkpoint = tmp_path / "sweep.json"
+
+    sweep = _sweep(open_port, checkpoint=str(checkpoint))
+
+    assert not sweep["success"]
+    assert sweep["error"] == "1 hosts did not finish: 127.0.0.1"
+    assert checkpoint.exists()
+
+
+def test_finished_sweep_discards_checkpoint(open_port, tmp_path):
+    checkpoint = tmp_path / "sweep.json"
+
+    sweep = _sweep(open_port, checkpoint=str(checkpoint))
+
+    assert sweep["success"], sweep["error"]
+    assert not checkpoint.exists()
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+import pytest
+
+from scheduler import CronSchedule
+
+
+def _next(expression, after):
+    fire = CronSchedule(expression).next_after(datetime(*after).timestamp())
+    return datetime.fromtimestamp(fire)
+
+
+@pytest.mark.parametrize("expression, after, expected", [
+    # Both day fields restricted: the 1st of the month or any Monday
+    ("0 0 1 * 1", (2026, 10, 17), (2026, 10, 19)),
+    ("0 0 1 * 1", (2026, 10, 27), (2026, 11, 1)),
+    # A day field starting with * must match as well: odd-day Mondays
+    ("0 0 */2 * 1", (2026, 10, 17), (2026, 10, 19)),
+    ("0 0 */2 * 1", (2026, 10, 20), (2026, 11, 9)),
+    # The 1st of the month, on a Sunday, Tuesday, Thursday or Saturday
+    ("0 0 1 * */2", (2026, 10, 17), (2026, 11, 1)),
+    ("0 0 1 * */2", (2026, 11, 2), (2026, 12, 1)),
+    # One day field unrestricted
+    ("0 0 * * 1", (2026, 10, 20), (2026, 10, 26)),
+    ("0 0 1 * *", (2026, 10, 17), (2026, 11, 1)),
+])
+def test_day_fields(expression, after, expected):
+    assert _next(expression, after) == datetime(*expected)
@@ -0,0 +1,183 @@
+import threading
+from collections import deque
+from typing import Optional
+
+
+class RttEstimator:
+    """
+    Per-host connect timeout derived from observed round-trip times
+
+    Uses the TCP retransmission-timer rules (RFC 6298): a smoothed RTT and
+    RTT variance are updated from every connect that got an answer (open or
+    refused), and the timeout is srtt + 4 * rttvar, clamped to
+    [min_timeout, max_timeout]. Until the first sample arrives the initial
+    timeout is used.
+    """
+
+    __slots__ = ("initial", "min_timeout", "max_timeout", "srtt", "rttvar", "samples", "_lock")
+
+    def __init__(self, initial: float, min_timeout: float = 0.05, max_timeout: float = 3.0):
+        self.initial = initial
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def sample(self, rtt: float) -> None:
+        """Feed one measured connect round-trip time in seconds"""
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+                self.srtt = 0.875 * self.srtt + 0.125 * rtt
+            self.samples += 1
+
+    @property
+    def timeout(self) -> float:
+        """Current connect timeout in seconds"""
+        if self.srtt is None:
+            return self.initial
+        rto = self.srtt + max(4 * self.rttvar, 0.001)
+        return min(self.max_timeout, max(self.min_timeout, rto))
+
+    def backoff(self, attempt: int) -> float:
+        """Timeout for a retransmission, doubling per attempt"""
+        return min(self.max_timeout, self.timeout * (2 ** attempt))
+
+
+class CongestionWindow:
+    """
+    AIMD limit on in-flight connects
+
+    Starts in slow start (window doubles every window's worth of clean
+    completions), then grows by one per window. When the error rate of the
+    last window (timeouts and socket errors) rises more than
+    error_threshold above its running baseline, or a resource error such
+    as EMFILE shows up, the window is halved. window and reason can be
+    read at any time, e.g. from a progress callback.
+    """
+
+    __slots__ = ("window", "minimum", "maximum", "error_threshold", "reason",
+                 "baseline", "_ssthresh", "_completed", "_errors", "_just_cut", "_lock")
+
+    def __init__(self, initial: int = 32, minimum: int = 1, maximum: int = 1000,
+                 error_threshold: float = 0.1):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.window = max(self.minimum, min(initial, self.maximum))
+        self.error_threshold = error_threshold
+        self.reason = "initial window"
+        self.baseline = 0.0
+        self._ssthresh = self.maximum
+        self._completed = 0
+        self._errors = 0
+        self._just_cut = False
+        self._lock = threading.Lock()
+
+    def on_result(self, error: bool, resource_error: bool = False) -> None:
+        """Record one finished connect attempt"""
+        with self._lock:
+            if resource_error:
+                # A burst of EMFILEs from one overload only halves once
+                if not self._just_cut:
+                    self._decrease("resource exhaustion")
+                return
+            self._just_cut = False
+            self._completed += 1
+            self._errors += error
+            if self._completed < self.window:
+                return
+
+            # One window's worth of samples: compare against the baseline
+            rate = self._errors / self._completed
+            if rate > self.baseline + self.error_threshold:
+                self._decrease(f"error rate {rate:.0%} over baseline {self.baseline:.0%}")
+            elif self.window < self._ssthresh:
+                self._set(self.window * 2, "slow start")
+            else:
+                self._set(self.window + 1, "additive increase")
+            self.baseline = 0.75 * self.baseline + 0.25 * rate
+
+    def _decrease(self, why: str) -> None:
+        self._ssthresh = max(self.minimum, self.window // 2)
+        self._set(self._ssthresh, f"multiplicative decrease: {why}")
+        self._just_cut = True
+
+    def _set(self, window: int, reason: str) -> None:
+        self.window = max(self.minimum, min(window, self.maximum))
+        self.reason = reason
+        self._completed = 0
+        self._errors = 0
+
+
+class ConnectionBudget:
+    """
+    Cap on sockets in flight across every scanner that shares it
+
+    A scanner built with budget= takes a slot for each connect attempt and
+    keeps it, for an open port, until the banner or probe stage closes the
+    socket. Many concurrent scans (e.g. the scheduler's jobs) then never
+    hold more than limit sockets between them, whatever their own threads
+    or max_inflight. Slots can be taken from threads (acquire) and from
+    any event loop (acquire_async); waiting coroutines are served first.
+    """
+
+    __slots__ = ("limit", "in_use", "peak", "_free", "_waiters")
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_use = 0
+        self.peak = 0  # Most slots ever held at once
+        self._free = threading.Condition()
+        self._waiters = deque()  # (loop, future) of coroutines waiting in acquire_async
+
+    def acquire(self) -> None:
+        """Block until a slot is free, then take it"""
+        with self._free:
+            self._free.wait_for(lambda: self.in_use < self.limit)
+            self._take()
+
+    async def acquire_async(self) -> None:
+        """Wait for a free slot without blocking the event loop"""
+        import asyncio
+        with self._free:
+            if self.in_use < self.limit and not self._waiters:
+                self._take()
+                return
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Granted just as we were cancelled
+            raise
+
+    def release(self) -> None:
+        """Give a slot back, handing it straight to a waiting coroutine if any"""
+        with self._free:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._grant, future)
+                    return
+                except RuntimeError:
+                    continue  # That loop has closed
+            self.in_use -= 1
+            self._free.notify()
+
+    def _take(self) -> None:
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+
+    def _grant(self, future) -> None:
+        """Runs on the waiter's loop; a waiter cancelled meanwhile passes the slot on"""
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)